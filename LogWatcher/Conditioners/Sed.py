@@ -27,7 +27,7 @@ import urllib.parse
 
 # LogWatcher
 from LogWatcher.Conditioners import Conditioner
-from LogWatcher import Data
+from LogWatcher import RegExp
 
 
 #------------------------------------------------------------------------------
@@ -51,24 +51,45 @@ class Sed(Conditioner):
     to replace the filtered (output) data in the data object (matched group(s)
     can be inserted in the replacement string by using "\<int>" backreferences).
 
+    Named groups - e.g. '(?P<user>%{user})' - are exported as named fields (see
+    Data) and named fields - e.g. exported by the Grep filter - can be inserted
+    in the replacement string by using '%{<name>}' snippets (without matching
+    the data again).
+
     Configuration parameters are:
      - [REQ] pattern=<string>
              Regular expression
      - [opt] ignorecase (flag)
              Case-insensitive match
+     - [opt] engine=<string> (default: auto)
+             Regular expression engine: 're2' (linear-time engine), 're'
+             (standard engine) or 'auto' (the linear-time engine, if available
+             and supporting the pattern)
      - [opt] not (flag)
              Invert match logic (logical not)
      - [opt] raw (flag)
              Test the producer (raw) data instead of the filter (output) data
+     - [opt] field=<string>
+             Test (and replace) the given named field instead of the filter
+             (output) data
      - [opt] replace=<string>
              Replacement data
 
     In addition, the following "magic snippets" can be used to match/output
     specific data:
-     - '%{ip}':    IP address (IPv4 or IPv6)
-     - '%{ipv4}':  IPv4 address
-     - '%{ipv6}':  IPv6 address
-     - '%{email}': e-mail address
+     - '%{ip}':        IP address (IPv4 or IPv6)
+     - '%{ipv4}':      IPv4 address
+     - '%{ipv6}':      IPv6 address
+     - '%{email}':     e-mail address
+     - '%{hostname}':  host name
+     - '%{port}':      (TCP/UDP) port number
+     - '%{user}':      user name
+     - '%{int}':       integer
+     - '%{word}':      word
+     - '%{syslog_ts}': syslog timestamp (e.g. 'Jan  1 00:00:00')
+     - '%{iso8601}':   ISO 8601 timestamp (e.g. '2016-01-01T00:00:00Z')
+    (the shared snippets library may be extended in the global configuration;
+    see the [[snippets]] section)
 
     Example (watcher configuration):
      - conditioners = Sed?pattern=foo&replace=bar,
@@ -91,17 +112,21 @@ class Sed(Conditioner):
         if 'ignorecase' in dConfiguration_keys:
             iFlags |= re.IGNORECASE
 
+        # ... engine
+        sEngine = 'auto'
+        if 'engine' in dConfiguration_keys:
+            sEngine = dConfiguration['engine'][0]
+            if sEngine not in ('auto', 're', 're2'):
+                _oWatcher.log('ERROR[Conditioner:Sed(%s)]: Invalid \'engine\' configuration parameter\n' % _oWatcher.name())
+                raise ValueError('Invalid \'engine\' configuration parameter')
+
         # ... regexp
         if 'pattern' not in dConfiguration_keys:
             _oWatcher.log('ERROR[Conditioner:Sed(%s)]: Missing \'pattern\' configuration parameter\n' % _oWatcher.name())
             raise RuntimeError('Missing \'pattern\' configuration parameter')
         sPattern = dConfiguration['pattern'][0]
-        sPattern = sPattern.replace('%{ip}', '([0-9]{1,3}(\.[0-9]{1,3}){3}|[0-9a-f]{1,4}(:[0-9a-f]{0,4}){2,7})') \
-            .replace('%{ipv4}', '[0-9]{1,3}(\.[0-9]{1,3}){3}') \
-            .replace('%{ipv6}', '[0-9a-f]{1,4}(:[0-9a-f]{0,4}){2,7}') \
-            .replace('%{email}', '[-_a-zA-Z0-9]{1,}(\.[-_a-zA-Z0-9]{1,})*@[-_a-zA-Z0-9]{1,}(\.[-_a-zA-Z0-9]{1,})*\.[a-zA-Z]{2,}')
         try:
-            self.__oRegExp = re.compile(sPattern, iFlags)
+            self.__oRegExp = RegExp.compile(sPattern, iFlags, sEngine, '%s:Sed' % _oWatcher.name())
         except Exception:
             _oWatcher.log('ERROR[Conditioner:Sed(%s)]: Invalid \'pattern\' configuration parameter\n' % _oWatcher.name())
             raise
@@ -116,22 +141,43 @@ class Sed(Conditioner):
         if 'raw' in dConfiguration_keys:
             self.__bRaw = True
 
+        # ... field
+        self.__sField = None
+        if 'field' in dConfiguration_keys:
+            self.__sField = dConfiguration['field'][0]
+
         # ... replace / group
         self.__sReplace = None
         self.__bExpand = False
+        self.__bTemplate = False
         if 'replace' in dConfiguration_keys:
             self.__sReplace = dConfiguration['replace'][0]
-            if not self.__bNot and re.match('(^|[^\\\\])\\\\[0-9]', self.__sReplace):
+            if not self.__bNot and re.search('(^|[^\\\\])\\\\([0-9]|g<)', self.__sReplace):
                 self.__bExpand = True
+            self.__bTemplate = '%{' in self.__sReplace
+
+        # Fields
+        self.__bFields = not self.__bNot and bool(self.__oRegExp.groupindex)
+        # NB: output depending on the data ingest time (not only on the data themselves)
+        self.__bStateful = self.__sField=='time' or (self.__bTemplate and '%{time}' in self.__sReplace)
 
 
     #------------------------------------------------------------------------------
     # METHODS
     #------------------------------------------------------------------------------
 
+    def stateful(self):
+        # Stateful
+        return self.__bStateful
+
+
     def feed(self, _oData):
         # Test the data against the regular expression
-        oMatch = self.__oRegExp.search(_oData.data_raw if self.__bRaw else _oData.data)
+        if self.__sField is not None:
+            sData = _oData.field(self.__sField, '')
+        else:
+            sData = _oData.data_raw if self.__bRaw else _oData.data
+        oMatch = self.__oRegExp.search(sData)
         if (oMatch is None and not self.__bNot) or (oMatch is not None and self.__bNot):
             if self.__sReplace is not None:
                 # Find-and-Replace
@@ -141,7 +187,19 @@ class Sed(Conditioner):
                 return None
 
         # Output
+        # NB: replace the data (object) in place (rather than allocating a new one)
+        if self.__bFields:
+            _oData.setFields(RegExp.fields(oMatch))
         if self.__sReplace is not None:
-            return Data(_oData.watcher, _oData.data_raw, oMatch.expand(self.__sReplace) if self.__bExpand else self.__sReplace)
-        else:
-            return _oData
+            # NB: expand the named fields before the backreferences, such as (untrusted)
+            #     matched data are never expanded as templates
+            sReplace = self.__sReplace
+            if self.__bTemplate:
+                sReplace = _oData.expand(sReplace, None, (lambda s: s.replace('\\', '\\\\')) if self.__bExpand else None)
+            if self.__bExpand:
+                sReplace = oMatch.expand(sReplace)
+            if self.__sField is not None:
+                _oData.setField(self.__sField, sReplace)
+            else:
+                _oData.data = sReplace
+        return _oData
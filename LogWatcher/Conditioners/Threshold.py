@@ -0,0 +1,259 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from array import array
+from collections import OrderedDict
+import urllib.parse
+
+# LogWatcher
+from LogWatcher.Conditioners import Conditioner
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class ThresholdHits:
+    """
+    Threshold Key Hits.
+
+    This class/object holds the times of the last hits of a given key, in a
+    fixed-size ring buffer (whose size is the configured hit count).
+    """
+
+    __slots__ = ('times', 'index')
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _iHitCount):
+        """
+        Constructor.
+
+        @param  int  _iHitCount  Hit count (ring buffer size)
+        """
+
+        # Fields
+        self.times = array('d', [float('-inf')])*_iHitCount
+        self.index = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def hit(self, _fTime):
+        """
+        Record a hit at the given time; returns the time of the oldest of the
+        last hits (-inf if fewer hits than the ring buffer size were recorded).
+
+        @param  float  _fTime  Hit time, as a UNIX timestamp
+        """
+
+        iIndex = self.index
+        self.times[iIndex] = _fTime
+        iIndex += 1
+        if iIndex==len(self.times):
+            iIndex = 0
+        self.index = iIndex
+        return self.times[iIndex]
+
+
+    def last(self):
+        """
+        Return the time of the last hit.
+        """
+
+        return self.times[self.index-1]
+
+
+class Threshold(Conditioner):
+    """
+    Sliding-Window Threshold Conditioner.
+
+    This conditioner counts hits per key - by default the filter (output) data,
+    e.g. an IP address - and returns the provided data only when the key was
+    hit (at least) the configured count of times within the configured sliding
+    time window (seconds); otherwise, None is returned (which will make the
+    parent watcher stop further processing of the data).
+
+    This allows to feed only actionable data to the consumers, rather than each
+    and every hit (which consumers would then have to count on their own; e.g.
+    iptables 'recent' module).
+
+    The hits of each key are kept in a fixed-size ring buffer (the hit count);
+    keys are evicted once their last hit is older than the time window, and
+    the count of tracked keys is capped (least recently hit keys being evicted
+    first), thus bounding the memory used.
+
+    Hits are timed by the data ingest time (see Data), i.e. the time they were
+    read by the producer, such as data delayed by queueing or spooling (and
+    replayed in a burst) are still counted within their original time window.
+
+    NB: for the same key to always be counted by the same worker process, a
+        'partition' key must be configured along the 'parallel' setting (see
+        the watcher configuration).
+
+    Configuration parameters are:
+     - [REQ] hitcount=<int>
+             Count of hits required for the data to be returned
+     - [REQ] seconds=<float>
+             Time window, in seconds
+     - [opt] key=<string>
+             Key template (using '%{<name>}' snippets of named fields; see
+             Data), e.g. '%{ip}' or '%{user}@%{ip}' (default: filter output
+             data)
+     - [opt] keys=<int> (default: 100000)
+             Maximum count of tracked keys
+     - [opt] reset (flag)
+             Forget the key hits once the threshold is reached (such as data
+             are returned once per hitcount hits, rather than for each hit
+             beyond the threshold)
+
+    Example (watcher configuration):
+     - filters = Grep?pattern=Failed password for .* from (%{ip})&group=1,
+     - conditioners = Threshold?hitcount=5&seconds=600&reset,
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sConfiguration):
+        # Parent constructor
+        Conditioner.__init__(self, _oWatcher, _sConfiguration)
+
+        # Configuration
+        dConfiguration = urllib.parse.parse_qs(_sConfiguration, keep_blank_values=True)
+        dConfiguration_keys = dConfiguration.keys()
+
+        # ... hit count
+        if 'hitcount' not in dConfiguration_keys:
+            _oWatcher.log('ERROR[Conditioner:Threshold(%s)]: Missing \'hitcount\' configuration parameter\n' % _oWatcher.name())
+            raise RuntimeError('Missing \'hitcount\' configuration parameter')
+        try:
+            self.__iHitCount = int(dConfiguration['hitcount'][0])
+            if self.__iHitCount<1:
+                raise ValueError('Invalid hit count (%d)' % self.__iHitCount)
+        except Exception:
+            _oWatcher.log('ERROR[Conditioner:Threshold(%s)]: Invalid \'hitcount\' configuration parameter\n' % _oWatcher.name())
+            raise
+
+        # ... seconds
+        if 'seconds' not in dConfiguration_keys:
+            _oWatcher.log('ERROR[Conditioner:Threshold(%s)]: Missing \'seconds\' configuration parameter\n' % _oWatcher.name())
+            raise RuntimeError('Missing \'seconds\' configuration parameter')
+        try:
+            self.__fSeconds = float(dConfiguration['seconds'][0])
+            if self.__fSeconds<=0.0:
+                raise ValueError('Invalid time window (%s)' % self.__fSeconds)
+        except Exception:
+            _oWatcher.log('ERROR[Conditioner:Threshold(%s)]: Invalid \'seconds\' configuration parameter\n' % _oWatcher.name())
+            raise
+
+        # ... key
+        self.__sKey = None
+        if 'key' in dConfiguration_keys:
+            self.__sKey = dConfiguration['key'][0]
+
+        # ... keys
+        self.__iKeys = 100000
+        if 'keys' in dConfiguration_keys:
+            try:
+                self.__iKeys = int(dConfiguration['keys'][0])
+                if self.__iKeys<1:
+                    raise ValueError('Invalid keys count (%d)' % self.__iKeys)
+            except Exception:
+                _oWatcher.log('ERROR[Conditioner:Threshold(%s)]: Invalid \'keys\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... reset
+        self.__bReset = False
+        if 'reset' in dConfiguration_keys:
+            self.__bReset = True
+
+        # Fields
+        self.__odHits = OrderedDict()
+        self.__iPassed = 0
+        self.__iHeld = 0
+        self.__iExpired = 0
+        self.__iEvicted = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def stateful(self):
+        # Stateful
+        return True
+
+
+    def statistics(self):
+        # Statistics
+        return {
+            'keys': len(self.__odHits),
+            'passed': self.__iPassed,
+            'held': self.__iHeld,
+            'expired': self.__iExpired,
+            'evicted': self.__iEvicted,
+        }
+
+
+    def feed(self, _oData):
+        fTime = _oData.time
+        fWindow = fTime-self.__fSeconds
+
+        # Evict expired keys
+        # NB: keys are ordered by last hit (least recently hit first)
+        odHits = self.__odHits
+        while odHits:
+            oHits = next(iter(odHits.values()))
+            if oHits.last()>=fWindow:
+                break
+            odHits.popitem(last=False)
+            self.__iExpired += 1
+
+        # Hit the key
+        sKey = _oData.expand(self.__sKey) if self.__sKey is not None else _oData.data
+        oHits = odHits.get(sKey)
+        if oHits is None:
+            oHits = ThresholdHits(self.__iHitCount)
+            odHits[sKey] = oHits
+            if len(odHits)>self.__iKeys:
+                odHits.popitem(last=False)
+                self.__iEvicted += 1
+        else:
+            odHits.move_to_end(sKey)
+        if oHits.hit(fTime)<fWindow:
+            self.__iHeld += 1
+            return None
+
+        # Output
+        if self.__bReset:
+            del odHits[sKey]
+        self.__iPassed += 1
+        return _oData
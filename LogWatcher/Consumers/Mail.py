@@ -68,6 +68,9 @@ class Mail(Consumer):
      - '%{watcher}':  the watcher name
      - '%{data}':     the filter (output) data
      - '%{data_raw}': the producer (raw) data
+     - '%{source}':   the data source (e.g. the originating file path)
+     - '%{time}':     the data ingest time (UNIX timestamp)
+     - '%{<name>}':   the given named field (set by filters or conditioners)
 
     Example (watcher configuration):
      - consumers = Mail?to=root@example.org,
@@ -151,17 +154,10 @@ I just got the following data for your attention:
     def feed(self, _oData):
         # Build the mail message
         # ... body
-        sBody = self.__sTemplate
-        sBody = sBody.replace('%{hostname}', self.__sHostname) \
-            .replace('%{watcher}', _oData.watcher) \
-            .replace('%{data}', _oData.data) \
-            .replace('%{data_raw}', _oData.data_raw)
+        dVariables = {'hostname': self.__sHostname}
+        sBody = _oData.expand(self.__sTemplate, dVariables)
         # ... subject
-        sSubject = self.__sSubject
-        sSubject = sSubject.replace('%{hostname}', self.__sHostname) \
-            .replace('%{watcher}', _oData.watcher) \
-            .replace('%{data}', _oData.data) \
-            .replace('%{data_raw}', _oData.data_raw)
+        sSubject = _oData.expand(self.__sSubject, dVariables)
         # ... headers
         oMIMEText = MIMEText( sBody, 'plain' )
         oMIMEText['From'] = self.__sFrom
@@ -56,9 +56,21 @@ class Syslog(Consumer):
              Syslog level
      - [opt] prefix=<string>
              Prefix data written to syslog
+     - [opt] format=<string> (default: '%{data}')
+             Data template; '%{<name>}' snippets being replaced by the
+             corresponding data field (see below)
      - [opt] suffix=<string>
              Suffix data written to syslog
 
+    In addition, the following "magic snippets" can be used in the data
+    template:
+     - '%{watcher}':  the watcher name
+     - '%{data}':     the filter (output) data
+     - '%{data_raw}': the producer (raw) data
+     - '%{source}':   the data source (e.g. the originating file path)
+     - '%{time}':     the data ingest time (UNIX timestamp)
+     - '%{<name>}':   the given named field (set by filters or conditioners)
+
     Please refer to 'man 3 syslog' for the list of supported syslog facilities
     and levels.
 
@@ -164,6 +176,11 @@ class Syslog(Consumer):
         if 'suffix' in dConfiguration_keys:
             self.__sSuffix = dConfiguration['suffix'][0]
 
+        # ... format
+        self.__sFormat = None
+        if 'format' in dConfiguration_keys:
+            self.__sFormat = dConfiguration['format'][0]
+
         # Socket
         # NOTE: we must implement our own socket-level client since Python standard syslog
         #       libraries are too closely tied to Python logging API
@@ -219,7 +236,7 @@ class Syslog(Consumer):
 
     def feed(self, _oData):
         # Write the data to syslog
-        sData = '%s%s%s\n' % (self.__sPrefix, _oData.data, self.__sSuffix)
+        sData = '%s%s%s\n' % (self.__sPrefix, _oData.data if self.__sFormat is None else _oData.expand(self.__sFormat), self.__sSuffix)
         if self._bDebug:
             self._oWatcher.log('DEBUG[Consumer:Syslog(%s)]: Consumed data\n%s' % (self._oWatcher.name(), sData))
         #sMessage = self.__sFormatter % (time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), sData)
@@ -48,9 +48,21 @@ class Write(Consumer):
              when it exits (rather than each time data must be written to it)
      - [opt] prefix=<string>
              Prefix data written to file
+     - [opt] format=<string> (default: '%{data}')
+             Data template; '%{<name>}' snippets being replaced by the
+             corresponding data field (see below)
      - [opt] suffix=<string>
              Suffix data written to file
 
+    In addition, the following "magic snippets" can be used in the data
+    template:
+     - '%{watcher}':  the watcher name
+     - '%{data}':     the filter (output) data
+     - '%{data_raw}': the producer (raw) data
+     - '%{source}':   the data source (e.g. the originating file path)
+     - '%{time}':     the data ingest time (UNIX timestamp)
+     - '%{<name>}':   the given named field (set by filters or conditioners)
+
     Example (watcher configuration):
      - consumers = Write?file=/var/log/badauth.log&exclusive,
     """
@@ -91,6 +103,11 @@ class Write(Consumer):
         if 'suffix' in dConfiguration_keys:
             self.__sSuffix = dConfiguration['suffix'][0]
 
+        # ... format
+        self.__sFormat = None
+        if 'format' in dConfiguration_keys:
+            self.__sFormat = dConfiguration['format'][0]
+
         # File
         self.__oFile = None
         if self.__bExclusive:
@@ -103,7 +120,7 @@ class Write(Consumer):
 
     def feed(self, _oData):
         # Write the data to file
-        sData = '%s%s%s\n' % (self.__sPrefix, _oData.data, self.__sSuffix)
+        sData = '%s%s%s\n' % (self.__sPrefix, _oData.data if self.__sFormat is None else _oData.expand(self.__sFormat), self.__sSuffix)
         if self._bDebug:
             self._oWatcher.log('DEBUG[Consumer:Write(%s)]: Consumed data\n%s' % (self._oWatcher.name(), sData))
         if self.__oFile is None:
@@ -51,7 +51,13 @@ from LogWatcher import \
      LOGWATCHER_VERSION, \
      LOGWATCHER_CONFIGSPEC, \
     Logger, \
+    Partitioner, \
+    RegExp, \
+    Scheduler, \
+    Sharder, \
+    Supervisor, \
     Watcher
+from LogWatcher.Producers.ProducerSpool import ProducerSpool
 
 
 #------------------------------------------------------------------------------
@@ -80,8 +86,12 @@ class Daemon:
 
         # ... runtime
         self.__iPID = os.getpid()
-        self.__oLockLog = threading.Lock()
+        self.__oLockLog = threading.RLock()
         self.__loWatchers = []
+        self.__oScheduler = None
+        self.__oSupervisor = None
+        self.__oSharder = None
+        self.__lsShardWatchers = None
         self.__bStop = False
         self.__bDebug = False
 
@@ -231,8 +241,20 @@ class Daemon:
         return self.__iPID
 
 
-    def __startWatcher(self, _oWatcher):
-        _oWatcher.run()
+    def scheduler(self):
+        """
+        Return the event loop scheduler (None if watchers run in their own thread).
+        """
+
+        return self.__oScheduler
+
+
+    def supervisor(self):
+        """
+        Return the watchers supervisor.
+        """
+
+        return self.__oSupervisor
 
 
     def __spawnWatchers(self, _oConfigObj):
@@ -241,16 +263,45 @@ class Daemon:
         """
 
         # Delay
-        if _oConfigObj['LogWatcher']['delay']>0:
+        if _oConfigObj['LogWatcher']['delay']>0 and self.__lsShardWatchers is None:
             if self.__bDebug:
                 sys.stderr.write('DEBUG[Daemon]: Waiting %d seconds before start...\n' % _oConfigObj['LogWatcher']['delay'])
             time.sleep(_oConfigObj['LogWatcher']['delay'])
             if self.__bStop: return
 
+        # Regular expressions snippets
+        dSnippets = _oConfigObj['LogWatcher']['snippets']
+        for sSnippetName in dSnippets.keys():
+            try:
+                RegExp.snippet(sSnippetName, dSnippets[sSnippetName])
+                if self.__bDebug:
+                    sys.stderr.write('DEBUG[Daemon]: Snippet %%{%s} registered\n' % sSnippetName)
+            except Exception as e:
+                sys.stderr.write('ERROR[Daemon]: Invalid snippet %%{%s}\n%s\n' % (sSnippetName, str(e)))
+
+        # Worker processes
+        if _oConfigObj['LogWatcher']['processes']>1 and self.__lsShardWatchers is None:
+            return self.__spawnShards(_oConfigObj)
+
+        # Watchers supervisor
+        self.__oSupervisor = Supervisor(self)
+
+        # Event loop scheduler
+        if _oConfigObj['LogWatcher']['scheduler']=='loop':
+            self.__oScheduler = Scheduler(self, _oConfigObj['LogWatcher']['workers'])
+
+        # Shareable producers (data sources)
+        dProducersShared = {}
+
+        # Configured watchers
+        ltWatchers = []
+
         # Loop through configured watchers (<=> sections)
         for sWatcherName in _oConfigObj.keys():
             if sWatcherName=='LogWatcher':
                 continue  # global configuration
+            if self.__lsShardWatchers is not None and sWatcherName not in self.__lsShardWatchers:
+                continue  # other worker process
 
             dWatcherConfig = _oConfigObj[sWatcherName]
             dWatcherConfig_keys = dWatcherConfig.keys()
@@ -279,20 +330,21 @@ class Daemon:
             # Timeout
             fTimeout = dWatcherConfig['timeout']
 
-            # Producer
-            dPluginConfig = urllib.parse.urlparse(dWatcherConfig['producer'])
-            sPluginName = dPluginConfig.path
-            try:
-                oPluginClass = getattr(__import__('LogWatcher.Producers.%s' % sPluginName, fromlist=['LogWatcher.Producers']), sPluginName)
-                oProducer = oPluginClass(oWatcher, dPluginConfig.query, bSynchronous, bBlocking, fTimeout)
-                oWatcher.setProducer(oProducer)
-                if self.__bDebug:
-                    sys.stderr.write('DEBUG[Daemon(%s)]: Producer instantiated (%s)\n' % (sWatcherName, sPluginName))
-            except Exception as e:
-                sys.stderr.write('ERROR[Daemon(%s)]: Invalid producer (%s)\n%s\n' % (sWatcherName, sPluginName, str(e)))
-                if self.__bDebug:
-                    traceback.print_exc()
-                continue
+            # Overflow spool (non-blocking)
+            if dWatcherConfig['overflow']=='spool' and not bSynchronous and not bBlocking:
+                try:
+                    oWatcher.setSpool(ProducerSpool(oWatcher, dWatcherConfig['spool'], dWatcherConfig['spool_memory'], dWatcherConfig['spool_disk']*1048576))
+                    if self.__bDebug:
+                        sys.stderr.write('DEBUG[Daemon(%s)]: Overflow spool instantiated\n' % sWatcherName)
+                except Exception as e:
+                    sys.stderr.write('ERROR[Daemon(%s)]: Invalid overflow spool\n%s\n' % (sWatcherName, str(e)))
+                    if self.__bDebug:
+                        traceback.print_exc()
+                    continue
+
+            # Programs (syslog tags)
+            if dWatcherConfig['program']:
+                oWatcher.setPrograms(dWatcherConfig['program'])
 
             # Filters
             try:
@@ -351,65 +403,153 @@ class Daemon:
             except Exception:
                 continue
 
+            # Memoization cache
+            if dWatcherConfig['cache']>0:
+                if oWatcher.setCache(dWatcherConfig['cache'], dWatcherConfig['cache_ttl']) and self.__bDebug:
+                    sys.stderr.write('DEBUG[Daemon(%s)]: Memoization cache enabled (%d lines)\n' % (sWatcherName, dWatcherConfig['cache']))
+
+            # Parallel filters/conditioners (worker processes)
+            # NB: worker processes are forked before any producer (thread) is started
+            oPartitioner = None
+            if dWatcherConfig['parallel']>1:
+                try:
+                    oPartitioner = Partitioner(oWatcher, dWatcherConfig['parallel'], dWatcherConfig['partition'])
+                    oWatcher.setPartitioner(oPartitioner)
+                    oPartitioner.fork()
+                    if self.__bDebug:
+                        sys.stderr.write('DEBUG[Daemon(%s)]: Partitioner forked (%d worker processes)\n' % (sWatcherName, dWatcherConfig['parallel']))
+                except Exception as e:
+                    sys.stderr.write('ERROR[Daemon(%s)]: Invalid partitioner\n%s\n' % (sWatcherName, str(e)))
+                    if self.__bDebug:
+                        traceback.print_exc()
+                    continue
+
+            # Configured watcher
+            ltWatchers.append((sWatcherName, dWatcherConfig, oWatcher, oPartitioner, bSynchronous, bBlocking, fTimeout))
+
+        # Loop through configured watchers (producers)
+        for (sWatcherName, dWatcherConfig, oWatcher, oPartitioner, bSynchronous, bBlocking, fTimeout) in ltWatchers:
+            # Producer
+            dPluginConfig = urllib.parse.urlparse(dWatcherConfig['producer'])
+            sPluginName = dPluginConfig.path
+            try:
+                oPluginClass = getattr(__import__('LogWatcher.Producers.%s' % sPluginName, fromlist=['LogWatcher.Producers']), sPluginName)
+                oProducer = oPluginClass(oWatcher, dPluginConfig.query, bSynchronous, bBlocking, fTimeout)
+                oWatcher.setProducer(oProducer)
+                if self.__bDebug:
+                    sys.stderr.write('DEBUG[Daemon(%s)]: Producer instantiated (%s)\n' % (sWatcherName, sPluginName))
+            except Exception as e:
+                sys.stderr.write('ERROR[Daemon(%s)]: Invalid producer (%s)\n%s\n' % (sWatcherName, sPluginName, str(e)))
+                if self.__bDebug:
+                    traceback.print_exc()
+                if oPartitioner is not None:
+                    oPartitioner.stop()
+                continue
+
+            # Parallel filters/conditioners (merging thread)
+            if oPartitioner is not None:
+                oPartitioner.start()
+                if self.__bDebug:
+                    sys.stderr.write('DEBUG[Daemon(%s)]: Partitioner started\n' % sWatcherName)
+
+            # Share producer (data source)
+            sProducerKey = oProducer.shareable()
+            if sProducerKey is not None:
+                if sProducerKey in dProducersShared.keys():
+                    oProducer.share(dProducersShared[sProducerKey])
+                    if self.__bDebug:
+                        sys.stderr.write('DEBUG[Daemon(%s)]: Producer shared (%s)\n' % (sWatcherName, sProducerKey))
+                else:
+                    dProducersShared[sProducerKey] = oProducer
+
             # Add watcher
             self.__loWatchers.append(oWatcher)
-            # ... thread
-            sThreadName = '%s.Watcher' % sWatcherName
-            oThread = threading.Thread(name=sThreadName, target=self.__startWatcher, args=[oWatcher])
-            oThread.start()
+            bScheduled = self.__oScheduler is not None and oProducer.schedulable()
+            if bScheduled:
+                self.__oScheduler.add(oWatcher, oProducer, bSynchronous, bBlocking, fTimeout)
+            self.__oSupervisor.add(oWatcher, bScheduled)
+
+        # Regular expressions engines
+        dCompiled = RegExp.compiled()
+        if RegExp.available():
+            for (sOwner, sPattern, sError) in RegExp.fallbacks():
+                sys.stderr.write('WARNING[Daemon(%s)]: Pattern not supported by the linear-time regular expression engine (re2); using the standard engine (re)\n%s\n%s\n' % (sOwner, sPattern, sError))
+            sys.stderr.write('INFO[Daemon]: %d/%d patterns compiled with the linear-time regular expression engine (re2)\n' % (dCompiled['re2'], dCompiled['re2']+dCompiled['re']))
+        elif dCompiled['re'] and self.__bDebug:
+            sys.stderr.write('DEBUG[Daemon]: Linear-time regular expression engine (re2) not available; patterns compiled with the standard engine (re)\n')
+        if dCompiled['shared'] and self.__bDebug:
+            sys.stderr.write('DEBUG[Daemon]: %d/%d patterns shared (compiled once)\n' % (dCompiled['shared'], dCompiled['re2']+dCompiled['re']))
+
+        # Start watchers
+        # NB: once all watchers are configured and their producers shared
+        if self.__oScheduler is not None:
+            self.__oScheduler.start()
             if self.__bDebug:
-                sys.stderr.write('DEBUG[Daemon(%s)]: Watcher thread started\n' % sWatcherName)
+                sys.stderr.write('DEBUG[Daemon]: Event loop scheduler started\n')
+        self.__oSupervisor.start()
+        sys.stderr.write('INFO[Daemon]: %d watchers activated\n' % len(self.__loWatchers))
 
-        # Watchers
-        iWatchers = len(self.__loWatchers)
-        sys.stderr.write('INFO[Daemon]: %d watchers activated\n' % iWatchers)
+        # Supervise watchers until they all exit
+        if self.__bStop:
+            self.__oSupervisor.stop()
+        self.__oSupervisor.run()
+        if self.__oScheduler is not None:
+            self.__oScheduler.stop()
 
-        # Wait until all watchers exit
-        while True:
+        # Done
+        sys.stderr.write('INFO[Daemon]: Done\n')
 
-            # Stop ?
-            if self.__bStop:
-                iStopAttempts = 12
-                while True:
-                    iStopAttempts -= 1
-                    loThreadsActive =  threading.enumerate()
-                    iThreadsActive = len(loThreadsActive)
-                    if iStopAttempts<0:
-                        for oThread in loThreadsActive:
-                            sys.stderr.write('ERROR[Daemon(%s)]: Watcher failed to terminate in time\n' % oThread.name)
-                        sys.stderr.write('ERROR[Daemon]: Watchers failed to terminate in time; exiting ungracefully\n')
-                        break
-                    if iThreadsActive>1:
-                        if self.__bDebug:
-                            sys.stderr.write('DEBUG[Daemon]: Stopping / Waiting for %d threads to terminate\n' % (iThreadsActive-1))
-                        time.sleep(1)
-                    else:
-                        break
-                break
 
-            # Check watchers threads
-            loThreadsActive =  threading.enumerate()
-            iThreadsActive = len(loThreadsActive)
-            if iThreadsActive>1:
-                iThreadsWatchers = 0
-                for oThread in loThreadsActive:
-                    if oThread.name[-7:]=='Watcher':
-                        iThreadsWatchers += 1
-                if iThreadsWatchers!=iWatchers:
-                    sys.stderr.write('WARNING[Daemon]: Only %d/%d watchers are running\n' % (iThreadsWatchers, iWatchers))
-                if self.__bDebug:
-                    sys.stderr.write('DEBUG[Daemon]: All %d watchers are running\n' % iThreadsWatchers)
-            else:
-                sys.stderr.write('ERROR[Daemon]: No more threads are running; exiting\n')
-                break
+    def __spawnShards(self, _oConfigObj):
+        """
+        Split the configured watchers across worker processes and supervise them.
+        """
 
-            # Sleep
-            time.sleep(5)
+        # Split watchers
+        ltWatchers = []
+        for sWatcherName in _oConfigObj.keys():
+            if sWatcherName=='LogWatcher':
+                continue  # global configuration
+            dWatcherConfig = _oConfigObj[sWatcherName]
+            if not dWatcherConfig['enable']:
+                continue
+            ltWatchers.append((sWatcherName, dWatcherConfig['producer'], dWatcherConfig['process'], dWatcherConfig['weight']))
+        llsWatchers = [lsWatchers for lsWatchers in Sharder.split(ltWatchers, _oConfigObj['LogWatcher']['processes']) if lsWatchers]
+
+        # Start worker processes
+        self.__oSharder = Sharder(self, llsWatchers, self.__runShard)
+        self.__oSharder.start()
+        sys.stderr.write('INFO[Daemon]: %d watchers dispatched to %d worker processes\n' % (len(ltWatchers), len(llsWatchers)))
+
+        # Supervise worker processes until stopped
+        while True:
+            if self.__bStop:
+                self.__oSharder.stop(12.0)
+                break
+            self.__oSharder.poll(1.0)
 
         # Done
         sys.stderr.write('INFO[Daemon]: Done\n')
 
 
+    def __runShard(self, _iIndex, _lsWatchers):
+        """
+        Run the given watchers (worker process); returns a non-zero exit code in case of failure.
+        """
+
+        # Worker process
+        self.__iPID = os.getpid()
+        self.__oLockLog = threading.RLock()
+        self.__oSharder = None
+        self.__lsShardWatchers = _lsWatchers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, self.__signal)
+        signal.signal(signal.SIGUSR1, self.__signalStatistics)
+        if self.__bDebug:
+            sys.stderr.write('DEBUG[Daemon(%d)]: Worker process started (PID:%d)\n' % (_iIndex, self.__iPID))
+        return self.__spawnWatchers(self.__oConfigObj)
+
+
     def __syslog(self, _sMessage):
         iLevel = syslog.LOG_INFO
         if _sMessage.find('ERROR') >= 0:
@@ -425,6 +565,10 @@ class Daemon:
         self.stop()
 
 
+    def __signalStatistics(self, signal, frame):
+        self.statistics()
+
+
     def __daemon(self):
         """
         Daemonizes the process; returns a non-zero exit code in case of failure.
@@ -442,7 +586,7 @@ class Daemon:
 
             # Create daemon context
             oDaemonContext = DaemonContext(pidfile=oPidLockFile)
-            oDaemonContext.signal_map = { signal.SIGTERM: self.__signal }
+            oDaemonContext.signal_map = { signal.SIGTERM: self.__signal, signal.SIGUSR1: self.__signalStatistics }
             oDaemonContext.open()
             emit_message('[%s]' % os.getpid())
 
@@ -516,6 +660,7 @@ class Daemon:
             sys.stderr.write('DEBUG[Daemon]: Starting foreground processing\n')
         signal.signal(signal.SIGINT, self.__signal)
         signal.signal(signal.SIGTERM, self.__signal)
+        signal.signal(signal.SIGUSR1, self.__signalStatistics)
         return self.__spawnWatchers(self.__oConfigObj)
 
 
@@ -526,8 +671,25 @@ class Daemon:
 
         sys.stderr.write('INFO[Daemon]: Stop request received; stopping...\n')
         self.__bStop = True
-        for oWatcher in self.__loWatchers:
-            oWatcher.stop()
+        if self.__oSupervisor is not None:
+            self.__oSupervisor.stop()
+        if self.__oScheduler is not None:
+            self.__oScheduler.stop()
+
+
+    def statistics(self):
+        """
+        Request the statistics (counters) of all watchers to be logged (by the
+        supervisor loop or the worker processes).
+
+        NB: this method is called from the SIGUSR1 signal handler.
+        """
+
+        if self.__oSharder is not None:
+            self.__oSharder.signal(signal.SIGUSR1)
+            return
+        if self.__oSupervisor is not None:
+            self.__oSupervisor.statistics()
 
 
     def debug(self):
@@ -17,6 +17,26 @@
 # See the GNU General Public License for more details.
 #
 
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import re
+import time
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Data attributes (also available as fields)
+DATA_ATTRIBUTES = ('watcher', 'data', 'data_raw', 'source', 'time')
+
+# Template fields: %{<name>}
+DATA_TEMPLATE = re.compile(r'%\{([A-Za-z_][-A-Za-z0-9_.]*)\}')
+
+
 #------------------------------------------------------------------------------
 # CLASSES
 #------------------------------------------------------------------------------
@@ -29,22 +49,155 @@ class Data:
      - the originating watcher name (self.watcher)
      - the producer (raw) data (self.data_raw)
      - the filter (output) data (self.data)
+     - the data source, if known (self.source); e.g. the originating file path
+     - the data ingest time (self.time), as a UNIX timestamp; i.e. the time
+       the producer read the data (rather than processed them)
+     - named fields (see field(), setField() and fields()), which filters and
+       conditioners may set and read and templates (see expand()) refer to
+
+    Named fields are stored in a mapping which is only allocated once a field
+    is set; filters may also provide a function returning the fields, called
+    only if (and when) the fields are eventually needed.
     """
 
+    __slots__ = ('watcher', 'data_raw', 'data', 'source', 'time', '__oFields')
+
     #------------------------------------------------------------------------------
     # CONSTRUCTORS / DESTRUCTOR
     #------------------------------------------------------------------------------
 
-    def __init__(self, _sWatcher, _sDataRaw, _sData):
+    def __init__(self, _sWatcher, _sDataRaw, _sData, _sSource=None, _oFields=None, _fTime=None):
         """
         Constructor.
 
         @param  string  _sWatcher  Originating watcher name
         @param  string  _sDataRaw  Producer (raw) data
         @param  string  _sData     Filter (output) data
+        @param  string  _sSource   Data source (optional)
+        @param  object  _oFields   Named fields, as a dictionary or a function returning it (optional)
+        @param  float   _fTime     Ingest time, as a UNIX timestamp (optional; default: now)
         """
 
         # Fields
         self.watcher = _sWatcher
         self.data_raw = _sDataRaw
         self.data = _sData
+        self.source = _sSource
+        self.time = _fTime if _fTime is not None else time.time()
+        self.__oFields = _oFields
+
+
+    def __getstate__(self):
+        return (self.watcher, self.data_raw, self.data, self.source, self.time, self.fields() or None)
+
+
+    def __setstate__(self, _tState):
+        (self.watcher, self.data_raw, self.data, self.source, self.time, self.__oFields) = _tState
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def __fields(self):
+        """
+        Return the named fields dictionary (None if there are no fields),
+        calling the fields function if need be.
+        """
+
+        oFields = self.__oFields
+        if oFields is None or isinstance(oFields, dict):
+            return oFields
+        oFields = oFields()
+        self.__oFields = oFields
+        return oFields
+
+
+    def field(self, _sName, _sDefault=None):
+        """
+        Return the given field; either a named field or a data attribute (e.g.
+        'data' or 'source').
+
+        @param  string  _sName     Field name
+        @param  string  _sDefault  Default value (if the field is not set)
+        """
+
+        dFields = self.__fields()
+        if dFields is not None:
+            sValue = dFields.get(_sName)
+            if sValue is not None:
+                return sValue
+        if _sName in DATA_ATTRIBUTES:
+            oValue = getattr(self, _sName)
+            if oValue is not None:
+                return oValue if isinstance(oValue, str) else str(oValue)
+        return _sDefault
+
+
+    def fields(self):
+        """
+        Return the named fields, as a dictionary (empty if there are no fields).
+        """
+
+        dFields = self.__fields()
+        return dFields if dFields is not None else {}
+
+
+    def setField(self, _sName, _sValue):
+        """
+        Set the given named field.
+
+        @param  string  _sName   Field name
+        @param  string  _sValue  Field value
+        """
+
+        dFields = self.__fields()
+        if dFields is None:
+            dFields = {}
+            self.__oFields = dFields
+        dFields[_sName] = _sValue
+
+
+    def setFields(self, _dFields):
+        """
+        Set (update) the given named fields.
+
+        @param  dict  _dFields  Fields (name -> value)
+        """
+
+        dFields = self.__fields()
+        if dFields is None:
+            dFields = {}
+            self.__oFields = dFields
+        dFields.update(_dFields)
+
+
+    def expand(self, _sTemplate, _dVariables=None, _fnEscape=None):
+        """
+        Return the given template, with its '%{<name>}' snippets replaced by the
+        corresponding field (see field()) or - if provided - variable (unknown
+        snippets being left unchanged; unset data attributes being replaced by
+        an empty string).
+
+        NB: the template is expanded in a single pass (snippets in the replaced
+            values are NOT expanded).
+
+        @param  string    _sTemplate   Template
+        @param  dict      _dVariables  Additional variables (name -> value; optional)
+        @param  function  _fnEscape    Replaced values escaping function (optional)
+        """
+
+        if '%{' not in _sTemplate:
+            return _sTemplate
+
+        def fnField(_oMatch):
+            sName = _oMatch.group(1)
+            if _dVariables is not None and sName in _dVariables:
+                sValue = _dVariables[sName]
+            else:
+                sValue = self.field(sName, '' if sName in DATA_ATTRIBUTES else None)
+                if sValue is None:
+                    return _oMatch.group(0)
+            return _fnEscape(sValue) if _fnEscape is not None else sValue
+
+        return DATA_TEMPLATE.sub(fnField, _sTemplate)
@@ -41,6 +41,24 @@ class Filter(Plugin):
     # METHODS - TO BE OVERRIDDEN
     #------------------------------------------------------------------------------
 
+    def regexp(self):
+        """
+        Return the (compiled) regular expression the entire data (line) must
+        match for this filter to match (None if there is no such expression).
+
+        Consecutive filters providing such a regular expression are fused by
+        their parent watcher, which allows to reject non-matching data with a
+        single scan.
+
+        The default implementation is not to provide any regular expression
+        (return None).
+        """
+
+        # Regular expression
+        # (this is where your filter may expose its line regular expression)
+        return None
+
+
     def feed(self, _sData):
         """
         Filter (raw) data (line) fed by the producer.
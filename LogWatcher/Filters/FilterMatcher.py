@@ -0,0 +1,217 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import re
+
+# LogWatcher
+from LogWatcher import RegExp
+from .FilterPrefilter import FilterPrefilter
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Regular expression constructs which depend on groups numbering (or naming)
+FILTERMATCHER_NUMBERED = re.compile(r'\\[1-9]|\(\?\([0-9A-Za-z_]|\(\?P=')
+
+# Regular expression named groups
+FILTERMATCHER_NAMED = re.compile(r'(?<!\\)\(\?P<[A-Za-z_][A-Za-z0-9_]*>')
+
+# Regular expression global inline flags
+FILTERMATCHER_GLOBAL = re.compile(r'^\(\?[aiLmsux]+\)')
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class FilterMatcher:
+    """
+    Fused Filters Matcher.
+
+    This class/object fuses consecutive (line) regular expression filters into
+    a single - alternation - regular expression, which allows to reject lines
+    matching none of these filters with a single scan (rather than one scan per
+    filter).
+
+    Lines matching the fused regular expression are then dispatched to the
+    filters, each in turn, the first matching filter providing the output data
+    (as usual).
+
+    If each fused filter requires a literal to match (see FilterPrefilter),
+    lines containing none of those literals are rejected without running the
+    regular expression engine at all.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _loFilters, _oRegExp, _lsLiterals):
+        """
+        Constructor.
+
+        @param  list    _loFilters   Fused filters
+        @param  object  _oRegExp     Fused (compiled) regular expression
+        @param  list    _lsLiterals  Fused filters required literals (None if any filter has none)
+        """
+
+        # Fields
+        self.__loFilters = _loFilters
+        self.__oRegExp = _oRegExp
+        self.__tLiterals = tuple(_lsLiterals) if _lsLiterals is not None else None
+        self.__iPrefiltered = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def alternative(_oRegExp):
+        """
+        Return the given (compiled) regular expression as an alternative of a
+        fused regular expression (None if it can not be fused).
+
+        @param  object  _oRegExp  Compiled regular expression
+        """
+
+        # NB: global inline flags (e.g. '(?i)...') are part of the compiled flags
+        sPattern = FILTERMATCHER_GLOBAL.sub('', _oRegExp.pattern, 1)
+        if FILTERMATCHER_NUMBERED.search(sPattern):
+            return None  # back-references/conditionals
+        # NB: named groups may be defined by several filters (and are not needed to scan the data)
+        sPattern = FILTERMATCHER_NAMED.sub('(?:', sPattern)
+        if _oRegExp.flags & re.VERBOSE:
+            return '(?:%s\n)' % sPattern
+        return '(?:%s)' % sPattern
+
+
+    @staticmethod
+    def chain(_oWatcher, _loFilters):
+        """
+        Return the given filters list, where consecutive (line) regular
+        expression filters are replaced by their fused matcher.
+
+        NB: only filters sharing the same flags - and regular expression engine -
+            are fused (scoped flags would defeat the regular expression engine
+            optimizations).
+
+        @param  Watcher  _oWatcher   Parent watcher
+        @param  list     _loFilters  Filters
+        """
+
+        loChain = []
+        ltRun = []
+        tRunFlags = None
+        for oFilter in _loFilters+[None]:
+            sAlternative = None
+            tFlags = None
+            if oFilter is not None:
+                oRegExp = oFilter.regexp()
+                if oRegExp is not None:
+                    sAlternative = FilterMatcher.alternative(oRegExp)
+                    tFlags = (oRegExp.flags, RegExp.engine(oRegExp))
+            if sAlternative is not None and (not ltRun or tFlags==tRunFlags):
+                ltRun.append((oFilter, sAlternative))
+                tRunFlags = tFlags
+                continue
+            loChain.extend(FilterMatcher.__fuse(_oWatcher, ltRun, tRunFlags))
+            ltRun = []
+            if sAlternative is not None:
+                ltRun.append((oFilter, sAlternative))
+                tRunFlags = tFlags
+            elif oFilter is not None:
+                loChain.append(oFilter)
+        return loChain
+
+
+    @staticmethod
+    def __fuse(_oWatcher, _ltRun, _tFlags):
+        """
+        Return the given consecutive filters as a list made of their fused
+        matcher (or the filters themselves if they can not be fused).
+
+        @param  Watcher  _oWatcher  Parent watcher
+        @param  list     _ltRun     Filters (filter, alternative) tuples
+        @param  tuple    _tFlags    Regular expression (flags, engine) tuple
+        """
+
+        loFilters = [oFilter for (oFilter, _) in _ltRun]
+        if len(loFilters)<2:
+            return loFilters
+        try:
+            oRegExp = RegExp.compile('|'.join([sAlternative for (_, sAlternative) in _ltRun]), _tFlags[0], _tFlags[1])
+        except Exception as e:
+            _oWatcher.log('WARNING[Watcher(%s)]: Failed to fuse filters; matching them one by one\n%s\n' % (_oWatcher.name(), str(e)))
+            return loFilters
+        lsLiterals = [FilterPrefilter.literal(oFilter.regexp()) for oFilter in loFilters]
+        if None in lsLiterals:
+            lsLiterals = None
+        if _oWatcher.debug():
+            _oWatcher.log('DEBUG[Watcher(%s)]: Fused %d filters%s\n' % (_oWatcher.name(), len(loFilters), ' (prefiltered)' if lsLiterals is not None else ''))
+        return [FilterMatcher(loFilters, oRegExp, lsLiterals)]
+
+
+    def statistics(self):
+        """
+        Return the matcher statistics (counters), as a dictionary.
+        """
+
+        if self.__tLiterals is None:
+            return {}
+        return {
+            'filters': len(self.__loFilters),
+            'prefiltered': self.__iPrefiltered,
+        }
+
+
+    def feed(self, _sData):
+        """
+        Filter (raw) data (line) fed by the producer; returns the data object
+        of the first matching filter (None if none matches).
+
+        @param  string  _sData  Producer (raw) data (line)
+        """
+
+        # Test the data against the required literals (prefilter)
+        if self.__tLiterals is not None:
+            for sLiteral in self.__tLiterals:
+                if sLiteral in _sData:
+                    break
+            else:
+                self.__iPrefiltered += 1
+                return None
+
+        # Test the data against the fused regular expression
+        if self.__oRegExp.search(_sData) is None:
+            return None
+
+        # Dispatch the data to the filters
+        for oFilter in self.__loFilters:
+            oData = oFilter.feed(_sData)
+            if oData is not None:
+                return oData
+        return None
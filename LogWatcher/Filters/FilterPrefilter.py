@@ -0,0 +1,123 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import re
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Minimum length of a (required) literal worth testing
+FILTERPREFILTER_LENGTH = 3
+
+# Regular expression repeats
+FILTERPREFILTER_REPEATS = tuple(
+    getattr(sre_parse, sOp) for sOp in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sre_parse, sOp)
+)
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class FilterPrefilter:
+    """
+    Regular Expression Literal Prefilter.
+
+    This class extracts - from a regular expression - the longest literal
+    (substring) which is required for the expression to match, allowing filters
+    to reject data which do not contain that literal with a cheap substring
+    test (rather than running the regular expression engine).
+
+    Case-insensitive expressions (or parts of expressions) are not considered.
+    """
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def __runs(_lItems, _llsRuns, _lsRun):
+        """
+        Gather the runs of required (and contiguous) literal characters of the
+        given parsed regular expression items.
+
+        @param  list  _lItems   Parsed regular expression items
+        @param  list  _llsRuns  Literal runs (output)
+        @param  list  _lsRun    Current literal run (characters)
+        """
+
+        for (iOp, oValue) in _lItems:
+            if iOp is sre_parse.LITERAL:
+                _lsRun.append(chr(oValue))
+            elif iOp is sre_parse.SUBPATTERN:
+                (_, iFlagsAdd, _, lItems) = oValue
+                if iFlagsAdd & re.IGNORECASE:
+                    _llsRuns.append(_lsRun[:])
+                    del _lsRun[:]
+                    continue
+                FilterPrefilter.__runs(lItems, _llsRuns, _lsRun)
+            elif iOp is getattr(sre_parse, 'ATOMIC_GROUP', None):
+                FilterPrefilter.__runs(oValue, _llsRuns, _lsRun)
+            elif iOp is sre_parse.AT:
+                continue  # zero-width
+            else:
+                _llsRuns.append(_lsRun[:])
+                del _lsRun[:]
+                if iOp in FILTERPREFILTER_REPEATS and oValue[0]>=1:
+                    lsRun = []
+                    FilterPrefilter.__runs(oValue[2], _llsRuns, lsRun)
+                    _llsRuns.append(lsRun)
+
+
+    @staticmethod
+    def literal(_oRegExp):
+        """
+        Return the longest literal required for the given (compiled) regular
+        expression to match (None if there is no such - long enough - literal).
+
+        @param  object  _oRegExp  Compiled regular expression
+        """
+
+        if _oRegExp.flags & re.IGNORECASE:
+            return None
+        try:
+            lItems = sre_parse.parse(_oRegExp.pattern, _oRegExp.flags)
+        except Exception:
+            return None
+        if lItems.state.flags & re.IGNORECASE:
+            return None
+        llsRuns = []
+        lsRun = []
+        FilterPrefilter.__runs(lItems, llsRuns, lsRun)
+        llsRuns.append(lsRun)
+        sLiteral = max([''.join(lsRun) for lsRun in llsRuns], key=len)
+        if len(sLiteral)<FILTERPREFILTER_LENGTH:
+            return None
+        return sLiteral
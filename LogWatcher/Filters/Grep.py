@@ -27,7 +27,8 @@ import urllib.parse
 
 # LogWatcher
 from LogWatcher.Filters import Filter
-from LogWatcher import Data
+from LogWatcher.Filters.FilterPrefilter import FilterPrefilter
+from LogWatcher import Data, RegExp
 
 
 #------------------------------------------------------------------------------
@@ -41,20 +42,37 @@ class Grep(Filter):
     This filter tests the provided data against the configured regular expression
     and outputs the data corresponding to the configured group.
 
+    Named groups - e.g. '(?P<ip>%{ip})' - are exported (in the same pass) as
+    named fields (see Data), which conditioners and consumers templates may
+    refer to (e.g. '%{ip}') without matching the data again.
+
     Configuration parameters are:
      - [REQ] pattern=<string>
              Regular expression
      - [opt] ignorecase (flag)
              Case-insensitive match
-     - [opt] group=<int> (default: 0)
-             Output data group (0=the entire line)
+     - [opt] engine=<string> (default: auto)
+             Regular expression engine: 're2' (linear-time engine), 're'
+             (standard engine) or 'auto' (the linear-time engine, if available
+             and supporting the pattern)
+     - [opt] group=<int|string> (default: 0)
+             Output data group (0=the entire match), by number or name
 
     In addition, the following "magic snippets" can be used to match/output
     specific data:
-     - '%{ip}':    IP address (IPv4 or IPv6)
-     - '%{ipv4}':  IPv4 address
-     - '%{ipv6}':  IPv6 address
-     - '%{email}': e-mail address
+     - '%{ip}':        IP address (IPv4 or IPv6)
+     - '%{ipv4}':      IPv4 address
+     - '%{ipv6}':      IPv6 address
+     - '%{email}':     e-mail address
+     - '%{hostname}':  host name
+     - '%{port}':      (TCP/UDP) port number
+     - '%{user}':      user name
+     - '%{int}':       integer
+     - '%{word}':      word
+     - '%{syslog_ts}': syslog timestamp (e.g. 'Jan  1 00:00:00')
+     - '%{iso8601}':   ISO 8601 timestamp (e.g. '2016-01-01T00:00:00Z')
+    (the shared snippets library may be extended in the global configuration;
+    see the [[snippets]] section)
 
     Example (watcher configuration):
      - filters = Grep?pattern=authentication failure from (%{ip})&group=1,
@@ -77,42 +95,77 @@ class Grep(Filter):
         if 'ignorecase' in dConfiguration_keys:
             iFlags |= re.IGNORECASE
 
+        # ... engine
+        sEngine = 'auto'
+        if 'engine' in dConfiguration_keys:
+            sEngine = dConfiguration['engine'][0]
+            if sEngine not in ('auto', 're', 're2'):
+                _oWatcher.log('ERROR[Filter:Grep(%s)]: Invalid \'engine\' configuration parameter\n' % _oWatcher.name())
+                raise ValueError('Invalid \'engine\' configuration parameter')
+
         # ... regexp
         if 'pattern' not in dConfiguration_keys:
             _oWatcher.log('ERROR[Filter:Grep(%s)]: Missing \'pattern\' configuration parameter\n' % _oWatcher.name())
             raise RuntimeError('Missing \'pattern\' configuration parameter')
         sPattern = dConfiguration['pattern'][0]
-        sPattern = sPattern.replace('%{ip}', '([0-9]{1,3}(\.[0-9]{1,3}){3}|[0-9a-f]{1,4}(:[0-9a-f]{0,4}){2,7})') \
-            .replace('%{ipv4}', '[0-9]{1,3}(\.[0-9]{1,3}){3}') \
-            .replace('%{ipv6}', '[0-9a-f]{1,4}(:[0-9a-f]{0,4}){2,7}') \
-            .replace('%{email}', '[-_a-zA-Z0-9]{1,}(\.[-_a-zA-Z0-9]{1,})*@[-_a-zA-Z0-9]{1,}(\.[-_a-zA-Z0-9]{1,})*\.[a-zA-Z]{2,}')
         try:
-            self.__oRegExp = re.compile(sPattern, iFlags)
+            self.__oRegExp = RegExp.compile(sPattern, iFlags, sEngine, '%s:Grep' % _oWatcher.name())
         except Exception:
             _oWatcher.log('ERROR[Filter:Grep(%s)]: Invalid \'pattern\' configuration parameter\n' % _oWatcher.name())
             raise
 
+        # ... literal (prefilter)
+        self.__sLiteral = FilterPrefilter.literal(self.__oRegExp)
+        if self.__sLiteral is not None and self._bDebug:
+            _oWatcher.log('DEBUG[Filter:Grep(%s)]: Prefiltering data on literal \'%s\'\n' % (_oWatcher.name(), self.__sLiteral))
+
         # ... group
         self.__iGroup = 0
         if 'group' in dConfiguration_keys:
             try:
-                self.__iGroup = int(dConfiguration['group'][0])
-                if self.__iGroup<0:
-                    raise ValueError('Value must me greater or equal to zero')
+                sGroup = dConfiguration['group'][0]
+                self.__iGroup = int(sGroup) if sGroup.isdigit() else self.__oRegExp.groupindex[sGroup]
+                if self.__iGroup>self.__oRegExp.groups:
+                    raise ValueError('Value must me lower or equal to the groups count')
             except Exception:
                 _oWatcher.log('ERROR[Filter:Grep(%s)]: Invalid \'group\' configuration parameter\n' % _oWatcher.name())
                 raise
 
+        # Fields
+        self.__bFields = bool(self.__oRegExp.groupindex)
+        self.__iPrefiltered = 0
+
 
     #------------------------------------------------------------------------------
     # METHODS
     #------------------------------------------------------------------------------
 
+    def regexp(self):
+        # Regular expression
+        return self.__oRegExp
+
+
+    def statistics(self):
+        # Statistics
+        if self.__sLiteral is None:
+            return {}
+        return {
+            'prefiltered': self.__iPrefiltered,
+        }
+
+
     def feed(self, _sData):
+        # Test the data against the required literal (prefilter)
+        if self.__sLiteral is not None and self.__sLiteral not in _sData:
+            self.__iPrefiltered += 1
+            return None
+
         # Test the data against the regular expression
         oMatch = self.__oRegExp.search(_sData)
         if oMatch is None:
             return None
 
-        # Output the requested group
+        # Output the requested group (and the named groups, lazily)
+        if self.__bFields:
+            return Data(self._oWatcher.name(), _sData, oMatch.group(self.__iGroup), None, lambda: RegExp.fields(oMatch))
         return Data(self._oWatcher.name(), _sData, oMatch.group(self.__iGroup))
@@ -0,0 +1,351 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import json
+import re
+import urllib.parse
+
+# Extra (optional)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# LogWatcher
+from LogWatcher.Filters import Filter
+from LogWatcher.Filters.FilterPrefilter import FilterPrefilter
+from LogWatcher import Data, RegExp
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# JSON decoder (fastest available)
+if orjson is not None:
+    JSON_DECODER = ('orjson', orjson.loads)
+elif ujson is not None:
+    JSON_DECODER = ('ujson', ujson.loads)
+else:
+    JSON_DECODER = ('json', json.loads)
+
+# Condition: <path>[<operator><value>]
+JSON_CONDITION = re.compile(r'^([^=!~<>]+?)(?:(=|!=|~|!~|<=|>=|<|>)(.*))?$')
+
+# Literal characters which are always serialized as is (not escaped) in JSON
+JSON_LITERAL = re.compile(r'[-A-Za-z0-9 _.@+=]{3,}')
+
+# Missing field (path) marker
+JSON_MISSING = object()
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class Json(Filter):
+    """
+    JSON-lines Filter.
+
+    This filter decodes (JSON-lines) data - starting at the first opening brace,
+    such as the JSON object may be preceded by some (e.g. syslog) header - tests
+    the configured conditions against the selected JSON fields and outputs the
+    selected JSON field(s).
+
+    Fields are selected by their (dot-separated) path, list items being selected
+    by their (zero-based) index; e.g. 'request.headers.host' or 'items.0.id'.
+    Scalar fields are compared/output as their JSON text (e.g. 'true', 'null' or
+    '42'), objects and lists as their (compact) JSON serialization.
+
+    Configuration parameters are:
+     - [opt] where=<path>[<operator><value>] (may be repeated)
+             Condition: field (path) must exist and (if specified) compare with
+             the given value; operators are '=' and '!=' (text comparison),
+             '~' and '!~' (regular expression search) and '<', '<=', '>' and
+             '>=' (numeric comparison); all conditions must be true for the
+             data to match ('!=' and '!~' are true for missing fields)
+     - [opt] ignorecase (flag)
+             Case-insensitive regular expression search
+     - [opt] engine=<string> (default: auto)
+             Regular expression engine: 're2' (linear-time engine), 're'
+             (standard engine) or 'auto' (the linear-time engine, if available
+             and supporting the pattern)
+     - [opt] select=<path> (may be repeated; default: the entire line)
+             Output data field(s); data missing one of these fields do not match
+             (selected fields are also available as named fields - see Data -
+             named after their path)
+     - [opt] separator=<string> (default: ' ')
+             Output data fields separator
+
+    The same "magic snippets" as the Grep filter may be used in regular
+    expressions (e.g. %{ip}).
+
+    The fastest available JSON decoder is used: orjson or ujson (if installed),
+    the standard json module otherwise.
+
+    Data which can not match (missing some field name or literal value required
+    by the configured conditions and selectors) are rejected without being
+    decoded.
+
+    Example (watcher configuration):
+     - filters = Json?where=level=error&where=status>=500&select=client.ip,
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sConfiguration):
+        # Parent constructor
+        Filter.__init__(self, _oWatcher, _sConfiguration)
+
+        # Configuration
+        dConfiguration = urllib.parse.parse_qs(_sConfiguration, keep_blank_values=True)
+        dConfiguration_keys = dConfiguration.keys()
+
+        # ... flags
+        iFlags = 0
+        if 'ignorecase' in dConfiguration_keys:
+            iFlags |= re.IGNORECASE
+
+        # ... engine
+        sEngine = 'auto'
+        if 'engine' in dConfiguration_keys:
+            sEngine = dConfiguration['engine'][0]
+            if sEngine not in ('auto', 're', 're2'):
+                _oWatcher.log('ERROR[Filter:Json(%s)]: Invalid \'engine\' configuration parameter\n' % _oWatcher.name())
+                raise ValueError('Invalid \'engine\' configuration parameter')
+
+        # ... conditions
+        lsLiterals = []
+        self.__ltConditions = []
+        for sCondition in dConfiguration.get('where', []):
+            oMatch = JSON_CONDITION.match(sCondition)
+            if oMatch is None:
+                _oWatcher.log('ERROR[Filter:Json(%s)]: Invalid \'where\' configuration parameter (%s)\n' % (_oWatcher.name(), sCondition))
+                raise ValueError('Invalid \'where\' configuration parameter')
+            (sPath, sOperator, sValue) = oMatch.groups()
+            tPath = tuple(sPath.strip().split('.'))
+            oValue = sValue
+            try:
+                if sOperator in ('~', '!~'):
+                    oValue = RegExp.compile(sValue, iFlags, sEngine, '%s:Json' % _oWatcher.name())
+                elif sOperator in ('<', '<=', '>', '>='):
+                    oValue = float(sValue)
+            except Exception:
+                _oWatcher.log('ERROR[Filter:Json(%s)]: Invalid \'where\' configuration parameter (%s)\n' % (_oWatcher.name(), sCondition))
+                raise
+            self.__ltConditions.append((tPath, sOperator, oValue))
+
+            # ... literals (prefilter)
+            if sOperator in ('!=', '!~'):
+                continue
+            lsLiterals.extend(Json.__keys(tPath))
+            if sOperator=='=':
+                try:
+                    float(sValue)
+                except ValueError:
+                    lsLiterals.append(Json.__literal(sValue))
+            elif sOperator=='~':
+                lsLiterals.append(Json.__literal(FilterPrefilter.literal(oValue)))
+
+        # ... select
+        self.__lsSelect = [sPath.strip() for sPath in dConfiguration.get('select', []) if sPath.strip()]
+        self.__ltSelect = [tuple(sPath.split('.')) for sPath in self.__lsSelect]
+        for tPath in self.__ltSelect:
+            lsLiterals.extend(Json.__keys(tPath))
+
+        # ... separator
+        self.__sSeparator = ' '
+        if 'separator' in dConfiguration_keys:
+            self.__sSeparator = dConfiguration['separator'][0]
+
+        # ... literals (prefilter)
+        # NB: longest (most selective) first
+        self.__tLiterals = tuple(sorted(set([sLiteral for sLiteral in lsLiterals if sLiteral is not None]), key=len, reverse=True))
+        if self._bDebug:
+            _oWatcher.log('DEBUG[Filter:Json(%s)]: Decoding data with \'%s\'%s\n' % (_oWatcher.name(), JSON_DECODER[0], '; prefiltering data on literals %s' % ', '.join(['\'%s\'' % sLiteral for sLiteral in self.__tLiterals]) if self.__tLiterals else ''))
+
+        # Fields
+        self.__fnDecode = JSON_DECODER[1]
+        self.__iPrefiltered = 0
+        self.__iInvalid = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def __literal(_sLiteral):
+        """
+        Return the longest part of the given literal which is serialized as is
+        in JSON (None if there is no such - long enough - part).
+
+        @param  string  _sLiteral  Literal
+        """
+
+        if not _sLiteral:
+            return None
+        lsLiterals = JSON_LITERAL.findall(_sLiteral)
+        if not lsLiterals:
+            return None
+        return max(lsLiterals, key=len)
+
+
+    @staticmethod
+    def __keys(_tPath):
+        """
+        Return the (quoted) keys of the given path, as serialized in JSON (when
+        not escaped).
+
+        @param  tuple  _tPath  Field path
+        """
+
+        return ['"%s"' % sKey for sKey in _tPath if not sKey.isdigit() and JSON_LITERAL.fullmatch(sKey)]
+
+
+    @staticmethod
+    def select(_oJson, _tPath):
+        """
+        Return the field of the given (decoded) JSON data corresponding to the
+        given path (JSON_MISSING if there is no such field).
+
+        @param  object  _oJson  Decoded JSON data
+        @param  tuple   _tPath  Field path
+        """
+
+        oValue = _oJson
+        for sKey in _tPath:
+            if isinstance(oValue, dict):
+                oValue = oValue.get(sKey, JSON_MISSING)
+                if oValue is JSON_MISSING:
+                    return JSON_MISSING
+            elif isinstance(oValue, list):
+                try:
+                    oValue = oValue[int(sKey)]
+                except (ValueError, IndexError):
+                    return JSON_MISSING
+            else:
+                return JSON_MISSING
+        return oValue
+
+
+    @staticmethod
+    def text(_oValue):
+        """
+        Return the given (decoded) JSON field as text.
+
+        @param  object  _oValue  Decoded JSON field
+        """
+
+        if isinstance(_oValue, str):
+            return _oValue
+        if _oValue is None:
+            return 'null'
+        if isinstance(_oValue, bool):
+            return 'true' if _oValue else 'false'
+        if isinstance(_oValue, (dict, list)):
+            return json.dumps(_oValue, separators=(',', ':'), ensure_ascii=False)
+        return str(_oValue)
+
+
+    def statistics(self):
+        # Statistics
+        return {
+            'prefiltered': self.__iPrefiltered,
+            'invalid': self.__iInvalid,
+        }
+
+
+    def feed(self, _sData):
+        # Test the data against the required literals (prefilter)
+        for sLiteral in self.__tLiterals:
+            if sLiteral not in _sData:
+                self.__iPrefiltered += 1
+                return None
+
+        # Decode the data
+        iStart = _sData.find('{')
+        if iStart<0:
+            self.__iInvalid += 1
+            return None
+        try:
+            oJson = self.__fnDecode(_sData[iStart:] if iStart else _sData)
+        except ValueError:
+            self.__iInvalid += 1
+            return None
+
+        # Test the conditions
+        for (tPath, sOperator, oValue) in self.__ltConditions:
+            oField = Json.select(oJson, tPath)
+            if oField is JSON_MISSING:
+                if sOperator in ('!=', '!~'):
+                    continue
+                return None
+            if sOperator is None:
+                continue
+            if sOperator=='=':
+                if Json.text(oField)!=oValue:
+                    return None
+            elif sOperator=='!=':
+                if Json.text(oField)==oValue:
+                    return None
+            elif sOperator=='~':
+                if oValue.search(Json.text(oField)) is None:
+                    return None
+            elif sOperator=='!~':
+                if oValue.search(Json.text(oField)) is not None:
+                    return None
+            else:
+                if isinstance(oField, bool):
+                    return None
+                try:
+                    fField = float(oField)
+                except (TypeError, ValueError):
+                    return None
+                if sOperator=='<':
+                    if not fField<oValue: return None
+                elif sOperator=='<=':
+                    if not fField<=oValue: return None
+                elif sOperator=='>':
+                    if not fField>oValue: return None
+                elif not fField>=oValue:
+                    return None
+
+        # Output the selected fields
+        if not self.__ltSelect:
+            return Data(self._oWatcher.name(), _sData, _sData)
+        lsOutput = []
+        for tPath in self.__ltSelect:
+            oField = Json.select(oJson, tPath)
+            if oField is JSON_MISSING:
+                return None
+            lsOutput.append(Json.text(oField))
+        return Data(self._oWatcher.name(), _sData, self.__sSeparator.join(lsOutput), None, dict(zip(self.__lsSelect, lsOutput)))
@@ -0,0 +1,121 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import urllib.parse
+
+# LogWatcher
+from LogWatcher.Filters import Filter
+from LogWatcher.SyslogHeader import SyslogHeader, SYSLOGHEADER_FIELDS
+from LogWatcher import Data
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class Syslog(Filter):
+    """
+    Syslog Header Filter.
+
+    This filter parses the syslog header (RFC3164 or RFC5424; see SyslogHeader)
+    of the data, tests its program and host against the configured ones and
+    outputs the configured header field.
+
+    The header fields are also available as named fields (see Data): 'timestamp',
+    'host', 'program', 'pid' and 'message'.
+
+    Configuration parameters are:
+     - [opt] program=<string> (may be repeated)
+             Program (tag) to match (default: any)
+     - [opt] host=<string> (may be repeated)
+             Host to match (default: any)
+     - [opt] output=<string> (default: the entire line)
+             Output header field: 'timestamp', 'host', 'program', 'pid' or
+             'message'
+
+    Data without (valid) syslog header never match.
+
+    NB: watchers tailing a shared log file (e.g. /var/log/syslog) for a given
+        program ought rather be restricted to it (see the 'program' watcher
+        configuration parameter), such as lines from other programs are not
+        even routed to them.
+
+    Example (watcher configuration):
+     - filters = Syslog?program=sshd&output=message,
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sConfiguration):
+        # Parent constructor
+        Filter.__init__(self, _oWatcher, _sConfiguration)
+
+        # Configuration
+        dConfiguration = urllib.parse.parse_qs(_sConfiguration, keep_blank_values=True)
+        dConfiguration_keys = dConfiguration.keys()
+
+        # ... program
+        self.__oPrograms = None
+        if 'program' in dConfiguration_keys:
+            self.__oPrograms = frozenset(dConfiguration['program'])
+
+        # ... host
+        self.__oHosts = None
+        if 'host' in dConfiguration_keys:
+            self.__oHosts = frozenset(dConfiguration['host'])
+
+        # ... output
+        self.__iOutput = None
+        if 'output' in dConfiguration_keys:
+            try:
+                self.__iOutput = SYSLOGHEADER_FIELDS.index(dConfiguration['output'][0])
+            except ValueError:
+                _oWatcher.log('ERROR[Filter:Syslog(%s)]: Invalid \'output\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def feed(self, _sData):
+        # Parse the syslog header
+        tHeader = SyslogHeader.parse(_sData)
+        if tHeader is None:
+            return None
+
+        # Test the program and host
+        if self.__oPrograms is not None and tHeader[2] not in self.__oPrograms:
+            return None
+        if self.__oHosts is not None and tHeader[1] not in self.__oHosts:
+            return None
+
+        # Output the requested field (and the header fields, lazily)
+        fnFields = lambda: dict([(sField, sValue) for (sField, sValue) in zip(SYSLOGHEADER_FIELDS, tHeader) if sValue is not None])
+        if self.__iOutput is None:
+            return Data(self._oWatcher.name(), _sData, _sData, None, fnFields)
+        return Data(self._oWatcher.name(), _sData, tHeader[self.__iOutput] or '', None, fnFields)
@@ -0,0 +1,401 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from multiprocessing.connection import Pipe, wait
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+# LogWatcher
+from .RegExp import RegExp
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Maximum count of lines per batch
+PARTITIONER_BATCH = 256
+
+# Maximum delay before an incomplete batch is dispatched, in seconds
+PARTITIONER_LINGER = 0.05
+
+# Maximum count of in-flight batches, per worker process (bounded merge)
+PARTITIONER_INFLIGHT = 4
+
+# Worker processes termination timeout, in seconds
+PARTITIONER_STOP_TIMEOUT = 5.0
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class Partitioner:
+    """
+    Log Watcher Parallel Filters/Conditioners Partitioner.
+
+    This class/object runs the filters and conditioners chain of a (high-volume)
+    watcher in parallel across several worker processes, while its consumers
+    keep running in the watcher (main) process:
+     - produced lines are gathered in batches, each batch being split across
+       the worker processes according to the configured partition key (lines
+       with the same key being always processed by the same worker process)
+     - each worker process feeds its share of the batch to (its copy of) the
+       filters and conditioners and sends the resulting data back
+     - results are merged back in the original lines order, one batch after
+       the other, and fed to the consumers
+
+    Lines order is thus preserved overall (and per-key state, e.g. of stateful
+    conditioners, remains consistent within each worker process). The amount
+    of in-flight batches is bounded, blocking the producer when the workers
+    can not keep up.
+
+    Worker processes are forked along the watcher configuration (thus sharing
+    its filters and conditioners configuration), before any producer - or
+    merging - thread is started (forking a multi-threaded process being unsafe);
+    should one of them fail, the watcher is stopped.
+    """
+
+    # Worker processes connections (of all partitioners)
+    __loConnectionsAll = []
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _iProcesses, _sPartition=None):
+        """
+        Constructor.
+
+        @param  Watcher  _oWatcher    Parent watcher
+        @param  int      _iProcesses  Worker processes count
+        @param  string   _sPartition  Partition key regular expression (first group, or entire match)
+        """
+
+        # Fields
+        self._oWatcher = _oWatcher
+        self.__iProcesses = _iProcesses
+        self.__oRegExp = None
+        if _sPartition:
+            try:
+                self.__oRegExp = RegExp.compile(_sPartition, 0, 'auto', '%s:Partitioner' % _oWatcher.name())
+            except Exception:
+                _oWatcher.log('ERROR[Watcher(%s)]: Invalid \'partition\' configuration parameter\n' % _oWatcher.name())
+                raise
+        self.__iPID = os.getpid()
+        self.__loConnections = []
+        self.__liPIDs = []
+        self.__oLockFeed = threading.Lock()
+        self.__oLockMerge = threading.Lock()
+        self.__oNotFull = threading.Condition(self.__oLockMerge)
+        self.__ltPending = []
+        self.__fPending = 0.0
+        self.__iBatch = 0
+        self.__iBatchMerge = 0
+        self.__dBatches = {}
+        self.__oThread = None
+        self.__bStop = False
+        self.__bDebug = _oWatcher.debug()
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def fork(self):
+        """
+        Fork the worker processes.
+
+        NB: worker processes MUST be forked before any thread is started.
+        """
+
+        for i in range(self.__iProcesses):
+            (oConnection, oConnectionChild) = Pipe()
+            iPID = os.fork()
+            if iPID==0:
+                iReturn = 1
+                try:
+                    oConnection.close()
+                    for oConnectionOther in Partitioner.__loConnectionsAll:
+                        oConnectionOther.close()
+                    iReturn = self.__work(i, oConnectionChild)
+                except BaseException as e:
+                    sys.stderr.write('ERROR[Watcher(%s)]: Worker process error\n%s\n' % (self._oWatcher.name(), str(e)))
+                    if self.__bDebug:
+                        traceback.print_exc()
+                finally:
+                    try:
+                        sys.stderr.flush()
+                    finally:
+                        os._exit(iReturn)
+            oConnectionChild.close()
+            self.__loConnections.append(oConnection)
+            Partitioner.__loConnectionsAll.append(oConnection)
+            self.__liPIDs.append(iPID)
+            if self.__bDebug:
+                self._oWatcher.log('DEBUG[Watcher(%s)]: Worker process spawned (PID:%d)\n' % (self._oWatcher.name(), iPID))
+
+
+    def start(self):
+        """
+        Start the merging (consumers) thread.
+        """
+
+        sThreadName = '%s.Partitioner' % self._oWatcher.name()
+        self.__oThread = threading.Thread(name=sThreadName, target=self.__merge)
+        self.__oThread.start()
+
+
+    def __work(self, _iIndex, _oConnection):
+        """
+        Worker process: feed the received lines to the filters and conditioners,
+        and send the resulting data back; returns the process exit code.
+
+        @param  int         _iIndex       Worker process index
+        @param  Connection  _oConnection  Parent process connection
+        """
+
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        while True:
+            try:
+                tBatch = _oConnection.recv()
+            except EOFError:
+                break
+            if tBatch is None:
+                break
+            (iBatch, ltLines) = tBatch
+            ltResults = []
+            for (iIndex, sData, sSource, fTime) in ltLines:
+                oData = self._oWatcher.process(sData, sSource, fTime)
+                if oData is not None:
+                    ltResults.append((iIndex, oData))
+                if self._oWatcher.stopped():
+                    break
+            _oConnection.send((iBatch, ltResults, self._oWatcher.stopped()))
+            if self._oWatcher.stopped():
+                return 1
+        return 0
+
+
+    def __key(self, _sData):
+        """
+        Return the partition key of the given data (None if not found).
+
+        @param  string  _sData  Log data (line)
+        """
+
+        oMatch = self.__oRegExp.search(_sData)
+        if oMatch is None:
+            return None
+        return oMatch.group(1 if self.__oRegExp.groups else 0)
+
+
+    def __dispatch(self, _bBlocking=True):
+        """
+        Split the pending batch across the worker processes and send it to them.
+
+        In non-blocking mode, the pending batch is kept pending if the maximum
+        count of in-flight batches is reached (rather than waiting for room).
+
+        NB: the feed lock MUST be held by the caller.
+
+        @param  bool  _bBlocking  Wait for room (in-flight batches)
+        """
+
+        if not _bBlocking:
+            # NB: only the merging thread makes room; it must never wait for it
+            with self.__oLockMerge:
+                if len(self.__dBatches)>=PARTITIONER_INFLIGHT*self.__iProcesses:
+                    return
+        ltPending = self.__ltPending
+        self.__ltPending = []
+        if not ltPending or self.__bStop:
+            return
+
+        # Split batch
+        lltLines = [[] for _ in range(self.__iProcesses)]
+        if self.__oRegExp is not None:
+            iRoundRobin = self.__iBatch
+            for tLine in ltPending:
+                sKey = self.__key(tLine[1])
+                if sKey is None:
+                    # NB: lines without key may be processed by any worker
+                    iRoundRobin += 1
+                    lltLines[iRoundRobin % self.__iProcesses].append(tLine)
+                else:
+                    lltLines[hash(sKey) % self.__iProcesses].append(tLine)
+        else:
+            iSize = -(-len(ltPending) // self.__iProcesses)
+            for i in range(self.__iProcesses):
+                lltLines[i] = ltPending[i*iSize:(i+1)*iSize]
+
+        # Wait for room (bounded merge)
+        with self.__oNotFull:
+            while len(self.__dBatches)>=PARTITIONER_INFLIGHT*self.__iProcesses:
+                if self.__bStop: return
+                self.__oNotFull.wait(1.0)
+            iBatch = self.__iBatch
+            self.__iBatch += 1
+            self.__dBatches[iBatch] = [len([ltLines for ltLines in lltLines if ltLines]), [], len(ltPending)]
+
+        # Send batch
+        for (oConnection, ltLines) in zip(self.__loConnections, lltLines):
+            if ltLines:
+                try:
+                    oConnection.send((iBatch, ltLines))
+                except OSError:
+                    pass  # NB: failing worker process is detected by the merging thread
+
+
+    def feed(self, _sData, _sSource, _fTime=None):
+        """
+        [thread-safe] Queue the given data (line) for processing by the worker
+        processes.
+
+        @param  string  _sData    Log data (line)
+        @param  string  _sSource  Data source
+        @param  float   _fTime    Ingest time, as a UNIX timestamp (optional; default: now)
+        """
+
+        with self.__oLockFeed:
+            if not self.__ltPending:
+                self.__fPending = time.monotonic()
+            self.__ltPending.append((len(self.__ltPending), _sData, _sSource, _fTime if _fTime is not None else time.time()))
+            if len(self.__ltPending)>=PARTITIONER_BATCH:
+                self.__dispatch()
+
+
+    def __fail(self, _iIndex):
+        """
+        Handle the failure of the given worker process (and stop the watcher).
+
+        @param  int  _iIndex  Worker process index
+        """
+
+        if not self.__bStop:
+            self._oWatcher.log('ERROR[Watcher(%s)]: Worker process (%d) failed; exiting\n' % (self._oWatcher.name(), _iIndex))
+        self.__bStop = True
+        self._oWatcher.stop()
+
+
+    def __merge(self):
+        """
+        Merging thread: gather the worker processes results and feed them - in
+        order - to the watcher consumers.
+        """
+
+        dConnections = dict([(oConnection, i) for (i, oConnection) in enumerate(self.__loConnections)])
+        try:
+            while dConnections:
+                if self.__bStop: break
+
+                # Dispatch incomplete batch
+                if self.__ltPending and time.monotonic()-self.__fPending>=PARTITIONER_LINGER:
+                    if self.__oLockFeed.acquire(blocking=False):
+                        try:
+                            self.__dispatch(False)
+                        finally:
+                            self.__oLockFeed.release()
+
+                # Gather results
+                for oConnection in wait(list(dConnections.keys()), PARTITIONER_LINGER):
+                    try:
+                        (iBatch, ltResults, bStopped) = oConnection.recv()
+                    except (EOFError, OSError):
+                        self.__fail(dConnections.pop(oConnection))
+                        break
+                    if bStopped:
+                        self.__fail(dConnections[oConnection])
+                        break
+                    with self.__oLockMerge:
+                        lBatch = self.__dBatches[iBatch]
+                        lBatch[0] -= 1
+                        lBatch[1].extend(ltResults)
+
+                # Merge (completed batches, in order)
+                while True:
+                    with self.__oLockMerge:
+                        lBatch = self.__dBatches.get(self.__iBatchMerge)
+                        if lBatch is None or lBatch[0]>0:
+                            break
+                        del self.__dBatches[self.__iBatchMerge]
+                        self.__iBatchMerge += 1
+                        self.__oNotFull.notify()
+                    lBatch[1].sort(key=lambda t: t[0])
+                    for (_, oData) in lBatch[1]:
+                        if self.__bStop: break
+                        self._oWatcher.consume(oData)
+                    else:
+                        self._oWatcher.acknowledge(lBatch[2])
+        finally:
+            self.__terminate()
+
+
+    def __terminate(self):
+        """
+        Terminate the worker processes (gracefully, then forcefully on timeout).
+        """
+
+        for oConnection in self.__loConnections:
+            try:
+                oConnection.send(None)
+            except OSError:
+                pass
+        fEndTime = time.monotonic()+PARTITIONER_STOP_TIMEOUT
+        for iPID in self.__liPIDs:
+            while True:
+                try:
+                    (iPIDExited, _) = os.waitpid(iPID, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if iPIDExited:
+                    break
+                if time.monotonic()>fEndTime:
+                    self._oWatcher.log('ERROR[Watcher(%s)]: Worker process failed to terminate in time; killing\n' % self._oWatcher.name())
+                    os.kill(iPID, signal.SIGKILL)
+                    os.waitpid(iPID, 0)
+                    break
+                time.sleep(0.05)
+        for oConnection in self.__loConnections:
+            oConnection.close()
+            Partitioner.__loConnectionsAll.remove(oConnection)
+
+
+    def stop(self):
+        """
+        Stop the worker processes and the merging thread.
+        """
+
+        if os.getpid()!=self.__iPID:
+            return  # worker process
+        self.__bStop = True
+        if self.__oThread is None:
+            self.__terminate()  # merging thread not started
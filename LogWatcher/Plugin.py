@@ -45,3 +45,33 @@ class Plugin:
         self._oWatcher = _oWatcher
         self._sConfiguration = _sConfiguration
         self._bDebug = self._oWatcher.debug()
+
+
+    #------------------------------------------------------------------------------
+    # METHODS - TO BE OVERRIDDEN
+    #------------------------------------------------------------------------------
+
+    def stateful(self):
+        """
+        Return whether the plugin output depends on previous data (or time), in
+        which case identical data may lead to different outputs; this notably
+        disables the watcher memoization cache.
+
+        The default implementation is to be stateless (return False).
+        """
+
+        # Stateful
+        # (this is where your plugin may declare it keeps state across data)
+        return False
+
+
+    def statistics(self):
+        """
+        Return the plugin statistics (counters), as a dictionary.
+
+        The default implementation is to return no statistics (empty dictionary).
+        """
+
+        # Statistics
+        # (this is where your plugin may report its counters)
+        return {}
@@ -0,0 +1,315 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import shlex
+import signal
+import subprocess
+from threading import Thread
+import time
+import urllib.parse
+
+# LogWatcher
+from LogWatcher.Producers import Producer
+from .LineBuffer import LineBuffer
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Pipe read chunk size, in bytes
+COMMAND_CHUNK_SIZE = 65536
+
+# Command exit polling interval (once its output is closed), in seconds
+COMMAND_EXIT_POLL = 0.1
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class Command(Producer):
+    """
+    Command Output Producer (similar to UNIX '<command> | ...').
+
+    This producer runs the configured command and feeds the lines it outputs
+    to its parent watcher as they appear; e.g. 'journalctl -f -o cat'.
+
+    The command output is read in large non-blocking chunks (rather than line
+    by line) and split into lines the same way as the "Tail" producer does.
+
+    The command pipes are multiplexed by the producer routine, which may thus be
+    run by the daemon event loop.
+
+    The command is restarted - with an exponential backoff delay - when it
+    exits, and terminated (along its process group) when the producer stops;
+    the command is never waited for synchronously (up to the kill timeout), but
+    either by the producer routine or - once the latter is closed - by a
+    dedicated (reaper) thread.
+
+    Configuration parameters are:
+     - [REQ] command=<string>
+             Command (and arguments; split according to shell rules, but NOT
+             run through a shell)
+     - [opt] stderr (flag)
+             Also feed the command standard error lines (source: 'stderr')
+     - [opt] maxline=<int> (default: 65536)
+             Maximum line length, in bytes (longer lines are truncated)
+     - [opt] restart=<float> (default: 1.0)
+             Initial restart delay, in seconds (doubled on each restart)
+     - [opt] restart_max=<float> (default: 60.0)
+             Maximum restart delay, in seconds (the delay is reset once the
+             command ran for that long)
+     - [opt] kill_timeout=<float> (default: 5.0)
+             Delay before killing the command when stopping, in seconds
+
+    Example (watcher configuration):
+     - producer = Command?command=journalctl -f -o cat
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sConfiguration, _bSynchronous, _bBlocking, _fTimeout):
+        # Parent constructor
+        Producer.__init__(self, _oWatcher, _sConfiguration, _bSynchronous, _bBlocking, _fTimeout)
+
+        # Configuration
+        dConfiguration = urllib.parse.parse_qs(_sConfiguration, keep_blank_values=True)
+        dConfiguration_keys = dConfiguration.keys()
+
+        # ... command
+        if 'command' not in dConfiguration_keys:
+            _oWatcher.log('ERROR[Producer:Command(%s)]: Missing \'command\' configuration parameter\n' % _oWatcher.name())
+            raise RuntimeError('Missing \'command\' configuration parameter')
+        try:
+            self.__lsCommand = shlex.split(dConfiguration['command'][0])
+            if not self.__lsCommand:
+                raise ValueError('Command must not be empty')
+        except Exception:
+            _oWatcher.log('ERROR[Producer:Command(%s)]: Invalid \'command\' configuration parameter\n' % _oWatcher.name())
+            raise
+
+        # ... stderr
+        self.__bStdErr = False
+        if 'stderr' in dConfiguration_keys:
+            self.__bStdErr = True
+
+        # ... maximum line length
+        self.__iMaxLine = 65536
+        if 'maxline' in dConfiguration_keys:
+            try:
+                self.__iMaxLine = int(dConfiguration['maxline'][0])
+                if self.__iMaxLine<=0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Command(%s)]: Invalid \'maxline\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... restart delay
+        self.__fRestart = 1.0
+        if 'restart' in dConfiguration_keys:
+            try:
+                self.__fRestart = float(dConfiguration['restart'][0])
+                if self.__fRestart<=0.0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Command(%s)]: Invalid \'restart\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... maximum restart delay
+        self.__fRestartMax = 60.0
+        if 'restart_max' in dConfiguration_keys:
+            try:
+                self.__fRestartMax = float(dConfiguration['restart_max'][0])
+                if self.__fRestartMax<self.__fRestart:
+                    raise ValueError('Value must me greater or equal to the restart delay')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Command(%s)]: Invalid \'restart_max\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... kill timeout
+        self.__fKillTimeout = 5.0
+        if 'kill_timeout' in dConfiguration_keys:
+            try:
+                self.__fKillTimeout = float(dConfiguration['kill_timeout'][0])
+                if self.__fKillTimeout<0.0:
+                    raise ValueError('Value must me greater or equal to zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Command(%s)]: Invalid \'kill_timeout\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # Fields
+        self.__baBuffer = bytearray(COMMAND_CHUNK_SIZE)
+        self.__iRestarts = 0
+        self.__iTruncated = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def __signal(self, _oProcess, _iSignal):
+        """
+        Send the given signal to the command (process group).
+
+        @param  Popen  _oProcess  Command process
+        @param  int    _iSignal   Signal
+        """
+
+        if _oProcess.poll() is not None:
+            return
+        try:
+            os.killpg(_oProcess.pid, _iSignal)
+        except OSError:
+            pass
+
+
+    def __terminate(self, _oProcess):
+        """
+        Terminate the command (gracefully, then forcefully) and reap it.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  Popen  _oProcess  Command process
+        """
+
+        self.__signal(_oProcess, signal.SIGTERM)
+        fKill = time.monotonic()+self.__fKillTimeout
+        while _oProcess.poll() is None:
+            if fKill is not None and time.monotonic()>=fKill:
+                self._oWatcher.log('WARNING[Producer:Command(%s)]: Command did not terminate; killing it\n' % self._oWatcher.name())
+                self.__signal(_oProcess, signal.SIGKILL)
+                fKill = None
+            yield ([], COMMAND_EXIT_POLL)
+
+
+    def __reap(self, _oProcess):
+        """
+        Terminate the command and reap it (reaper thread).
+
+        @param  Popen  _oProcess  Command process
+        """
+
+        for (_, fTimeout) in self.__terminate(_oProcess):
+            time.sleep(fTimeout)
+
+
+    def __execute(self):
+        """
+        Run the command once and feed its output line-by-line, until it exits
+        (or the producer is stopped); returns the command exit code.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+        """
+
+        # Spawn command
+        oProcess = subprocess.Popen(
+            self.__lsCommand,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE if self.__bStdErr else subprocess.DEVNULL,
+            bufsize=0,
+            close_fds=True,
+            start_new_session=True,
+        )
+
+        # Read output
+        dPipes = {}
+        try:
+            for (oPipe, sSource) in ((oProcess.stdout, None), (oProcess.stderr, 'stderr')):
+                if oPipe is None: continue
+                os.set_blocking(oPipe.fileno(), False)
+                dPipes[oPipe] = (sSource, LineBuffer(self.__iMaxLine))
+            while dPipes:
+                lReady = yield (list(dPipes.keys()), None)
+                for oPipe in lReady:
+                    (sSource, oLineBuffer) = dPipes[oPipe]
+                    iRead = oPipe.readinto(self.__baBuffer)
+                    if iRead is None:
+                        continue
+                    if not iRead:
+                        del dPipes[oPipe]
+                        lsLines = oLineBuffer.flush()
+                        self.__iTruncated += oLineBuffer.truncated()
+                    else:
+                        lsLines = oLineBuffer.feed(self.__baBuffer, iRead)
+                    for sLine in lsLines:
+                        if self._bStop: break
+                        self._feed(sLine, sSource)
+                if self._bStop: break
+
+            # Wait for the command to exit (output closed)
+            fKill = time.monotonic()+self.__fKillTimeout
+            while oProcess.poll() is None and time.monotonic()<fKill:
+                if self._bStop: break
+                yield ([], COMMAND_EXIT_POLL)
+
+            # Terminate the command (if need be)
+            yield from self.__terminate(oProcess)
+        finally:
+            for (_, oLineBuffer) in dPipes.values():
+                self.__iTruncated += oLineBuffer.truncated()
+
+            # ... routine closed (e.g. producer stopped)
+            # NB: hand the command termination over to a reaper thread
+            if oProcess.poll() is None:
+                sThreadName = '%s.Command' % self._oWatcher.name()
+                Thread(name=sThreadName, target=self.__reap, args=[oProcess]).start()
+            for oPipe in (oProcess.stdout, oProcess.stderr):
+                if oPipe is not None:
+                    oPipe.close()
+        return oProcess.returncode
+
+
+    def statistics(self):
+        # Statistics
+        return {
+            'restarts': self.__iRestarts,
+            'truncated': self.__iTruncated,
+        }
+
+
+    def routine(self):
+        # Run the command (and restart it when it exits)
+        fRestart = self.__fRestart
+        while True:
+            if self._bStop: break
+            fStart = time.monotonic()
+            try:
+                iExitCode = yield from self.__execute()
+                if self._bStop: break
+                sError = 'WARNING[Producer:Command(%s)]: Command exited (code:%d)' % (self._oWatcher.name(), iExitCode)
+            except OSError as e:
+                sError = 'ERROR[Producer:Command(%s)]: Failed to run command (%s)' % (self._oWatcher.name(), str(e))
+
+            # Restart (backoff)
+            if time.monotonic()-fStart >= self.__fRestartMax:
+                fRestart = self.__fRestart
+            self._oWatcher.log('%s; restarting in %.1fs...\n' % (sError, fRestart))
+            yield ([], fRestart)
+            fRestart = min(2.0*fRestart, self.__fRestartMax)
+            self.__iRestarts += 1
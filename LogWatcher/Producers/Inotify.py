@@ -0,0 +1,210 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# REF: /usr/include/linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o00004000
+IN_CLOEXEC = 0o02000000
+
+# Event header (int wd, uint32 mask, uint32 cookie, uint32 len)
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class Inotify:
+    """
+    Linux inotify wrapper.
+
+    This class/object provides a minimal (ctypes-based) interface to the Linux
+    inotify API, allowing to block - without using any CPU - until watched files
+    or directories are modified, moved, deleted or created.
+    """
+
+    # Shared C library handle (None if not available)
+    __oLibC = None
+    __bLibC = None
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self):
+        """
+        Constructor.
+
+        Raises OSError if inotify is not available.
+        """
+
+        # Fields
+        self.__iFD = None
+
+        # Initialization
+        oLibC = Inotify.__libc()
+        if oLibC is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        iFD = oLibC.inotify_init1(IN_NONBLOCK|IN_CLOEXEC)
+        if iFD<0:
+            iErrNo = ctypes.get_errno()
+            raise OSError(iErrNo, os.strerror(iErrNo))
+        self.__iFD = iFD
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def __libc():
+        """
+        Return the C library handle (None if inotify is not available).
+        """
+
+        if Inotify.__bLibC is None:
+            Inotify.__bLibC = False
+            try:
+                oLibC = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                oLibC.inotify_init1.argtypes = [ctypes.c_int]
+                oLibC.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                oLibC.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+                Inotify.__oLibC = oLibC
+                Inotify.__bLibC = True
+            except (OSError, AttributeError):
+                pass
+        return Inotify.__oLibC
+
+
+    @staticmethod
+    def available():
+        """
+        Return whether inotify is available.
+        """
+
+        return Inotify.__libc() is not None
+
+
+    def fileno(self):
+        """
+        Return the inotify file descriptor.
+        """
+
+        return self.__iFD
+
+
+    def add(self, _sPath, _iMask):
+        """
+        Watch the given path for the given events; returns the watch descriptor.
+
+        Raises OSError if the path can not be watched.
+
+        @param  string  _sPath  File or directory path
+        @param  int     _iMask  Events mask (IN_* constants)
+        """
+
+        iWD = Inotify.__oLibC.inotify_add_watch(self.__iFD, os.fsencode(_sPath), _iMask)
+        if iWD<0:
+            iErrNo = ctypes.get_errno()
+            raise OSError(iErrNo, os.strerror(iErrNo), _sPath)
+        return iWD
+
+
+    def remove(self, _iWD):
+        """
+        Stop watching the given watch descriptor (silently ignoring errors).
+
+        @param  int  _iWD  Watch descriptor
+        """
+
+        Inotify.__oLibC.inotify_rm_watch(self.__iFD, _iWD)
+
+
+    def wait(self, _fTimeout=None):
+        """
+        Block until events are available (or timeout) and return them
+        as a list of (watch descriptor, mask, name) tuples.
+
+        @param  float  _fTimeout  Timeout, in seconds (None for no timeout)
+        """
+
+        # Wait
+        try:
+            lReady = select.select([self.__iFD], [], [], _fTimeout)[0]
+        except InterruptedError:
+            return []
+        if self.__iFD not in lReady:
+            return []
+
+        # Read events
+        ltEvents = []
+        while True:
+            try:
+                bBuffer = os.read(self.__iFD, 65536)
+            except BlockingIOError:
+                break
+            if not bBuffer:
+                break
+            iOffset = 0
+            while iOffset<len(bBuffer):
+                (iWD, iMask, _, iLength) = INOTIFY_EVENT.unpack_from(bBuffer, iOffset)
+                iOffset += INOTIFY_EVENT.size
+                sName = os.fsdecode(bBuffer[iOffset:iOffset+iLength].rstrip(b'\0')) if iLength else None
+                iOffset += iLength
+                ltEvents.append((iWD, iMask, sName))
+        return ltEvents
+
+
+    def close(self):
+        """
+        Release the inotify file descriptor.
+        """
+
+        if self.__iFD is not None:
+            try:
+                os.close(self.__iFD)
+            except OSError:
+                pass
+        self.__iFD = None
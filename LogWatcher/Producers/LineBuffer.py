@@ -0,0 +1,157 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class LineBuffer:
+    """
+    Binary Data Line Splitter.
+
+    This class/object splits (chunks of) binary data into (decoded) lines,
+    carrying any incomplete trailing line over to the next chunk.
+
+    Lines exceeding the configured maximum length (in bytes, before decoding)
+    are truncated (and counted); the remainder of such lines is discarded, thus
+    keeping memory usage bounded whatever the data.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _iMaxLength=65536, _sEncoding='utf-8'):
+        """
+        Constructor.
+
+        @param  int     _iMaxLength  Maximum line length, in bytes
+        @param  string  _sEncoding   Data encoding
+        """
+
+        # Fields
+        self.__iMaxLength = _iMaxLength
+        self.__sEncoding = _sEncoding
+        self.__baPartial = bytearray()
+        self.__bDiscard = False
+        self.__iDiscarded = 0
+        self.__iTruncated = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def pending(self):
+        """
+        Return the length of the data fed since the last line boundary, in bytes:
+        the incomplete (pending) trailing line, or the truncated line whose
+        remainder is being discarded.
+        """
+
+        return len(self.__baPartial)+self.__iDiscarded
+
+
+    def truncated(self):
+        """
+        Return the count of truncated lines.
+        """
+
+        return self.__iTruncated
+
+
+    def __truncatePartial(self):
+        """
+        Truncate the incomplete trailing line and discard its remainder; returns
+        the truncated line.
+        """
+
+        sLine = str(self.__baPartial[:self.__iMaxLength], self.__sEncoding, 'replace').strip()
+        self.__iDiscarded = len(self.__baPartial)
+        self.__baPartial.clear()
+        self.__bDiscard = True
+        self.__iTruncated += 1
+        return sLine
+
+
+    def feed(self, _baData, _iLength=None):
+        """
+        Split the given data into lines; returns the list of complete lines.
+
+        @param  bytearray  _baData   Data (buffer)
+        @param  int        _iLength  Data length (None for the whole buffer)
+        """
+
+        iStart = 0
+        iEnd = len(_baData) if _iLength is None else _iLength
+        oData = memoryview(_baData)
+
+        # Discard the remainder of a truncated line
+        if self.__bDiscard:
+            i = _baData.find(b'\n', iStart, iEnd)
+            if i<0:
+                self.__iDiscarded += iEnd-iStart
+                return []
+            iStart = i+1
+            self.__bDiscard = False
+            self.__iDiscarded = 0
+
+        # Complete lines
+        i = _baData.rfind(b'\n', iStart, iEnd)
+        if i<0:
+            self.__baPartial += oData[iStart:iEnd]
+            if len(self.__baPartial)>self.__iMaxLength:
+                return [self.__truncatePartial()]
+            return []
+        if self.__baPartial:
+            self.__baPartial += oData[iStart:i]
+            bData = bytes(self.__baPartial)
+            self.__baPartial.clear()
+        else:
+            bData = oData[iStart:i]
+        if len(bData)>self.__iMaxLength:
+            # NB: lines length is measured in bytes (before decoding)
+            lsLines = []
+            for bLine in bytes(bData).split(b'\n'):
+                if len(bLine)>self.__iMaxLength:
+                    bLine = bLine[:self.__iMaxLength]
+                    self.__iTruncated += 1
+                lsLines.append(str(bLine, self.__sEncoding, 'replace').strip())
+        else:
+            lsLines = [sLine.strip() for sLine in str(bData, self.__sEncoding, 'replace').split('\n')]
+
+        # Incomplete trailing line
+        self.__baPartial += oData[i+1:iEnd]
+        if len(self.__baPartial)>self.__iMaxLength:
+            lsLines.append(self.__truncatePartial())
+        return lsLines
+
+
+    def flush(self):
+        """
+        Return the incomplete trailing line (if any) as a list of lines and clear it.
+        """
+
+        self.__bDiscard = False
+        self.__iDiscarded = 0
+        if not self.__baPartial:
+            return []
+        sLine = str(self.__baPartial, self.__sEncoding, 'replace').strip()
+        self.__baPartial.clear()
+        return [sLine]
@@ -0,0 +1,323 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import socket
+import stat
+import urllib.parse
+
+# LogWatcher
+from LogWatcher.Producers import Producer
+from .StreamFramer import StreamFramer
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Maximum amount of datagrams (or connections) handled per socket wake-up
+LISTEN_BATCH = 64
+
+# Stream receive chunk size, in bytes
+LISTEN_CHUNK_SIZE = 65536
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class Listen(Producer):
+    """
+    Syslog Receiver Producer.
+
+    This producer receives (syslog) messages from the network - or local UNIX
+    datagram socket - and feeds them to its parent watcher as they arrive; it
+    thus allows to skip the write-then-read disk round trip of having a syslog
+    daemon write messages to a file, which is then watched by a "Tail" producer.
+
+    All sockets are multiplexed by the producer routine, which may thus be run
+    by the daemon event loop.
+
+    Datagram sockets are drained of multiple datagrams per wake-up, into a
+    single (re-used) receive buffer; TCP connections support both octet-counting
+    and newline (non-transparent) framing (RFC 6587).
+
+    Messages carry the address of their sender (or the UNIX socket path) as
+    source.
+
+    Configuration parameters are (at least one socket must be specified):
+     - [opt] udp=<[host:]port>
+             UDP socket (host) address and port
+     - [opt] tcp=<[host:]port>
+             TCP socket (host) address and port
+     - [opt] unix=<string>
+             UNIX datagram socket path (e.g. /run/logwatcherd/log)
+     - [opt] maxline=<int> (default: 65536)
+             Maximum message length, in bytes (longer messages are truncated)
+     - [opt] maxclients=<int> (default: 64)
+             Maximum count of TCP connections
+     - [opt] rcvbuf=<int>
+             Datagram sockets receive buffer size (SO_RCVBUF), in bytes
+
+    Example (watcher configuration):
+     - producer = Listen?udp=127.0.0.1:5514
+     - producer = Listen?tcp=5514&unix=/run/logwatcherd/log
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sConfiguration, _bSynchronous, _bBlocking, _fTimeout):
+        # Parent constructor
+        Producer.__init__(self, _oWatcher, _sConfiguration, _bSynchronous, _bBlocking, _fTimeout)
+
+        # Configuration
+        dConfiguration = urllib.parse.parse_qs(_sConfiguration, keep_blank_values=True)
+        dConfiguration_keys = dConfiguration.keys()
+
+        # ... sockets
+        self.__ltAddresses = []
+        for (sProtocol, iType) in (('udp', socket.SOCK_DGRAM), ('tcp', socket.SOCK_STREAM)):
+            if sProtocol not in dConfiguration_keys:
+                continue
+            try:
+                (sHost, _, sPort) = dConfiguration[sProtocol][0].rpartition(':')
+                sHost = sHost.strip('[]') or None
+                (iFamily, _, _, _, tAddress) = socket.getaddrinfo(sHost, int(sPort), socket.AF_UNSPEC, iType, 0, socket.AI_PASSIVE)[0]
+                self.__ltAddresses.append((sProtocol, iFamily, iType, tAddress))
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Listen(%s)]: Invalid \'%s\' configuration parameter\n' % (_oWatcher.name(), sProtocol))
+                raise
+        if 'unix' in dConfiguration_keys:
+            self.__ltAddresses.append(('unix', socket.AF_UNIX, socket.SOCK_DGRAM, dConfiguration['unix'][0]))
+        if not self.__ltAddresses:
+            _oWatcher.log('ERROR[Producer:Listen(%s)]: Missing \'udp\', \'tcp\' or \'unix\' configuration parameter\n' % _oWatcher.name())
+            raise RuntimeError('Missing \'udp\', \'tcp\' or \'unix\' configuration parameter')
+
+        # ... maximum line length
+        self.__iMaxLine = 65536
+        if 'maxline' in dConfiguration_keys:
+            try:
+                self.__iMaxLine = int(dConfiguration['maxline'][0])
+                if self.__iMaxLine<=0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Listen(%s)]: Invalid \'maxline\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... maximum clients
+        self.__iMaxClients = 64
+        if 'maxclients' in dConfiguration_keys:
+            try:
+                self.__iMaxClients = int(dConfiguration['maxclients'][0])
+                if self.__iMaxClients<=0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Listen(%s)]: Invalid \'maxclients\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... receive buffer size
+        self.__iRcvBuf = None
+        if 'rcvbuf' in dConfiguration_keys:
+            try:
+                self.__iRcvBuf = int(dConfiguration['rcvbuf'][0])
+                if self.__iRcvBuf<=0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Listen(%s)]: Invalid \'rcvbuf\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # Fields
+        self.__baBuffer = bytearray(max(self.__iMaxLine, LISTEN_CHUNK_SIZE))
+        self.__dSockets = {}
+        self.__iMessages = 0
+        self.__iTruncated = 0
+        self.__iClients = 0
+        self.__iRejected = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def __bind(self):
+        """
+        Create and bind the configured sockets.
+
+        Raises OSError if a socket can not be created (or bound).
+        """
+
+        for (sProtocol, iFamily, iType, tAddress) in self.__ltAddresses:
+            oSocket = socket.socket(iFamily, iType)
+            try:
+                if sProtocol=='unix':
+                    try:
+                        if stat.S_ISSOCK(os.lstat(tAddress).st_mode):
+                            os.unlink(tAddress)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    oSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if iType==socket.SOCK_DGRAM and self.__iRcvBuf is not None:
+                    oSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.__iRcvBuf)
+                oSocket.bind(tAddress)
+                if iType==socket.SOCK_STREAM:
+                    oSocket.listen(self.__iMaxClients)
+                oSocket.setblocking(False)
+            except OSError:
+                oSocket.close()
+                raise
+            self.__dSockets[oSocket] = (sProtocol, iType, None, None)
+            if self._bDebug:
+                self._oWatcher.log('DEBUG[Producer:Listen(%s)]: Listening on %s:%s\n' % (self._oWatcher.name(), sProtocol, tAddress))
+
+
+    def __close(self):
+        """
+        Close all sockets.
+        """
+
+        for (oSocket, (sProtocol, _, oFramer, _)) in self.__dSockets.items():
+            if oFramer is not None:
+                self.__iTruncated += oFramer.truncated()
+            if sProtocol=='unix':
+                try:
+                    os.unlink(oSocket.getsockname())
+                except OSError:
+                    pass
+            oSocket.close()
+        self.__dSockets = {}
+        self.__iClients = 0
+
+
+    def __receive(self, _oSocket, _sProtocol):
+        """
+        Receive (a batch of) datagrams and feed the corresponding messages.
+
+        @param  socket  _oSocket    Datagram socket
+        @param  string  _sProtocol  Socket protocol
+        """
+
+        oBuffer = memoryview(self.__baBuffer)
+        for _ in range(LISTEN_BATCH):
+            try:
+                (iRead, tAddress) = _oSocket.recvfrom_into(self.__baBuffer, self.__iMaxLine, socket.MSG_TRUNC)
+            except (BlockingIOError, InterruptedError):
+                break
+            if iRead>self.__iMaxLine:
+                iRead = self.__iMaxLine
+                self.__iTruncated += 1
+            sMessage = str(oBuffer[:iRead], 'utf-8', 'replace').strip()
+            if not sMessage:
+                continue
+            self.__iMessages += 1
+            self._feed(sMessage, tAddress[0] if _sProtocol!='unix' else _oSocket.getsockname())
+            if self._bStop: break
+
+
+    def __accept(self, _oSocket):
+        """
+        Accept (a batch of) incoming connections.
+
+        @param  socket  _oSocket  Listening socket
+        """
+
+        for _ in range(LISTEN_BATCH):
+            try:
+                (oConnection, tAddress) = _oSocket.accept()
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                self._oWatcher.log('WARNING[Producer:Listen(%s)]: Failed to accept connection\n%s\n' % (self._oWatcher.name(), str(e)))
+                break
+            if self.__iClients>=self.__iMaxClients:
+                self._oWatcher.log('WARNING[Producer:Listen(%s)]: Too many connections; rejecting %s\n' % (self._oWatcher.name(), tAddress[0]))
+                self.__iRejected += 1
+                oConnection.close()
+                continue
+            oConnection.setblocking(False)
+            self.__dSockets[oConnection] = ('tcp', socket.SOCK_STREAM, StreamFramer(self.__iMaxLine), tAddress[0])
+            self.__iClients += 1
+
+
+    def __stream(self, _oConnection, _oFramer, _sSource):
+        """
+        Receive connection data and feed the corresponding messages.
+
+        @param  socket        _oConnection  Connection socket
+        @param  StreamFramer  _oFramer      Connection messages splitter
+        @param  string        _sSource      Connection peer address
+        """
+
+        try:
+            iRead = _oConnection.recv_into(self.__baBuffer, LISTEN_CHUNK_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            iRead = 0
+        if iRead:
+            lsMessages = _oFramer.feed(self.__baBuffer, iRead)
+        else:
+            lsMessages = _oFramer.flush()
+            self.__iTruncated += _oFramer.truncated()
+            del self.__dSockets[_oConnection]
+            _oConnection.close()
+            self.__iClients -= 1
+        for sMessage in lsMessages:
+            if self._bStop: break
+            self.__iMessages += 1
+            self._feed(sMessage, _sSource)
+
+
+    def statistics(self):
+        # Statistics
+        return {
+            'messages': self.__iMessages,
+            'truncated': self.__iTruncated,
+            'clients': self.__iClients,
+            'rejected': self.__iRejected,
+        }
+
+
+    def routine(self):
+        # Listen
+        try:
+            self.__bind()
+
+            # Feed the received messages
+            while True:
+                if self._bStop: break
+                lReady = yield (list(self.__dSockets.keys()), None)
+                for oSocket in lReady:
+                    if self._bStop: break
+                    (sProtocol, iType, oFramer, sSource) = self.__dSockets[oSocket]
+                    if oFramer is not None:
+                        self.__stream(oSocket, oFramer, sSource)
+                    elif iType==socket.SOCK_STREAM:
+                        self.__accept(oSocket)
+                    else:
+                        self.__receive(oSocket, sProtocol)
+        finally:
+            self.__close()
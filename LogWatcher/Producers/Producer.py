@@ -23,13 +23,22 @@
 
 # Standard
 from .ProducerQueue import ProducerQueue, Busy
-from queue import Empty
+from .ProducerRoutine import ProducerRoutine
 from threading import Thread
+import time
 
 # LogWatcher
 from LogWatcher import Plugin
+from LogWatcher.SyslogHeader import SyslogHeader
 
 
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Maximum amount of data (lines) pending for the co-worker thread (asynchronous)
+PRODUCER_QUEUE_SIZE = 1000
+
 
 #------------------------------------------------------------------------------
 # CLASSES
@@ -65,12 +74,18 @@ class Producer(Plugin):
         self.__bSynchronous = _bSynchronous
         self.__bBlocking = _bBlocking
         self.__fTimeout = _fTimeout
+        self.__oScheduler = _oWatcher.scheduler() if self.schedulable() else None
+        self.__oSpool = _oWatcher.spool() if not _bSynchronous and not _bBlocking else None
+        self.__oPrograms = _oWatcher.programs()
+        self.__oRoutineDriver = None
+        self.__iFed = 0
         self._bStop = False
 
         # ... co-worker thread
-        if not self.__bSynchronous:
+        if not self.__bSynchronous and self.__oScheduler is None:
             sThreadName = '%s.Producer' % _oWatcher.name()
-            self.__oQueueData = ProducerQueue(1)
+            iQueueSize = self.__oSpool.memory() if self.__oSpool is not None else PRODUCER_QUEUE_SIZE
+            self.__oQueueData = ProducerQueue(iQueueSize, self.__fTimeout)
             self.__oThreadFeedWatcher = Thread(name=sThreadName, target=self.__feedWatcher)
             self.__oThreadFeedWatcher.start()
 
@@ -85,68 +100,170 @@ class Producer(Plugin):
 
         This wrapper detects when the producer is being stuck by a failing
         filters/consumers chain in its parent watcher.
-        """
-
-        while True:
-            if self._bStop: break
-            try:
-                sData = self.__oQueueData.get(timeout=1.0)
-                self._oWatcher.feed(sData)
-                self.__oQueueData.task_done()
-            except Empty:
-                pass
 
+        Data spilled to the overflow spool (if any) are replayed once all
+        queued data have been fed.
+        """
 
-    def _feed(self, _sData):
+        oSpool = self.__oSpool
+        try:
+            while True:
+                if self._bStop: break
+                bSpool = oSpool is not None and oSpool.pending()
+                lBatch = self.__oQueueData.get(0.0 if bSpool else 1.0)
+                if not lBatch and bSpool:
+                    lBatch = oSpool.get(oSpool.memory())
+                for tData in lBatch:
+                    if self._bStop: break
+                    self._oWatcher.feed(*tData)
+                    self.__oQueueData.done()
+        finally:
+            if oSpool is not None:
+                oSpool.close()
+
+
+    def _feed(self, _sData, _sSource=None, _bRouted=False):
         """
         Feed the data to the parent watcher.
 
-        Unless the producer is configured as synchronous, this method uses a
-        co-worker thread to detect whether the parent watcher gets stuck while
-        feeding the data to its filters/consumers chain.
+        Unless the producer is configured as synchronous, this method hands the
+        data over - in batches - to a co-worker thread, which allows to detect
+        whether the parent watcher gets stuck while feeding the data to its
+        filters/consumers chain (each data being allotted the configured timeout).
 
         If the producer is set to blocking (the default), this method will block
-        until the parent watcher is done feeding the data. If set to non-blocking,
-        it will exit immediately and discard (!) the data as long as the parent
-        watcher is not done feeding previous data.
+        as long as the co-worker queue is full. If set to non-blocking, it will
+        exit immediately and discard (!) the data as long as the parent watcher
+        is stuck (or the queue full), unless an overflow spool is configured, in
+        which case the data are spilled to disk (and replayed later on).
+
+        If the parent watcher is restricted to given syslog programs (tags), data
+        from other programs are discarded, unless already routed accordingly by a
+        shared data source (see ProducerDispatch).
 
         This method SHOULD be called by a producer as part of its run() business
         (rather than feeding the data directly to the parent watcher).
+
+        @param  string  _sData    Log data (line)
+        @param  string  _sSource  Data source (e.g. file path; optional)
+        @param  bool    _bRouted  Data already routed according to their program (shared data source)
         """
 
+        # Program ?
+        if self.__oPrograms is not None and not _bRouted:
+            if SyslogHeader.program(_sData) not in self.__oPrograms:
+                return
+
+        # Ingest time
+        # NB: carried along the data (queue, spool, worker processes) such as time-based
+        #     conditioners (e.g. Threshold) do not depend on processing delays
+        fTime = time.time()
+
+        # Scheduled ?
+        if self.__oScheduler is not None:
+            if self.__oScheduler.feed(self, _sData, _sSource, fTime):
+                self.__iFed += 1
+            return
+
         # Synchronous ?
         if self.__bSynchronous:
-            self._oWatcher.feed(_sData)
+            self.__iFed += 1
+            self._oWatcher.feed(_sData, _sSource, fTime)
             return
 
         # Feed data to the watcher asynchronously (using a the co-worker thread queue)
 
-        # ... check ongoing (non-blocking and timed-out) data feed
-        if self.__oQueueData.busy():
-            if self.__bBlocking:
-                # NB: something is definitely wrong if we get here!...
-                raise Exception('Watcher is still feeding previous data')
-            else:
-                self._oWatcher.log('WARNING[Producer(%s)]: Watcher is still feeding previous data; discarding current data\n' % self._oWatcher.name())
+        # ... overflow spool (non-blocking)
+        # NB: data the spool fails to write are accounted for by the spool (see ProducerSpool.acknowledged())
+        if self.__oSpool is not None:
+            self.__iFed += 1
+            if self.__oSpool.pending() or self.__oQueueData.stuck():
+                self.__oSpool.put(_sData, _sSource, fTime)
                 return
+            try:
+                self.__oQueueData.put((_sData, _sSource, fTime), 0.0)
+            except Busy:
+                self.__oSpool.put(_sData, _sSource, fTime)
+            return
+
+        # ... check ongoing (non-blocking and timed-out) data feed
+        if not self.__bBlocking and self.__oQueueData.stuck():
+            self._oWatcher.log('WARNING[Producer(%s)]: Watcher is still feeding previous data; discarding current data\n' % self._oWatcher.name())
+            return
 
-        # ... feed new data
+        # ... queue new data (waiting for room if need be)
         if self._bDebug:
             self._oWatcher.log('DEBUG[Producer(%s)]: Feeding data asynchronously\n' % self._oWatcher.name())
-        self.__oQueueData.put(_sData)
-
-        # ... wait for the watcher to be done with the data
         while True:
             if self._bStop: break
             try:
-                self.__oQueueData.join(self.__fTimeout)
+                self.__oQueueData.put((_sData, _sSource, fTime), self.__fTimeout)
+                self.__iFed += 1
             except Busy:
                 if self.__bBlocking:
-                    self._oWatcher.log('WARNING[Producer(%s)]: Watcher is still feeding previous data; trying again...\n' % self._oWatcher.name())
+                    if self.__oQueueData.stuck():
+                        self._oWatcher.log('WARNING[Producer(%s)]: Watcher is still feeding previous data; trying again...\n' % self._oWatcher.name())
                     continue
+                self._oWatcher.log('WARNING[Producer(%s)]: Watcher is still feeding previous data; discarding current data\n' % self._oWatcher.name())
             break
 
 
+    def fed(self):
+        """
+        Return the count of data handed over to the parent watcher (discarded
+        data excluded) since the producer was created.
+        """
+
+        return self.__iFed
+
+
+    def acknowledged(self):
+        """
+        Return the count of data (see fed()) processed by the parent watcher.
+
+        Data are processed in the order they were fed; all data fed until fed()
+        returned a given count are thus processed once this method returns (at
+        least) that count.
+        """
+
+        return self._oWatcher.acknowledged()
+
+
+    def programs(self):
+        """
+        Return the syslog programs (tags) the parent watcher is restricted to, as
+        a set (None for all programs).
+        """
+
+        return self.__oPrograms
+
+
+    def blocking(self):
+        """
+        Return whether the producer is set to blocking (waiting for its parent
+        watcher rather than discarding data).
+        """
+
+        return self.__bBlocking
+
+
+    def schedulable(self):
+        """
+        Return whether the producer implements a routine (and may thus be run by
+        the daemon event loop rather than its own thread).
+        """
+
+        return type(self).routine is not Producer.routine
+
+
+    def stopped(self):
+        """
+        Return whether the producer is requested to stop.
+        """
+
+        return self._bStop
+
+
     def stop(self):
         """
         Stop the producer and exit gracefully.
@@ -154,12 +271,62 @@ class Producer(Plugin):
 
         # Stop
         self._bStop = True
+        oRoutineDriver = self.__oRoutineDriver
+        if oRoutineDriver is not None:
+            oRoutineDriver.wake()
+        if self.__oScheduler is not None:
+            self.__oScheduler.wake()
 
 
     #------------------------------------------------------------------------------
     # METHODS - TO BE OVERRIDDEN
     #------------------------------------------------------------------------------
 
+    def shareable(self):
+        """
+        Return the key identifying the data source this producer may share with
+        other (identical) producers, or None if it may not be shared.
+
+        The default implementation is not to share anything (return None).
+        """
+
+        # Key
+        # (this is where your producer may identify its shareable data source)
+        return None
+
+
+    def share(self, _oProducer):
+        """
+        Share the data source of the given (identical) producer.
+
+        This method is called by the daemon for each producer whose shareable()
+        key matches the one of a previously configured producer.
+
+        The default implementation is to do nothing (exit immediately).
+
+        @param  Producer  _oProducer  Producer whose data source to share
+        """
+
+        # Share
+        # (this is where your producer may re-use the given producer's data source)
+        pass
+
+
+    def routine(self):
+        """
+        Return the producer routine; a generator implementing the producer
+        business without ever blocking (see ProducerRoutine), which allows the
+        producer to be run by the daemon event loop (along other producers)
+        rather than its own thread.
+
+        The default implementation is not to provide any routine (return None).
+        """
+
+        # Routine
+        # (this is where your non-blocking producer business may be implemented)
+        return None
+
+
     def run(self):
         """
         Run the producer.
@@ -167,9 +334,19 @@ class Producer(Plugin):
         This method must block until the parent watcher is requested to stop and
         it complies gracefully (watching for self._bStop==True).
 
-        The default implementation is to do nothing (exit immediately).
+        The default implementation is to drive the producer routine (if any) or
+        otherwise do nothing (exit immediately).
         """
 
         # Run
         # (this is where your actual producer business ought to be implemented)
-        pass
+        oRoutine = self.routine()
+        if oRoutine is None:
+            return
+        self.__oRoutineDriver = ProducerRoutine()
+        try:
+            self.__oRoutineDriver.run(oRoutine, self.stopped)
+        finally:
+            oRoutineDriver = self.__oRoutineDriver
+            self.__oRoutineDriver = None
+            oRoutineDriver.close()
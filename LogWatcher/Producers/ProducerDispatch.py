@@ -0,0 +1,117 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# LogWatcher
+from LogWatcher.SyslogHeader import SyslogHeader
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class ProducerDispatch:
+    """
+    Program (Tag) Dispatch Index.
+
+    This class/object routes the data (lines) of a shared data source to its
+    targets (e.g. the queues of the producers sharing the source), according to
+    the syslog program (tag) each target's watcher is restricted to (if any).
+
+    Each line header is parsed once (see SyslogHeader) and its targets looked up
+    in a dictionary, such as watchers never see (nor run their filters against)
+    lines from other programs; lines are not parsed at all if no target is
+    restricted to given programs.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        # Fields
+        self.__ltTargets = []
+        self.__tIndex = ({}, (), False)
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def __index(self):
+        """
+        (Re)build the dispatch index.
+        """
+
+        toAll = tuple([oTarget for (oTarget, oPrograms) in self.__ltTargets if oPrograms is None])
+        dIndex = {}
+        for (oTarget, oPrograms) in self.__ltTargets:
+            for sProgram in oPrograms or ():
+                dIndex.setdefault(sProgram, [])
+        for sProgram in dIndex.keys():
+            dIndex[sProgram] = tuple([oTarget for (oTarget, oPrograms) in self.__ltTargets if oPrograms is None or sProgram in oPrograms])
+        self.__tIndex = (dIndex, toAll, bool(dIndex))
+
+
+    def add(self, _oTarget, _oPrograms):
+        """
+        Add the given target.
+
+        NB: the caller must serialize targets addition/removal.
+
+        @param  object     _oTarget    Target
+        @param  frozenset  _oPrograms  Programs (tags) the target is restricted to (None for all)
+        """
+
+        self.__ltTargets.append((_oTarget, _oPrograms))
+        self.__index()
+
+
+    def remove(self, _oTarget):
+        """
+        Remove the given target.
+
+        NB: the caller must serialize targets addition/removal.
+
+        @param  object  _oTarget  Target
+        """
+
+        self.__ltTargets = [(oTarget, oPrograms) for (oTarget, oPrograms) in self.__ltTargets if oTarget is not _oTarget]
+        self.__index()
+
+
+    def targets(self, _sData):
+        """
+        [thread-safe] Return the targets of the given data (line), as a tuple.
+
+        @param  string  _sData  Data (line)
+        """
+
+        (dIndex, toAll, bIndexed) = self.__tIndex
+        if not bIndexed:
+            return toAll
+        return dIndex.get(SyslogHeader.program(_sData), toAll)
@@ -1,13 +1,30 @@
 # -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
 # ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
 
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
 #------------------------------------------------------------------------------
 # DEPENDENCIES
 #------------------------------------------------------------------------------
 
 # Standard
-from queue import Queue
-from time import time
+from threading import Condition, Lock
+from time import monotonic
 
 
 #------------------------------------------------------------------------------
@@ -16,45 +33,115 @@ from time import time
 
 class Busy(Exception):
     """
-    Exception raised by ProducerQueue.join() timeout.
+    Exception raised by ProducerQueue.put() timeout.
     """
 
     pass
 
 
-class ProducerQueue(Queue):
+class ProducerQueue:
     """
-    A extended version of Python Queue class which adds a timeout to its join()
-    method.
+    Bounded (batch) queue, handing data over from a producer to its co-worker
+    (watcher feeding) thread.
+
+    Data are appended - without waiting - to a pending batch, which the
+    co-worker thread swaps for an empty one and processes as a whole; threads
+    are thus woken up once per batch (rather than once per data), while the
+    queue size bounds the amount of pending data.
+
+    The co-worker is considered stuck when it fails to process any data of its
+    current batch within the allotted time (per data timeout), the co-worker
+    reporting its progress after each data (see done()).
     """
 
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _iSize, _fTimeout):
+        """
+        Constructor.
+
+        @param  int    _iSize     Maximum amount of pending data
+        @param  float  _fTimeout  Processing timeout, per data, in seconds
+        """
+
+        # Fields
+        self.__iSize = _iSize
+        self.__fTimeout = _fTimeout
+        self.__oLock = Lock()
+        self.__oNotEmpty = Condition(self.__oLock)
+        self.__oNotFull = Condition(self.__oLock)
+        self.__lPending = []
+        self.__iProcessing = 0
+        self.__fProgress = 0.0
+
+
     #------------------------------------------------------------------------------
     # METHODS
     #------------------------------------------------------------------------------
 
-    def busy(self):
+    def put(self, _tData, _fTimeout):
         """
-        Returns whether the queue has unfinished tasks.
+        Append the given data to the pending batch, waiting for room if the queue
+        is full; raises Busy if no room is made within the given timeout.
+
+        @param  tuple  _tData     Data
+        @param  float  _fTimeout  Timeout, in seconds
         """
 
-        self.all_tasks_done.acquire()
-        b = self.unfinished_tasks>0
-        self.all_tasks_done.release()
-        return b
+        with self.__oLock:
+            if len(self.__lPending)>=self.__iSize:
+                fEndTime = monotonic()+_fTimeout
+                while len(self.__lPending)>=self.__iSize:
+                    fRemaining = fEndTime-monotonic()
+                    if fRemaining<=0.0:
+                        raise Busy
+                    self.__oNotFull.wait(fRemaining)
+            self.__lPending.append(_tData)
+            if len(self.__lPending)==1:
+                self.__oNotEmpty.notify()
 
 
-    def join(self, timeout=None):
-        if timeout is None:
-            return Queue.join()
+    def get(self, _fTimeout):
+        """
+        Return the pending batch (list of data), waiting for data to be available
+        up to the given timeout (returning an empty batch in that case).
+
+        The previous batch is implicitly considered processed.
+
+        @param  float  _fTimeout  Timeout, in seconds
+        """
+
+        with self.__oLock:
+            self.__iProcessing = 0
+            if not self.__lPending:
+                self.__oNotEmpty.wait(_fTimeout)
+                if not self.__lPending:
+                    return []
+            lBatch = self.__lPending
+            self.__lPending = []
+            self.__iProcessing = len(lBatch)
+            self.__fProgress = monotonic()
+            self.__oNotFull.notify()
+            return lBatch
+
+
+    def done(self):
+        """
+        Report the processing of (one) data of the current batch.
+
+        NB: lock-free (called once per data).
+        """
+
+        self.__fProgress = monotonic()
+
+
+    def stuck(self):
+        """
+        Return whether the current batch has made no progress within the
+        processing timeout.
+        """
 
-        # REF: http://stackoverflow.com/questions/1564501/add-timeout-argument-to-pythons-queue-join
-        self.all_tasks_done.acquire()
-        try:
-            endtime = time() + timeout
-            while self.unfinished_tasks:
-                remaining = endtime - time()
-                if remaining <= 0.0:
-                    raise Busy
-                self.all_tasks_done.wait(remaining)
-        finally:
-            self.all_tasks_done.release()
+        with self.__oLock:
+            return self.__iProcessing>0 and monotonic()-self.__fProgress>self.__fTimeout
@@ -0,0 +1,142 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import selectors
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class ProducerRoutine:
+    """
+    Producer Routine (Blocking) Driver.
+
+    A producer routine is a generator which implements the producer business
+    without ever blocking: it yields (files, timeout) tuples instead, where
+     - files is the list of (readable) file objects or descriptors to wait for
+     - timeout is the maximum time to wait, in seconds (None for no timeout;
+       zero to merely let other routines run, e.g. between two read chunks)
+    and is resumed with the list of the files that became readable (if any).
+
+    This class/object drives a routine in its own thread, blocking on its behalf
+    (without using any CPU) until it needs to be resumed; the very same routine
+    may thus be driven either by its own thread or by the daemon event loop
+    (see LogWatcher.Scheduler).
+
+    A self-pipe allows other threads to wake up the driver; e.g. when the
+    producer is requested to stop.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        # Fields
+        self.__iWakeRead, self.__iWakeWrite = os.pipe()
+        os.set_blocking(self.__iWakeRead, False)
+        os.set_blocking(self.__iWakeWrite, False)
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def wake(self):
+        """
+        [thread-safe] Wake up the driver, if it is blocked waiting.
+        """
+
+        try:
+            os.write(self.__iWakeWrite, b'\0')
+        except (BlockingIOError, OSError, TypeError):
+            pass
+
+
+    def run(self, _oRoutine, _fnStop):
+        """
+        Drive the given routine until it ends or the given stop function returns
+        True (the routine is then closed).
+
+        @param  generator  _oRoutine  Producer routine
+        @param  function   _fnStop    Stop checking function
+        """
+
+        oSelector = selectors.DefaultSelector()
+        oSelector.register(self.__iWakeRead, selectors.EVENT_READ, None)
+        setFiles = set()
+        lReady = None
+        try:
+            while True:
+                if _fnStop(): break
+
+                # Resume routine
+                try:
+                    (lFiles, fTimeout) = _oRoutine.send(lReady)
+                except StopIteration:
+                    break
+                setFilesWait = set(lFiles or ())
+                for oFile in setFiles-setFilesWait:
+                    oSelector.unregister(oFile)
+                for oFile in setFilesWait-setFiles:
+                    oSelector.register(oFile, selectors.EVENT_READ, oFile)
+                setFiles = setFilesWait
+
+                # Wait
+                fDeadline = time.monotonic()+fTimeout if fTimeout is not None else None
+                lReady = []
+                while True:
+                    fWait = max(0.0, fDeadline-time.monotonic()) if fDeadline is not None else None
+                    for (oKey, _) in oSelector.select(fWait):
+                        if oKey.data is None:
+                            try:
+                                while os.read(self.__iWakeRead, 4096): pass
+                            except BlockingIOError:
+                                pass
+                        else:
+                            lReady.append(oKey.data)
+                    if lReady or _fnStop(): break
+                    if fDeadline is not None and time.monotonic()>=fDeadline: break
+        finally:
+            _oRoutine.close()
+            oSelector.close()
+
+
+    def close(self):
+        """
+        Release the wake-up pipe file descriptors.
+        """
+
+        for iFD in (self.__iWakeRead, self.__iWakeWrite):
+            try:
+                os.close(iFD)
+            except OSError:
+                pass
@@ -0,0 +1,345 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from collections import deque
+import glob
+import json
+import os
+from threading import Lock
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Maximum segment size, in bytes
+PRODUCERSPOOL_SEGMENT_SIZE = 4194304
+
+# Minimum count of segments (within the disk cap; drop-oldest granularity)
+PRODUCERSPOOL_SEGMENTS_MIN = 4
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class ProducerSpoolSegment:
+    """
+    Producer Overflow Spool Segment.
+
+    This class/object holds the state of each spool segment (file).
+    """
+
+    __slots__ = ('path', 'lines', 'size', 'offset')
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _sPath, _iLines, _iSize):
+        """
+        Constructor.
+
+        @param  string  _sPath   Segment file path
+        @param  int     _iLines  Count of unread lines
+        @param  int     _iSize   Segment size, in bytes
+        """
+
+        # Fields
+        self.path = _sPath
+        self.lines = _iLines
+        self.size = _iSize
+        self.offset = 0
+
+
+class ProducerSpool:
+    """
+    Producer Overflow Spool.
+
+    This class/object spills the data a (non-blocking) watcher can not keep up
+    with to disk, rather than discarding them, and replays them - in order -
+    once the watcher catches up.
+
+    Data are appended to a bounded set of segment files (one JSON-encoded line
+    per data), named after the watcher:
+
+      <directory>/<watcher>.<sequence>.spool
+
+    Segments are deleted as soon as they are fully replayed; when the disk cap
+    is exceeded, the oldest segment is dropped (along its unread data). Segments
+    left over by a previous run are replayed first.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sDirectory, _iMemory, _iDisk):
+        """
+        Constructor.
+
+        @param  Watcher  _oWatcher    Parent watcher
+        @param  string   _sDirectory  Spool directory
+        @param  int      _iMemory     Maximum count of data held in memory (before spilling)
+        @param  int      _iDisk       Maximum spool size (disk cap), in bytes
+        """
+
+        # Fields
+        self._oWatcher = _oWatcher
+        self.__sPrefix = os.path.join(_sDirectory, '%s.' % _oWatcher.name())
+        self.__iMemory = _iMemory
+        self.__iDisk = _iDisk
+        self.__iSegmentSize = max(1, min(PRODUCERSPOOL_SEGMENT_SIZE, _iDisk // PRODUCERSPOOL_SEGMENTS_MIN))
+        self.__oLock = Lock()
+        self.__doSegments = deque()
+        self.__iSequence = 0
+        self.__iSize = 0
+        self.__iPending = 0
+        self.__oFileWrite = None
+        self.__oFileRead = None
+        self.__iSpilled = 0
+        self.__iReplayed = 0
+        self.__iDropped = 0
+        self.__iLeftover = 0
+
+        # Leftover segments
+        os.makedirs(_sDirectory, exist_ok=True)
+        for sPath in sorted(glob.glob('%s*.spool' % glob.escape(self.__sPrefix))):
+            try:
+                self.__iSequence = max(self.__iSequence, int(sPath[len(self.__sPrefix):-6])+1)
+            except ValueError:
+                continue
+            with open(sPath, 'rb') as oFile:
+                iLines = sum(1 for _ in oFile)
+                iSize = oFile.tell()
+            self.__doSegments.append(ProducerSpoolSegment(sPath, iLines, iSize))
+            self.__iSize += iSize
+            self.__iPending += iLines
+        self.__iLeftover = self.__iPending
+        if self.__iPending:
+            _oWatcher.log('INFO[Watcher(%s)]: Replaying spooled data left over (total:%d)\n' % (_oWatcher.name(), self.__iPending))
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def memory(self):
+        """
+        Return the maximum count of data held in memory (before spilling).
+        """
+
+        return self.__iMemory
+
+
+    def pending(self):
+        """
+        Return whether the spool holds data not replayed yet.
+        """
+
+        return self.__iPending>0
+
+
+    def acknowledged(self):
+        """
+        Return the count of data the spool accounts for, in the watcher count of
+        processed data (see Watcher.acknowledged()): dropped data (which will never
+        be fed to the watcher), less data left over by a previous run (which are
+        fed to the watcher without having been produced by this run).
+        """
+
+        return self.__iDropped-self.__iLeftover
+
+
+    def statistics(self):
+        """
+        Return the spool statistics (dictionary).
+        """
+
+        return {
+            'spilled': self.__iSpilled,
+            'replayed': self.__iReplayed,
+            'dropped': self.__iDropped,
+            'pending': self.__iPending,
+            'size': self.__iSize,
+        }
+
+
+    def __drop(self):
+        """
+        Drop the oldest segment (along its unread data).
+        """
+
+        oSegment = self.__doSegments.popleft()
+        if self.__oFileRead is not None:
+            # NB: the read file always belongs to the oldest segment
+            self.__oFileRead.close()
+            self.__oFileRead = None
+        if self.__oFileWrite is not None and not self.__doSegments:
+            self.__oFileWrite.close()
+            self.__oFileWrite = None
+        try:
+            os.unlink(oSegment.path)
+        except OSError:
+            pass
+        self.__iSize -= oSegment.size
+        self.__iPending -= oSegment.lines
+        self.__iDropped += oSegment.lines
+        return oSegment.lines
+
+
+    def put(self, _sData, _sSource, _fTime=None):
+        """
+        [thread-safe] Spill the given data to disk; returns whether the data
+        could be written (or was discarded).
+
+        @param  string  _sData    Log data (line)
+        @param  string  _sSource  Data source
+        @param  float   _fTime    Ingest time, as a UNIX timestamp (optional)
+        """
+
+        bData = json.dumps((_sData, _sSource, _fTime)).encode('utf-8')+b'\n'
+        with self.__oLock:
+            try:
+                # Segment
+                if not self.__doSegments or self.__doSegments[-1].size>=self.__iSegmentSize:
+                    if self.__oFileWrite is not None:
+                        self.__oFileWrite.close()
+                        self.__oFileWrite = None
+                    self.__doSegments.append(ProducerSpoolSegment('%s%010d.spool' % (self.__sPrefix, self.__iSequence), 0, 0))
+                    self.__iSequence += 1
+                oSegment = self.__doSegments[-1]
+                if self.__oFileWrite is None:
+                    self.__oFileWrite = open(oSegment.path, 'ab')
+
+                # Write
+                self.__oFileWrite.write(bData)
+            except OSError as e:
+                self._oWatcher.log('ERROR[Watcher(%s)]: Failed to spill data to disk; discarding data\n%s\n' % (self._oWatcher.name(), str(e)))
+                self.__iDropped += 1
+                return False
+            oSegment.lines += 1
+            oSegment.size += len(bData)
+            self.__iSize += len(bData)
+            self.__iPending += 1
+            self.__iSpilled += 1
+
+            # Disk cap (drop oldest)
+            while self.__iSize>self.__iDisk and len(self.__doSegments)>1:
+                iDropped = self.__drop()
+                self._oWatcher.log('WARNING[Watcher(%s)]: Spool is full; dropping oldest data (count:%d)\n' % (self._oWatcher.name(), iDropped))
+        return True
+
+
+    def get(self, _iCount):
+        """
+        [thread-safe] Return (up to) the given count of spilled data, in order
+        (as a list of (data, source, time) tuples).
+
+        NB: data spooled by previous versions lack the (ingest) time, which then
+            defaults to the time they are processed at.
+
+        @param  int  _iCount  Maximum count of data
+        """
+
+        lBatch = []
+        with self.__oLock:
+            if self.__oFileWrite is not None:
+                self.__oFileWrite.flush()
+            while self.__doSegments and len(lBatch)<_iCount:
+                oSegment = self.__doSegments[0]
+                try:
+                    if self.__oFileRead is None:
+                        self.__oFileRead = open(oSegment.path, 'rb')
+                        self.__oFileRead.seek(oSegment.offset)
+                    while oSegment.lines and len(lBatch)<_iCount:
+                        bData = self.__oFileRead.readline()
+                        if not bData: break
+                        oSegment.offset += len(bData)
+                        oSegment.lines -= 1
+                        self.__iPending -= 1
+                        try:
+                            lBatch.append(tuple(json.loads(bData)))
+                        except ValueError:
+                            self.__iDropped += 1
+                except OSError as e:
+                    self._oWatcher.log('ERROR[Watcher(%s)]: Failed to replay spooled data; dropping segment\n%s\n' % (self._oWatcher.name(), str(e)))
+                    self.__drop()
+                    continue
+                if oSegment.lines:
+                    if len(lBatch)<_iCount:
+                        # NB: truncated segment
+                        self.__iPending -= oSegment.lines
+                        self.__iDropped += oSegment.lines
+                        oSegment.lines = 0
+                    else:
+                        break
+
+                # ... replayed segment
+                self.__oFileRead.close()
+                self.__oFileRead = None
+                if len(self.__doSegments)==1 and self.__oFileWrite is not None:
+                    self.__oFileWrite.close()
+                    self.__oFileWrite = None
+                self.__doSegments.popleft()
+                self.__iSize -= oSegment.size
+                try:
+                    os.unlink(oSegment.path)
+                except OSError:
+                    pass
+            self.__iReplayed += len(lBatch)
+        return lBatch
+
+
+    def close(self):
+        """
+        [thread-safe] Close the spool files (which are kept for the next run).
+
+        The already replayed data of the oldest segment are discarded from its
+        file, so they are not replayed again by the next run.
+        """
+
+        with self.__oLock:
+            if self.__oFileWrite is not None:
+                self.__oFileWrite.close()
+                self.__oFileWrite = None
+            if self.__oFileRead is not None:
+                self.__oFileRead.close()
+                self.__oFileRead = None
+            if not self.__doSegments or not self.__doSegments[0].offset:
+                return
+            oSegment = self.__doSegments[0]
+            sPathTemp = '%s.tmp' % oSegment.path
+            try:
+                with open(oSegment.path, 'rb') as oFile, open(sPathTemp, 'wb') as oFileTemp:
+                    oFile.seek(oSegment.offset)
+                    oFileTemp.write(oFile.read())
+                os.replace(sPathTemp, oSegment.path)
+            except OSError as e:
+                self._oWatcher.log('WARNING[Watcher(%s)]: Failed to compact spool segment\n%s\n' % (self._oWatcher.name(), str(e)))
+                return
+            self.__iSize -= oSegment.offset
+            oSegment.size -= oSegment.offset
+            oSegment.offset = 0
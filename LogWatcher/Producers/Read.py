@@ -22,11 +22,46 @@
 #------------------------------------------------------------------------------
 
 # Standard
+import bz2
+import glob
+import gzip
+import lzma
+import os
+import re
 import time
 import urllib.parse
 
+# Extra (optional)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # LogWatcher
 from LogWatcher.Producers import Producer
+from .LineBuffer import LineBuffer
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Read (decompressed) chunk size, in bytes
+READ_CHUNK_SIZE = 1048576
+
+# Compression formats magic numbers
+READ_MAGIC_GZIP = b'\x1f\x8b'
+READ_MAGIC_BZIP2 = b'BZh'
+READ_MAGIC_XZ = b'\xfd7zXZ\x00'
+READ_MAGIC_ZSTD = b'\x28\xb5\x2f\xfd'
+
+# Rotation index (e.g. mail.log.2.gz)
+READ_ROTATION_INDEX = re.compile(r'\.([0-9]+)(\.(gz|bz2|xz|zst))?$')
+
+# Read (decompression) errors
+READ_ERRORS = (IOError, OSError, EOFError, ValueError, lzma.LZMAError)
+if zstandard is not None:
+    READ_ERRORS += (zstandard.ZstdError,)
 
 
 #------------------------------------------------------------------------------
@@ -40,16 +75,37 @@ class Read(Producer):
     This producer reads the configured file and feeds it to its parent watcher
     line by line.
 
-    It is useful mostly for debugging purposes.
+    It is useful mostly for debugging and backfilling purposes.
+
+    Compressed files - gzip, bzip2, xz and zstd (if the 'zstandard' module is
+    available) - are detected automatically and decompressed on the fly (as a
+    stream, through large buffers, without temporary files).
+
+    If the file path is a glob pattern, all matching files are read one after
+    the other, ordered as a rotation set (oldest first; e.g. mail.log.14.gz,
+    ..., mail.log.2.gz, mail.log.1, mail.log), by name or by modification time.
+    Each line then carries the path of the file it originates from (source).
+
+    Files are read by the producer routine (yielding between chunks), which may
+    thus be run by the daemon event loop.
+
+    Progress and throughput are periodically reported while reading.
 
     Configuration parameters are:
      - [REQ] file=<string>
-             File path
+             File path (or glob pattern; e.g. /var/log/mail.log*)
+     - [opt] order=rotation|name|mtime (default: rotation)
+             Files (glob pattern) reading order
      - [opt] delay=<float> (default: 0.0)
              Delay between lines feed, in seconds
+     - [opt] maxline=<int> (default: 65536)
+             Maximum line length, in bytes (longer lines are truncated)
+     - [opt] progress=<float> (default: 60.0)
+             Progress report interval, in seconds (0 to disable)
 
     Example (watcher configuration):
      - producer = Read?file=/var/log/syslog&delay=1
+     - producer = Read?file=/var/log/mail.log*
     """
 
     #------------------------------------------------------------------------------
@@ -70,6 +126,14 @@ class Read(Producer):
             raise RuntimeError('Missing \'file\' configuration parameter')
         self.__sFile = dConfiguration['file'][0]
 
+        # ... order
+        self.__sOrder = 'rotation'
+        if 'order' in dConfiguration_keys:
+            self.__sOrder = dConfiguration['order'][0]
+            if self.__sOrder not in ('rotation', 'name', 'mtime'):
+                _oWatcher.log('ERROR[Producer:Read(%s)]: Invalid \'order\' configuration parameter\n' % _oWatcher.name())
+                raise ValueError('Invalid \'order\' configuration parameter')
+
         # ... delay
         self.__fDelay = None
         if 'delay' in dConfiguration_keys:
@@ -81,16 +145,184 @@ class Read(Producer):
                 _oWatcher.log('ERROR[Producer:Read(%s)]: Invalid \'delay\' configuration parameter\n' % _oWatcher.name())
                 raise
 
+        # ... maximum line length
+        self.__iMaxLine = 65536
+        if 'maxline' in dConfiguration_keys:
+            try:
+                self.__iMaxLine = int(dConfiguration['maxline'][0])
+                if self.__iMaxLine<=0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Read(%s)]: Invalid \'maxline\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... progress
+        self.__fProgress = 60.0
+        if 'progress' in dConfiguration_keys:
+            try:
+                self.__fProgress = float(dConfiguration['progress'][0])
+                if self.__fProgress<0.0:
+                    raise ValueError('Value must me greater or equal to zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Read(%s)]: Invalid \'progress\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # Statistics
+        self.__iFiles = 0
+        self.__iFilesTotal = 0
+        self.__iBytes = 0
+        self.__iBytesTotal = 0
+        self.__iLines = 0
+        self.__iTruncated = 0
+        self.__fStart = None
+
 
     #------------------------------------------------------------------------------
     # METHODS
     #------------------------------------------------------------------------------
 
-    def run(self):
-        # Feed the file content line-by-line
-        with open(self.__sFile) as oFile:
-            for sLine in oFile:
-                if self._bStop: break
-                self._feed(sLine.strip())
-                if self.__fDelay is not None:
-                    time.sleep(self.__fDelay)
+    def __files(self):
+        """
+        Return the (ordered) list of files to read.
+        """
+
+        if glob.escape(self.__sFile)==self.__sFile:
+            return [self.__sFile]
+        lsFiles = [sFile for sFile in glob.glob(self.__sFile) if os.path.isfile(sFile)]
+        if self.__sOrder=='mtime':
+            lsFiles.sort(key=lambda sFile: (os.path.getmtime(sFile), sFile))
+        elif self.__sOrder=='name':
+            lsFiles.sort()
+        else:
+            def fnRotation(_sFile):
+                oMatch = READ_ROTATION_INDEX.search(_sFile)
+                if oMatch is None:
+                    return (_sFile, 0)
+                return (_sFile[:oMatch.start()], -int(oMatch.group(1)))
+            lsFiles.sort(key=fnRotation)
+        return lsFiles
+
+
+    def __open(self, _oFile):
+        """
+        Return a (binary, streaming) reader for the given (raw) file, according
+        to its compression format.
+
+        Raises IOError if the compression format is not supported.
+
+        @param  file  _oFile  Raw file
+        """
+
+        bMagic = _oFile.read(6)
+        _oFile.seek(0)
+        if bMagic.startswith(READ_MAGIC_GZIP):
+            return gzip.GzipFile(fileobj=_oFile, mode='rb')
+        if bMagic.startswith(READ_MAGIC_BZIP2):
+            return bz2.BZ2File(_oFile, mode='rb')
+        if bMagic.startswith(READ_MAGIC_XZ):
+            return lzma.LZMAFile(_oFile, mode='rb')
+        if bMagic.startswith(READ_MAGIC_ZSTD):
+            if zstandard is None:
+                raise IOError('zstd compression is not supported (missing \'zstandard\' module)')
+            return zstandard.ZstdDecompressor().stream_reader(_oFile, read_across_frames=True)
+        return _oFile
+
+
+    def __report(self, _sFile, _fNow):
+        """
+        Report the reading progress and throughput.
+
+        @param  string  _sFile  File being read (None when done)
+        @param  float   _fNow   Current (monotonic) time
+        """
+
+        fElapsed = max(_fNow-self.__fStart, 0.001)
+        self._oWatcher.log('INFO[Producer:Read(%s)]: %s (files:%d/%d, input:%.1f/%.1fMiB, lines:%d, throughput:%.0flines/s, %.1fMiB/s)\n' % (
+            self._oWatcher.name(),
+            'Reading %s' % _sFile if _sFile is not None else 'Done',
+            self.__iFiles, self.__iFilesTotal,
+            self.__iBytes/1048576.0, self.__iBytesTotal/1048576.0,
+            self.__iLines,
+            self.__iLines/fElapsed, self.__iBytes/1048576.0/fElapsed,
+        ))
+
+
+    def __read(self, _sFile):
+        """
+        Read the given file and feed its content line-by-line.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  string  _sFile  File path
+        """
+
+        fNow = time.monotonic()
+        fReport = fNow+self.__fProgress
+        iBytes = self.__iBytes
+        baBuffer = bytearray(READ_CHUNK_SIZE)
+        oLineBuffer = LineBuffer(self.__iMaxLine)
+        with open(_sFile, 'rb') as oFileRaw:
+            with self.__open(oFileRaw) as oFile:
+                while True:
+                    if self._bStop: break
+                    iRead = oFile.readinto(baBuffer)
+                    if not iRead: break
+                    lsLines = oLineBuffer.feed(baBuffer, iRead)
+                    for sLine in lsLines:
+                        if self._bStop: break
+                        self._feed(sLine, _sFile)
+                        if self.__fDelay is not None:
+                            yield ([], self.__fDelay)
+                    self.__iLines += len(lsLines)
+                    self.__iBytes = iBytes+oFileRaw.tell()
+                    yield ([], 0)
+
+                    # Progress
+                    if self.__fProgress:
+                        fNow = time.monotonic()
+                        if fNow>=fReport:
+                            self.__report(_sFile, fNow)
+                            fReport = fNow+self.__fProgress
+                if not self._bStop:
+                    for sLine in oLineBuffer.flush():
+                        self._feed(sLine, _sFile)
+                        self.__iLines += 1
+        self.__iBytes = iBytes+os.path.getsize(_sFile)
+        self.__iTruncated += oLineBuffer.truncated()
+
+
+    def statistics(self):
+        # Statistics
+        return {
+            'files': self.__iFiles,
+            'bytes': self.__iBytes,
+            'lines': self.__iLines,
+            'truncated': self.__iTruncated,
+        }
+
+
+    def routine(self):
+        # Files
+        lsFiles = self.__files()
+        if not lsFiles:
+            self._oWatcher.log('WARNING[Producer:Read(%s)]: No file matching \'%s\'\n' % (self._oWatcher.name(), self.__sFile))
+            return
+        self.__iFilesTotal = len(lsFiles)
+        self.__iBytesTotal = 0
+        for sFile in lsFiles:
+            try:
+                self.__iBytesTotal += os.path.getsize(sFile)
+            except OSError:
+                pass
+
+        # Feed the files content line-by-line
+        self.__fStart = time.monotonic()
+        for sFile in lsFiles:
+            if self._bStop: break
+            self.__iFiles += 1
+            try:
+                yield from self.__read(sFile)
+            except READ_ERRORS as e:
+                self._oWatcher.log('ERROR[Producer:Read(%s)]: Failed to read file (%s)\n%s\n' % (self._oWatcher.name(), sFile, str(e)))
+        if self.__fProgress and not self._bStop:
+            self.__report(None, time.monotonic())
@@ -0,0 +1,168 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Maximum amount of digits of an octet-counting frame length
+STREAMFRAMER_LENGTH_DIGITS = 10
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class StreamFramer:
+    """
+    Syslog Stream Message Splitter (RFC 6587).
+
+    This class/object splits (chunks of) stream data into (decoded) messages,
+    according to either octet-counting ('<length> <message>') or non-transparent
+    (newline-terminated) framing, as detected for each message; incomplete
+    trailing messages are carried over to the next chunk.
+
+    Messages exceeding the configured maximum length are truncated (and
+    counted); the remainder of such messages is discarded, thus keeping memory
+    usage bounded whatever the data.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _iMaxLength=65536, _sEncoding='utf-8'):
+        """
+        Constructor.
+
+        @param  int     _iMaxLength  Maximum message length, in bytes
+        @param  string  _sEncoding   Data encoding
+        """
+
+        # Fields
+        self.__iMaxLength = _iMaxLength
+        self.__sEncoding = _sEncoding
+        self.__baPending = bytearray()
+        self.__iDiscard = 0
+        self.__bDiscard = False
+        self.__iTruncated = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def truncated(self):
+        """
+        Return the count of truncated messages.
+        """
+
+        return self.__iTruncated
+
+
+    def __decode(self, _baData):
+        """
+        Return the given (message) data as (stripped) string.
+
+        @param  bytearray  _baData  Message data
+        """
+
+        return str(_baData, self.__sEncoding, 'replace').strip()
+
+
+    def feed(self, _baData, _iLength=None):
+        """
+        Split the given data into messages; returns the list of complete messages.
+
+        @param  bytearray  _baData   Data (buffer)
+        @param  int        _iLength  Data length (None for the whole buffer)
+        """
+
+        self.__baPending += memoryview(_baData)[:len(_baData) if _iLength is None else _iLength]
+        baData = self.__baPending
+        iEnd = len(baData)
+        i = 0
+        lsMessages = []
+        while i<iEnd:
+            # Discard the remainder of a truncated message
+            if self.__iDiscard:
+                j = min(iEnd-i, self.__iDiscard)
+                self.__iDiscard -= j
+                i += j
+                continue
+            if self.__bDiscard:
+                j = baData.find(b'\n', i)
+                if j<0:
+                    i = iEnd
+                    break
+                self.__bDiscard = False
+                i = j+1
+                continue
+
+            # Octet-counting framing
+            if 0x31<=baData[i]<=0x39:
+                j = baData.find(b' ', i, i+STREAMFRAMER_LENGTH_DIGITS+1)
+                if j<0 and iEnd-i<=STREAMFRAMER_LENGTH_DIGITS:
+                    break
+                if j>=0 and baData[i:j].isdigit():
+                    iLength = int(baData[i:j])
+                    if iLength>self.__iMaxLength:
+                        if iEnd-j-1<self.__iMaxLength:
+                            break
+                        lsMessages.append(self.__decode(baData[j+1:j+1+self.__iMaxLength]))
+                        self.__iTruncated += 1
+                        self.__iDiscard = iLength-self.__iMaxLength
+                        i = j+1+self.__iMaxLength
+                        continue
+                    if iEnd-j-1<iLength:
+                        break
+                    lsMessages.append(self.__decode(baData[j+1:j+1+iLength]))
+                    i = j+1+iLength
+                    continue
+
+            # Non-transparent (newline) framing
+            j = baData.find(b'\n', i)
+            if j<0:
+                if iEnd-i>self.__iMaxLength:
+                    lsMessages.append(self.__decode(baData[i:i+self.__iMaxLength]))
+                    self.__iTruncated += 1
+                    self.__bDiscard = True
+                    i = iEnd
+                break
+            if j-i>self.__iMaxLength:
+                lsMessages.append(self.__decode(baData[i:i+self.__iMaxLength]))
+                self.__iTruncated += 1
+            else:
+                lsMessages.append(self.__decode(baData[i:j]))
+            i = j+1
+        del baData[:i]
+        return [sMessage for sMessage in lsMessages if sMessage]
+
+
+    def flush(self):
+        """
+        Return the incomplete trailing message (if any) as a list of messages and
+        clear it.
+        """
+
+        self.__iDiscard = 0
+        self.__bDiscard = False
+        sMessage = self.__decode(self.__baPending)
+        self.__baPending.clear()
+        return [sMessage] if sMessage else []
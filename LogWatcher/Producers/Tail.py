@@ -22,12 +22,16 @@
 #------------------------------------------------------------------------------
 
 # Standard
+import glob
 import os
-import time
+from queue import Empty
 import urllib.parse
 
 # LogWatcher
 from LogWatcher.Producers import Producer
+from .TailCheckpoint import TailCheckpoint
+from .TailGlobReader import TailGlobReader
+from .TailReader import TailReader
 
 
 #------------------------------------------------------------------------------
@@ -42,16 +46,56 @@ class Tail(Producer):
     watcher as they appear.
 
     It will detect when a file is being (log)rotated and (wait for and) open
-    the new file to continue its business.
+    the new file to continue its business, after reading the lines written to
+    the old file until then. Files truncated in place (e.g. logrotate's
+    'copytruncate') are detected and read again from their beginning.
+
+    On Linux, it relies on file events notifications (inotify) to read new data
+    as soon as it is available and otherwise blocks without using any CPU. It
+    falls back to polling the file at regular interval if inotify is not
+    available (or polling is required).
+
+    If a checkpoint file is configured, the offset up to which lines have been
+    read - and processed by the parent watcher - is periodically saved to it,
+    allowing to resume where it left off after restart (or respawn); lines
+    written to the file - or to its rotated predecessor - in the meantime are
+    thus not lost, while lines read but not yet processed (e.g. still queued)
+    when the daemon stopped are read again (at-least-once delivery).
+
+    Identical producers (watching the same file with the same parameters and
+    without checkpoint) share a single file reader, which reads and decodes each
+    line only once before feeding it to each of their parent watchers.
+
+    If the file path is a glob pattern, all matching files are followed, using
+    a single scanner (polling or directory events notifications) and a bounded
+    amount of open files (idle files being closed and re-opened on demand);
+    each line then carries the path of the file it originates from (source).
+
+    Files are followed by a (non-blocking) routine, which may thus be run by the
+    daemon event loop.
 
     Configuration parameters are:
      - [REQ] file=<string>
-             File path
+             File path (or glob pattern; e.g. /var/log/apache2/*access.log)
      - [opt] interval=<float> (default: 1.0)
-             File check interval, in seconds
+             File check interval, in seconds (when polling)
+     - [opt] poll (flag)
+             Poll the file at the configured interval, rather than waiting for
+             file events notifications (inotify; Linux only)
+     - [opt] maxline=<int> (default: 65536)
+             Maximum line length, in bytes (longer lines are truncated)
+     - [opt] checkpoint=<string>
+             Read-offset checkpoint file path; when specified, the producer
+             resumes where it left off (rather than skipping existing content)
+     - [opt] checkpoint_interval=<float> (default: 5.0)
+             Checkpoint write interval, in seconds
+     - [opt] maxfiles=<int> (default: 64)
+             Maximum count of open files (glob pattern)
 
     Example (watcher configuration):
      - producer = Tail?file=/var/log/syslog
+     - producer = Tail?file=/var/log/syslog&checkpoint=/var/lib/logwatcherd/syslog.checkpoint
+     - producer = Tail?file=/var/log/apache2/*access.log
     """
 
     #------------------------------------------------------------------------------
@@ -71,6 +115,7 @@ class Tail(Producer):
             _oWatcher.log('ERROR[Producer:Tail(%s)]: Missing \'file\' configuration parameter\n' % _oWatcher.name())
             raise RuntimeError('Missing \'file\' configuration parameter')
         self.__sFile = dConfiguration['file'][0]
+        self.__bGlob = glob.escape(self.__sFile)!=self.__sFile
 
         # ... interval
         self.__fInterval = 1.0
@@ -83,55 +128,123 @@ class Tail(Producer):
                 _oWatcher.log('ERROR[Producer:Tail(%s)]: Invalid \'interval\' configuration parameter\n' % _oWatcher.name())
                 raise
 
+        # ... poll
+        self.__bPoll = False
+        if 'poll' in dConfiguration_keys:
+            self.__bPoll = True
+
+        # ... maximum line length
+        self.__iMaxLine = 65536
+        if 'maxline' in dConfiguration_keys:
+            try:
+                self.__iMaxLine = int(dConfiguration['maxline'][0])
+                if self.__iMaxLine<=0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Tail(%s)]: Invalid \'maxline\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... checkpoint
+        self.__sCheckpoint = None
+        if 'checkpoint' in dConfiguration_keys:
+            self.__sCheckpoint = dConfiguration['checkpoint'][0]
+
+        # ... checkpoint interval
+        self.__fCheckpointInterval = 5.0
+        if 'checkpoint_interval' in dConfiguration_keys:
+            try:
+                self.__fCheckpointInterval = float(dConfiguration['checkpoint_interval'][0])
+                if self.__fCheckpointInterval<0.0:
+                    raise ValueError('Value must me greater or equal to zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Tail(%s)]: Invalid \'checkpoint_interval\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # ... maximum open files
+        self.__iMaxFiles = 64
+        if 'maxfiles' in dConfiguration_keys:
+            try:
+                self.__iMaxFiles = int(dConfiguration['maxfiles'][0])
+                if self.__iMaxFiles<=0:
+                    raise ValueError('Value must me greater than zero')
+            except Exception:
+                _oWatcher.log('ERROR[Producer:Tail(%s)]: Invalid \'maxfiles\' configuration parameter\n' % _oWatcher.name())
+                raise
+
+        # File reader
+        if self.__bGlob:
+            if self.__sCheckpoint is not None:
+                _oWatcher.log('ERROR[Producer:Tail(%s)]: \'checkpoint\' configuration parameter is not supported with glob patterns\n' % _oWatcher.name())
+                raise RuntimeError('\'checkpoint\' configuration parameter is not supported with glob patterns')
+            self.__oReader = TailGlobReader(_oWatcher, self.__sFile, self.__fInterval, not self.__bPoll, self.__iMaxLine, self.__iMaxFiles)
+        else:
+            oCheckpoint = None
+            if self.__sCheckpoint is not None:
+                oCheckpoint = TailCheckpoint(self.__sCheckpoint, self.__fCheckpointInterval, self)
+            self.__oReader = TailReader(_oWatcher, self.__sFile, self.__fInterval, not self.__bPoll, self.__iMaxLine, oCheckpoint)
+
 
     #------------------------------------------------------------------------------
     # METHODS
     #------------------------------------------------------------------------------
 
+    def reader(self):
+        """
+        Return the file reader used by this producer.
+        """
+
+        return self.__oReader
+
+
+    def shareable(self):
+        # Identical file and reading parameters
+        if self.__bGlob:
+            return 'Tail:%s:%s:%s:%s:%s' % (os.path.abspath(self.__sFile), self.__fInterval, self.__bPoll, self.__iMaxLine, self.__iMaxFiles)
+        # NB: the checkpoint tracks the data processed by this producer's watcher
+        if self.__sCheckpoint is not None:
+            return None
+        return 'Tail:%s:%s:%s:%s' % (os.path.realpath(self.__sFile), self.__fInterval, self.__bPoll, self.__iMaxLine)
+
+
+    def share(self, _oProducer):
+        # Use the other producer's file reader
+        self.__oReader = _oProducer.reader()
+        self.__oReader.attach(self._oWatcher)
+
+
+    def statistics(self):
+        # Statistics
+        return self.__oReader.statistics()
+
+
+    def routine(self):
+        # Feed the file content line-by-line (event loop)
+        if not self.__oReader.shared():
+            return self.__oReader.routine(self._feed, self.stopped)
+        return self.__oReader.routineShared(self._feed, self.stopped, self.programs())
+
+
     def run(self):
         # Feed the file content line-by-line
-        bStarting = True
-        while True:
-            if self._bStop: break
-
-            # Open file
-            try:
-                oFile = open(self.__sFile)
-                oStat = os.stat(oFile.name)
-                sFileID = '%s:%s' % (oStat.st_dev, oStat.st_ino) if os.name=='posix' else '%s' % oStat.st_ctime
-            except (IOError, OSError):
-                self._oWatcher.log('WARNING[Producer:Tail(%s)]: Failed to open file (%s); trying again...\n' % (self._oWatcher.name(), self.__sFile))
-                time.sleep(5.0)
-                continue
-
-            with oFile:
-                # Skip existing content
-                if bStarting:
-                    oFile.seek(0, os.SEEK_END)
-                    bStarting = False
-
-                while True:
-                    # Get new lines
-                    if self._bStop: break
-                    iWhere = oFile.tell()
-                    lsLines = oFile.readlines()
-                    if lsLines:
-                        for sLine in lsLines:
-                            self._feed(sLine.strip())
-                    else:
-                        oFile.seek(iWhere)
-
-                    # Wait for new lines
-                    time.sleep(self.__fInterval)
-
-                    # Check file hasn't been replaced (e.g. log rotation)
-                    try:
-                        oStat = os.stat(oFile.name)
-                        sFileID_check = '%s:%s' % (oStat.st_dev, oStat.st_ino) if os.name=='posix' else '%s' % oStat.st_ctime
-                        if sFileID_check != sFileID:
-                            self._oWatcher.log('INFO[Producer:Tail(%s)]: File has been rotated; opening new one\n' % self._oWatcher.name())
-                            break
-                    except OSError:
-                        self._oWatcher.log('INFO[Producer:Tail(%s)]: File has vanished; waiting for new one...\n' % self._oWatcher.name())
-                        time.sleep(5.0)
-                        break
+        if not self.__oReader.shared():
+            self.__oReader.follow(self._feed, self.stopped)
+            return
+
+        # ... from the shared reader queue
+        oQueue = self.__oReader.subscribe(self)
+        try:
+            while True:
+                if self._bStop: break
+                try:
+                    (sData, sSource) = oQueue.get(timeout=1.0)
+                except Empty:
+                    continue
+                self._feed(sData, sSource, True)
+        finally:
+            self.__oReader.unsubscribe(self)
+
+
+    def stop(self):
+        # Stop
+        Producer.stop(self)
+        self.__oReader.wake()
@@ -0,0 +1,180 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from collections import deque
+import hashlib
+import os
+import time
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Amount of bytes (preceding the offset) used to identify the file content
+TAILCHECKPOINT_HASH_BYTES = 64
+
+# Maximum count of positions awaiting the processing of the data read until them
+TAILCHECKPOINT_PENDING = 4096
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TailCheckpoint:
+    """
+    File "Tail" Read-Offset Checkpoint.
+
+    This class/object persists the position up to which a followed file has
+    been read - and the data read until then processed - as a single line in
+    the checkpoint file:
+
+      <device> <inode> <offset> <hash>
+
+    where <hash> is the SHA-1 hash of the (up to 64) bytes preceding the offset,
+    used to make sure the file content did not change in the meantime.
+
+    In order not to add any measurable overhead, the position (and its hash) is
+    updated in memory as data are read and only written to the checkpoint file
+    (atomically) at the configured interval (and when forced to).
+
+    Positions are only written once the data read until them have been processed
+    by the producer's parent watcher (see Producer.acknowledged()), such as data
+    still queued for processing (e.g. by a co-worker thread or worker processes)
+    are read again - rather than lost - after restart (at-least-once delivery).
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _sFile, _fInterval, _oProducer=None):
+        """
+        Constructor.
+
+        @param  string    _sFile      Checkpoint file path
+        @param  float     _fInterval  Checkpoint write interval, in seconds
+        @param  Producer  _oProducer  Producer feeding the read data (None to consider data processed once read)
+        """
+
+        # Fields
+        self.__sFile = _sFile
+        self.__fInterval = _fInterval
+        self.__oProducer = _oProducer
+        self.__fSaved = time.monotonic()
+        self.__dqPositions = deque()
+        self.__tPosition = None
+        self.__tPositionSaved = None
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def hash(_iFD, _iOffset):
+        """
+        Return the hash of the (up to 64) bytes preceding the given offset.
+
+        @param  int  _iFD      File descriptor
+        @param  int  _iOffset  File offset
+        """
+
+        iStart = max(0, _iOffset-TAILCHECKPOINT_HASH_BYTES)
+        return hashlib.sha1(os.pread(_iFD, _iOffset-iStart, iStart)).hexdigest()
+
+
+    def load(self):
+        """
+        Load and return the saved (device, inode, offset, hash) position, or None
+        if no (valid) checkpoint is available.
+        """
+
+        try:
+            with open(self.__sFile, 'r') as oFile:
+                lsFields = oFile.readline().split()
+            tPosition = (int(lsFields[0]), int(lsFields[1]), int(lsFields[2]), lsFields[3])
+        except (IOError, OSError, IndexError, ValueError):
+            return None
+        self.__tPositionSaved = tPosition
+        return tPosition
+
+
+    def update(self, _iDevice, _iInode, _iOffset, _iFD):
+        """
+        Update the current position; the checkpoint file is written if the
+        configured interval has elapsed since it was last written.
+
+        NB: the file descriptor is only used to hash the file content (and may
+            be closed once this method returns).
+
+        @param  int  _iDevice  File device
+        @param  int  _iInode   File inode
+        @param  int  _iOffset  File offset
+        @param  int  _iFD      File descriptor
+        """
+
+        # Position
+        # NB: tagged with the count of data fed (to be processed) until then
+        iFed = self.__oProducer.fed() if self.__oProducer is not None else 0
+        dqPositions = self.__dqPositions
+        if dqPositions and dqPositions[-1][0]==iFed:
+            if dqPositions[-1][1:4]==(_iDevice, _iInode, _iOffset):
+                return
+            dqPositions.pop()
+        dqPositions.append((iFed, _iDevice, _iInode, _iOffset, TailCheckpoint.hash(_iFD, _iOffset)))
+        if len(dqPositions)>TAILCHECKPOINT_PENDING:
+            dqPositions.popleft()  # NB: the checkpoint lags further behind (data are read again rather than lost)
+
+        # Save
+        if time.monotonic()-self.__fSaved >= self.__fInterval:
+            self.save()
+
+
+    def save(self):
+        """
+        Write the last position whose data have been processed to the checkpoint
+        file (if changed).
+
+        Raises OSError if the checkpoint file can not be written.
+        """
+
+        self.__fSaved = time.monotonic()
+
+        # Processed position
+        iAcknowledged = self.__oProducer.acknowledged() if self.__oProducer is not None else 0
+        dqPositions = self.__dqPositions
+        while dqPositions and dqPositions[0][0]<=iAcknowledged:
+            self.__tPosition = dqPositions.popleft()[1:]
+        if self.__tPosition is None:
+            return
+        (iDevice, iInode, iOffset, sHash) = self.__tPosition
+        if self.__tPositionSaved is not None and self.__tPositionSaved[0:3]==(iDevice, iInode, iOffset):
+            return
+        sFileTemp = '%s.tmp' % self.__sFile
+        with open(sFileTemp, 'w') as oFile:
+            oFile.write('%d %d %d %s\n' % (iDevice, iInode, iOffset, sHash))
+        os.replace(sFileTemp, self.__sFile)
+        self.__tPositionSaved = (iDevice, iInode, iOffset, sHash)
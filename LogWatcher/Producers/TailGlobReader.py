@@ -0,0 +1,469 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from collections import OrderedDict
+import fnmatch
+import glob
+import os
+import stat
+
+# LogWatcher
+from .LineBuffer import LineBuffer
+from .TailReader import TailReader, TAILREADER_CHUNK_SIZE
+from .Inotify import \
+    Inotify, \
+    IN_CREATE, \
+    IN_DELETE, \
+    IN_MODIFY, \
+    IN_MOVED_FROM, \
+    IN_MOVED_TO, \
+    IN_Q_OVERFLOW
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TailGlobFile:
+    """
+    File "Tail" (Glob) Reader State.
+
+    This class/object holds the state of each file followed by a glob reader.
+    """
+
+    __slots__ = ('path', 'device', 'inode', 'offset', 'file', 'lines')
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _sPath, _iDevice, _iInode, _iOffset, _iMaxLength):
+        """
+        Constructor.
+
+        @param  string  _sPath       File path
+        @param  int     _iDevice     File device
+        @param  int     _iInode      File inode
+        @param  int     _iOffset     Read offset
+        @param  int     _iMaxLength  Maximum line length, in bytes
+        """
+
+        # Fields
+        self.path = _sPath
+        self.device = _iDevice
+        self.inode = _iInode
+        self.offset = _iOffset
+        self.file = None
+        self.lines = LineBuffer(_iMaxLength)
+
+
+class TailGlobReader(TailReader):
+    """
+    File "Tail" (Glob) Reader.
+
+    This class/object follows all the files matching a glob pattern (including
+    files created later on) on behalf of one or many "Tail" producers.
+
+    A single scanner lists (and stats) the files of the matching directories in
+    batches - either at the configured interval (polling) or upon directory
+    events notifications (inotify) - and only reads those which have grown.
+
+    Files are identified by their device and inode, such as a file renamed (e.g.
+    rotated) to another matching path is followed on at its current offset
+    rather than read again from start.
+
+    In order to bound the amount of open file descriptors, an LRU budget closes
+    idle files, which are transparently re-opened at their saved offset (or
+    found again along their path if rotated in the meantime).
+
+    Lines are fed along their source (file path).
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sPattern, _fInterval, _bInotify, _iMaxLength, _iMaxFiles, _iQueueSize=1000):
+        """
+        Constructor.
+
+        @param  Watcher  _oWatcher    First (owning) watcher
+        @param  string   _sPattern    Files path (glob) pattern
+        @param  float    _fInterval   Files scan interval, in seconds (polling)
+        @param  bool     _bInotify    Wait for directory events notifications (instead of polling)
+        @param  int      _iMaxLength  Maximum line length, in bytes
+        @param  int      _iMaxFiles   Maximum count of open files
+        @param  int      _iQueueSize  Subscriber queue size (shared mode), in lines
+        """
+
+        # Parent constructor
+        TailReader.__init__(self, _oWatcher, _sPattern, _fInterval, _bInotify, _iMaxLength, None, _iQueueSize)
+
+        # Fields
+        self.__sDirectoryPattern = os.path.dirname(os.path.abspath(_sPattern))
+        self.__bDirectoryPattern = glob.escape(self.__sDirectoryPattern)!=self.__sDirectoryPattern
+        self.__sNamePattern = os.path.basename(_sPattern)
+        self.__iMaxLength = _iMaxLength
+        self.__iMaxFiles = _iMaxFiles
+        self.__baBuffer = bytearray(TAILREADER_CHUNK_SIZE)
+        self.__dFiles = {}
+        self.__dPaths = {}
+        self.__odFilesOpen = OrderedDict()
+        self.__dDirectories = {}
+        self.__iTruncated = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def statistics(self):
+        # Statistics
+        loFiles = tuple(self.__dFiles.values())
+        return {
+            'truncated': self.__iTruncated+sum([oFile.lines.truncated() for oFile in loFiles]),
+            'files': len(loFiles),
+            'files_open': len(self.__odFilesOpen),
+        }
+
+
+    def __findRotated(self, _oFile):
+        """
+        Return the path of the (rotated) file matching the given file state device
+        and inode, or None if no such file is found along its (former) path.
+
+        @param  TailGlobFile  _oFile  File state
+        """
+
+        sDirectory = os.path.dirname(_oFile.path)
+        sBasename = os.path.basename(_oFile.path)
+        try:
+            with os.scandir(sDirectory) as oEntries:
+                for oEntry in oEntries:
+                    if not oEntry.name.startswith(sBasename) or oEntry.name==sBasename:
+                        continue
+                    try:
+                        oStat = oEntry.stat()
+                    except OSError:
+                        continue
+                    if (oStat.st_dev, oStat.st_ino)==(_oFile.device, _oFile.inode):
+                        return oEntry.path
+        except OSError:
+            pass
+        return None
+
+
+    def __openPath(self, _sPath, _oFile):
+        """
+        Return the file object corresponding to the given path, opened at the
+        given file state offset; returns None if the file can not be opened (or
+        does not match the file state device and inode).
+
+        @param  string        _sPath  File path
+        @param  TailGlobFile  _oFile  File state
+        """
+
+        try:
+            oHandle = open(_sPath, 'rb', buffering=0)
+        except (IOError, OSError):
+            return None
+        try:
+            oStat = os.fstat(oHandle.fileno())
+            if (oStat.st_dev, oStat.st_ino)!=(_oFile.device, _oFile.inode):
+                oHandle.close()
+                return None
+            oHandle.seek(_oFile.offset)
+        except OSError:
+            oHandle.close()
+            return None
+        return oHandle
+
+
+    def __open(self, _oFile):
+        """
+        Return the (open) file object corresponding to the given file state,
+        (re-)opening it at its saved offset - along its rotated path if it was
+        rotated while closed - and closing the least recently used file if the
+        open files budget is exceeded; returns None if the file can not be opened
+        (or has vanished).
+
+        @param  TailGlobFile  _oFile  File state
+        """
+
+        # Already open
+        tKey = (_oFile.device, _oFile.inode)
+        if _oFile.file is not None:
+            self.__odFilesOpen.move_to_end(tKey)
+            return _oFile.file
+
+        # Open
+        oHandle = self.__openPath(_oFile.path, _oFile)
+        if oHandle is None:
+            # ... rotated file (while closed)
+            sPath = self.__findRotated(_oFile)
+            if sPath is not None:
+                oHandle = self.__openPath(sPath, _oFile)
+            if oHandle is None:
+                return None
+            self._oWatcher.log('INFO[Producer:Tail(%s)]: File has been rotated; catching up on rotated file (%s)\n' % (self.name(), sPath))
+            _oFile.path = sPath
+        _oFile.file = oHandle
+        self.__odFilesOpen[tKey] = _oFile
+
+        # ... budget
+        while len(self.__odFilesOpen)>self.__iMaxFiles:
+            (_, oFileIdle) = self.__odFilesOpen.popitem(last=False)
+            oFileIdle.file.close()
+            oFileIdle.file = None
+        return oHandle
+
+
+    def __read(self, _oFile, _fnFeed, _fnStop):
+        """
+        Read all available data of the given file - in chunks - and feed the
+        corresponding lines.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  TailGlobFile  _oFile   File state
+        @param  function      _fnFeed  Data (line, source) feeding function
+        @param  function      _fnStop  Stop checking function
+        """
+
+        oHandle = self.__open(_oFile)
+        if oHandle is None:
+            return
+
+        # ... truncated file
+        # NB: in-place truncation (e.g. copytruncate) only triggers a modification event
+        try:
+            iSize = os.fstat(oHandle.fileno()).st_size
+        except OSError:
+            iSize = _oFile.offset
+        if iSize<_oFile.offset:
+            self._oWatcher.log('INFO[Producer:Tail(%s)]: File has been truncated; reading from start (%s)\n' % (self.name(), _oFile.path))
+            _oFile.offset = 0
+            _oFile.lines.flush()
+            oHandle.seek(0)
+
+        iTruncated = _oFile.lines.truncated()
+        while True:
+            if _fnStop(): break
+            iRead = oHandle.readinto(self.__baBuffer)
+            if not iRead: break
+            _oFile.offset += iRead
+            for sLine in _oFile.lines.feed(self.__baBuffer, iRead):
+                _fnFeed(sLine, _oFile.path)
+            yield ([], 0)
+        if _oFile.lines.truncated()>iTruncated:
+            self._oWatcher.log('WARNING[Producer:Tail(%s)]: Lines exceeding the maximum length have been truncated (%s)\n' % (self.name(), _oFile.path))
+
+
+    def __close(self, _oFile, _fnFeed, _fnStop):
+        """
+        Drain (read until its end, re-opening it along its rotated path if need be)
+        and close the given file, and forget its state.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  TailGlobFile  _oFile   File state
+        @param  function      _fnFeed  Data (line, source) feeding function
+        @param  function      _fnStop  Stop checking function
+        """
+
+        tKey = (_oFile.device, _oFile.inode)
+        yield from self.__read(_oFile, _fnFeed, _fnStop)
+        if _oFile.file is not None:
+            _oFile.file.close()
+            _oFile.file = None
+            self.__odFilesOpen.pop(tKey, None)
+        for sLine in _oFile.lines.flush():
+            _fnFeed(sLine, _oFile.path)
+        self.__iTruncated += _oFile.lines.truncated()
+        self.__dFiles.pop(tKey, None)
+
+
+    def __scan(self, _oInotify, _bStarting, _fnFeed, _fnStop):
+        """
+        Scan the directories matching the glob pattern and return the paths of
+        the files which need reading.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  Inotify   _oInotify   Events notifications (None for polling)
+        @param  bool      _bStarting  Initial scan (skip existing content)
+        @param  function  _fnFeed     Data (line, source) feeding function
+        @param  function  _fnStop     Stop checking function
+        """
+
+        lsDirectories = glob.glob(self.__sDirectoryPattern) if self.__bDirectoryPattern else [self.__sDirectoryPattern]
+        dPaths = {}
+        setKeysSeen = set()
+        setPathsDirty = set()
+        for sDirectory in lsDirectories:
+            # Watch directory
+            if _oInotify is not None and sDirectory not in self.__dDirectories.values():
+                try:
+                    iWD = _oInotify.add(sDirectory, IN_MODIFY|IN_CREATE|IN_DELETE|IN_MOVED_FROM|IN_MOVED_TO)
+                    self.__dDirectories[iWD] = sDirectory
+                except OSError:
+                    pass
+
+            # List (and stat) matching files
+            try:
+                oEntries = os.scandir(sDirectory)
+            except OSError:
+                continue
+            with oEntries:
+                for oEntry in oEntries:
+                    if not fnmatch.fnmatchcase(oEntry.name, self.__sNamePattern):
+                        continue
+                    try:
+                        oStat = oEntry.stat()
+                    except OSError:
+                        continue
+                    if not stat.S_ISREG(oStat.st_mode):
+                        continue
+                    sPath = oEntry.path
+                    tKey = (oStat.st_dev, oStat.st_ino)
+                    if tKey in setKeysSeen:
+                        continue  # NB: hard link
+                    setKeysSeen.add(tKey)
+                    oFile = self.__dFiles.get(tKey)
+
+                    # ... renamed (rotated) file
+                    # NB: the file is followed on at its current offset
+                    if oFile is not None and oFile.path!=sPath:
+                        self._oWatcher.log('INFO[Producer:Tail(%s)]: File has been renamed; following it on (%s -> %s)\n' % (self.name(), oFile.path, sPath))
+                        oFile.path = sPath
+
+                    # ... new file
+                    if oFile is None:
+                        oFile = TailGlobFile(sPath, oStat.st_dev, oStat.st_ino, oStat.st_size if _bStarting else 0, self.__iMaxLength)
+                        self.__dFiles[tKey] = oFile
+                        if not _bStarting:
+                            self._oWatcher.log('INFO[Producer:Tail(%s)]: Following new file (%s)\n' % (self.name(), sPath))
+                    dPaths[sPath] = oFile
+
+                    # ... truncated file
+                    if oStat.st_size<oFile.offset:
+                        self._oWatcher.log('INFO[Producer:Tail(%s)]: File has been truncated; reading from start (%s)\n' % (self.name(), sPath))
+                        oFile.offset = 0
+                        oFile.lines.flush()
+                        if oFile.file is not None:
+                            oFile.file.seek(0)
+
+                    # ... new data
+                    if oStat.st_size>oFile.offset:
+                        setPathsDirty.add(sPath)
+
+        # Vanished files
+        # NB: files rotated to a non-matching path are drained along that path
+        self.__dPaths = dPaths
+        for oFile in list(self.__dFiles.values()):
+            if dPaths.get(oFile.path) is not oFile:
+                self._oWatcher.log('INFO[Producer:Tail(%s)]: File has vanished (%s)\n' % (self.name(), oFile.path))
+                yield from self.__close(oFile, _fnFeed, _fnStop)
+
+        # Vanished directories
+        if _oInotify is not None:
+            for (iWD, sDirectory) in list(self.__dDirectories.items()):
+                if sDirectory not in lsDirectories:
+                    _oInotify.remove(iWD)
+                    del self.__dDirectories[iWD]
+
+        return setPathsDirty
+
+
+    def routine(self, _fnFeed, _fnStop):
+        # Event notifications
+        oInotify = None
+        if self._bInotify:
+            try:
+                oInotify = Inotify()
+            except OSError as e:
+                self._oWatcher.log('WARNING[Producer:Tail(%s)]: Failed to set up file events notifications; falling back to polling\n%s\n' % (self.name(), str(e)))
+
+        try:
+            yield from self.__follow(_fnFeed, _fnStop, oInotify)
+        finally:
+            for oFile in list(self.__dFiles.values()):
+                if oFile.file is not None:
+                    oFile.file.close()
+                self.__iTruncated += oFile.lines.truncated()
+            self.__dFiles = {}
+            self.__dPaths = {}
+            self.__odFilesOpen = OrderedDict()
+            self.__dDirectories = {}
+            if oInotify is not None:
+                oInotify.close()
+
+
+    def __follow(self, _fnFeed, _fnStop, _oInotify):
+        # Feed the files content line-by-line
+        bStarting = True
+        bScan = True
+        setPathsDirty = set()
+        while True:
+            if _fnStop(): break
+
+            # Scan files
+            if bScan:
+                setPathsDirty |= (yield from self.__scan(_oInotify, bStarting, _fnFeed, _fnStop))
+                bStarting = False
+                bScan = False
+
+            # Get new lines
+            for sPath in setPathsDirty:
+                oFile = self.__dPaths.get(sPath)
+                if oFile is None:
+                    bScan = True
+                    continue
+                yield from self.__read(oFile, _fnFeed, _fnStop)
+            setPathsDirty = set()
+            if bScan:
+                continue
+
+            # Wait for new lines
+            if _oInotify is None:
+                yield ([], self._fInterval)
+                bScan = True
+                continue
+            yield ([_oInotify], self._fInterval if self.__bDirectoryPattern else None)
+            ltEvents = _oInotify.wait(0)
+            if not ltEvents and self.__bDirectoryPattern:
+                bScan = True
+            for (iWD, iMask, sName) in ltEvents:
+                if iMask & IN_Q_OVERFLOW:
+                    bScan = True
+                    continue
+                sDirectory = self.__dDirectories.get(iWD)
+                if sDirectory is None or sName is None:
+                    continue
+                if not fnmatch.fnmatchcase(sName, self.__sNamePattern):
+                    continue
+                if iMask & IN_MODIFY:
+                    setPathsDirty.add(os.path.join(sDirectory, sName))
+                else:
+                    bScan = True
@@ -0,0 +1,628 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+from queue import Queue, Full
+from threading import Lock, Thread
+import time
+
+# LogWatcher
+from .LineBuffer import LineBuffer
+from .ProducerDispatch import ProducerDispatch
+from .ProducerRoutine import ProducerRoutine
+from .TailCheckpoint import TailCheckpoint
+from .Inotify import \
+    Inotify, \
+    IN_ATTRIB, \
+    IN_CREATE, \
+    IN_DELETE_SELF, \
+    IN_MODIFY, \
+    IN_MOVE_SELF, \
+    IN_MOVED_TO, \
+    IN_Q_OVERFLOW
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Read chunk (buffer) size, in bytes
+TAILREADER_CHUNK_SIZE = 65536
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TailReader:
+    """
+    File "Tail" Reader.
+
+    This class/object follows a file (similar to UNIX 'tail -F ...') on behalf
+    of one or many "Tail" producers.
+
+    When used by a single producer, the file is followed within that producer's
+    own thread and each line is fed directly to it.
+
+    Data are read in fixed-size binary chunks (into a reusable buffer) and split
+    into lines by the reader itself, which carries incomplete trailing lines over
+    to the next read and truncates lines exceeding the configured maximum length;
+    memory usage thus remains bounded, however far behind the reader may fall.
+
+    Unless polling is required (or inotify is not available), the reader blocks
+    - without using any CPU - until file events notifications are received and
+    then reads all available data at once.
+
+    If a read-offset checkpoint is configured, the reader resumes where it left
+    off (rather than skipping existing content), including catching up on the
+    rotated predecessor of the file if it was rotated in the meantime.
+
+    The file is followed by the reader routine (see ProducerRoutine), which may
+    be run either by a thread or by the daemon event loop.
+
+    When shared by several (identical) producers, the file is followed by a
+    dedicated thread, which reads and decodes each line once and fans it out
+    to the queue of each subscribed producer; each producer then feeds those
+    lines to its parent watcher from its own thread (thus keeping its own error,
+    respawn and stop handling). Should a producer queue be full, the lines are
+    discarded if that producer is non-blocking, such as a lagging watcher only
+    holds back the reader (and the other producers) if its producer is set to
+    blocking. In the event loop, the routine of one of those
+    producers follows the file on behalf of all of them.
+    Lines are only fanned out to the producers whose watcher is interested in
+    their syslog program (see ProducerDispatch).
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _sFile, _fInterval, _bInotify, _iMaxLength, _oCheckpoint=None, _iQueueSize=1000):
+        """
+        Constructor.
+
+        @param  Watcher         _oWatcher     First (owning) watcher
+        @param  string          _sFile        File path
+        @param  float           _fInterval    File check interval, in seconds (polling)
+        @param  bool            _bInotify     Wait for file events notifications (instead of polling)
+        @param  int             _iMaxLength   Maximum line length, in bytes
+        @param  TailCheckpoint  _oCheckpoint  Read-offset checkpoint (None to skip existing content)
+        @param  int             _iQueueSize   Subscriber queue size (shared mode), in lines
+        """
+
+        # Fields
+        self._oWatcher = _oWatcher
+        self.__sFile = _sFile
+        self.__sBasename = os.path.basename(_sFile)
+        self._fInterval = _fInterval
+        self._bInotify = _bInotify and Inotify.available()
+        self._oRoutineDriver = None
+        self.__iWDDirectory = None
+        self.__oCheckpoint = _oCheckpoint
+        self.__baBuffer = bytearray(TAILREADER_CHUNK_SIZE)
+        self.__oLineBuffer = LineBuffer(_iMaxLength)
+        self._bDebug = _oWatcher.debug()
+        self.__iQueueSize = _iQueueSize
+        self.__lsNames = [_oWatcher.name()]
+        self.__oLock = Lock()
+        self.__dQueues = {}
+        self.__loQueues = ()
+        self.__setLagging = set()
+        self.__iDropped = 0
+        self.__oThread = None
+        self.__oDispatch = ProducerDispatch()
+        self.__oDispatchDirect = ProducerDispatch()
+        self.__bRoutineShared = False
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def name(self):
+        """
+        Return the (comma-separated) name(s) of the watcher(s) using this reader.
+        """
+
+        return ','.join(self.__lsNames)
+
+
+    def attach(self, _oWatcher):
+        """
+        Attach an additional watcher to this reader (and switch to shared mode).
+
+        @param  Watcher  _oWatcher  Additional watcher
+        """
+
+        self.__lsNames.append(_oWatcher.name())
+
+
+    def statistics(self):
+        """
+        Return the reader statistics (dictionary).
+        """
+
+        return {'truncated': self.__oLineBuffer.truncated(), 'dropped': self.__iDropped}
+
+
+    def shared(self):
+        """
+        Return whether this reader is shared among several producers.
+        """
+
+        return len(self.__lsNames)>1
+
+
+    def subscribe(self, _oProducer):
+        """
+        [thread-safe] Subscribe the given producer and return its data queue.
+
+        The (shared) reader thread is started along the first subscription.
+
+        @param  Producer  _oProducer  Subscribing producer
+        """
+
+        with self.__oLock:
+            oQueue = Queue(self.__iQueueSize)
+            tQueue = (oQueue, _oProducer.blocking())
+            self.__dQueues[id(_oProducer)] = tQueue
+            self.__loQueues = tuple(self.__dQueues.values())
+            self.__oDispatch.add(tQueue, _oProducer.programs())
+            if self.__oThread is None:
+                sThreadName = '%s.TailReader' % self.__lsNames[0]
+                self.__oThread = Thread(name=sThreadName, target=self.__run)
+                self.__oThread.start()
+        return oQueue
+
+
+    def unsubscribe(self, _oProducer):
+        """
+        [thread-safe] Unsubscribe the given producer.
+
+        The (shared) reader thread exits along the last unsubscription.
+
+        @param  Producer  _oProducer  Unsubscribing producer
+        """
+
+        with self.__oLock:
+            tQueue = self.__dQueues.pop(id(_oProducer), None)
+            self.__loQueues = tuple(self.__dQueues.values())
+            if tQueue is not None:
+                self.__oDispatch.remove(tQueue)
+        self.wake()
+
+
+    def __stopped(self):
+        """
+        [thread-safe] Return whether the (shared) reader thread should exit.
+        """
+
+        return not self.__dQueues
+
+
+    def __fanOut(self, _sData, _sSource):
+        """
+        Fan the given data (line) out to all subscribed producers (whose
+        watcher is interested in the line program; see ProducerDispatch).
+
+        Data are discarded for non-blocking producers whose queue is full, while
+        blocking producers are waited for (once all others have been served).
+        """
+
+        tData = (_sData, _sSource)
+        ltQueuesBlocking = []
+        for tQueue in self.__oDispatch.targets(_sData):
+            (oQueue, bBlocking) = tQueue
+            try:
+                oQueue.put_nowait(tData)
+                self.__setLagging.discard(id(oQueue))
+            except Full:
+                if bBlocking:
+                    ltQueuesBlocking.append(tQueue)
+                    continue
+                self.__iDropped += 1
+                if id(oQueue) not in self.__setLagging:
+                    self.__setLagging.add(id(oQueue))
+                    self._oWatcher.log('WARNING[Producer:Tail(%s)]: Watcher is lagging behind; discarding data...\n' % self.name())
+        for tQueue in ltQueuesBlocking:
+            oQueue = tQueue[0]
+            while True:
+                try:
+                    oQueue.put(tData, timeout=1.0)
+                except Full:
+                    if tQueue not in self.__loQueues: break
+                    self._oWatcher.log('WARNING[Producer:Tail(%s)]: Watcher is lagging behind; waiting...\n' % self.name())
+                    continue
+                break
+
+
+    def __run(self):
+        """
+        Run the (shared) reader thread.
+        """
+
+        while True:
+            if not self.__stopped():
+                try:
+                    self.follow(self.__fanOut, self.__stopped)
+                except Exception as e:
+                    self._oWatcher.log('ERROR[Producer:Tail(%s)]: Shared reader error\n%s\n' % (self.name(), str(e)))
+                    time.sleep(self._fInterval)
+                    continue
+
+            # Exit (unless a producer subscribed in the meantime)
+            with self.__oLock:
+                if not self.__dQueues:
+                    self.__oThread = None
+                    break
+
+
+    def wake(self):
+        """
+        [thread-safe] Wake up the reader if it is blocked waiting for file events.
+        """
+
+        oRoutineDriver = self._oRoutineDriver
+        if oRoutineDriver is not None:
+            oRoutineDriver.wake()
+
+
+    def follow(self, _fnFeed, _fnStop):
+        """
+        Follow the file and feed new lines to the given function as they appear.
+
+        This method blocks until the given stop function returns True.
+
+        @param  function  _fnFeed  Data (line, source) feeding function
+        @param  function  _fnStop  Stop checking function
+        """
+
+        oRoutineDriver = ProducerRoutine()
+        self._oRoutineDriver = oRoutineDriver
+        try:
+            oRoutineDriver.run(self.routine(_fnFeed, _fnStop), _fnStop)
+        finally:
+            self._oRoutineDriver = None
+            oRoutineDriver.close()
+
+
+    def routineShared(self, _fnFeed, _fnStop, _oPrograms=None):
+        """
+        Return the routine (see ProducerRoutine) of a producer sharing this reader
+        within the daemon event loop.
+
+        The first routine to run follows the file and feeds each line directly to
+        all sharing producers (their data being queued by the event loop); the
+        others wait, ready to take over should that routine be stopped.
+
+        @param  function   _fnFeed     Data (line, source, routed) feeding function
+        @param  function   _fnStop     Stop checking function
+        @param  frozenset  _oPrograms  Programs (tags) the producer's watcher is restricted to (None for all)
+        """
+
+        tFeed = (_fnFeed, _fnStop)
+        self.__oDispatchDirect.add(tFeed, _oPrograms)
+        try:
+            while True:
+                if _fnStop(): break
+                if self.__bRoutineShared:
+                    yield ([], self._fInterval)
+                    continue
+                self.__bRoutineShared = True
+                try:
+                    yield from self.routine(self.__fanOutDirect, _fnStop)
+                finally:
+                    self.__bRoutineShared = False
+        finally:
+            self.__oDispatchDirect.remove(tFeed)
+
+
+    def __fanOutDirect(self, _sData, _sSource):
+        """
+        Fan the given data (line) out directly to all sharing producers (whose
+        watcher is interested in the line program; see ProducerDispatch) (event
+        loop).
+        """
+
+        for (fnFeed, fnStop) in self.__oDispatchDirect.targets(_sData):
+            if not fnStop():
+                fnFeed(_sData, _sSource, True)
+
+
+    def __wait(self, _oInotify, _iWD):
+        """
+        Wait for new lines; returns whether the file may have been replaced.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  Inotify  _oInotify  Event notifications (None for polling)
+        @param  int      _iWD       File watch descriptor
+        """
+
+        # Polling
+        if _oInotify is None:
+            yield ([], self._fInterval)
+            return True
+
+        # Event notifications
+        yield ([_oInotify], None)
+        for (iWD, iMask, sName) in _oInotify.wait(0):
+            if iMask & IN_Q_OVERFLOW:
+                return True
+            if iWD==_iWD and iMask & (IN_ATTRIB|IN_MOVE_SELF|IN_DELETE_SELF):
+                return True
+            if iWD==self.__iWDDirectory and sName==self.__sBasename:
+                return True
+        return False
+
+
+    def routine(self, _fnFeed, _fnStop):
+        """
+        Return the routine (see ProducerRoutine) following the file and feeding
+        new lines to the given function as they appear.
+
+        @param  function  _fnFeed  Data (line, source) feeding function
+        @param  function  _fnStop  Stop checking function
+        """
+
+        # Event notifications
+        oInotify = None
+        if self._bInotify:
+            try:
+                oInotify = Inotify()
+                self.__iWDDirectory = oInotify.add(os.path.dirname(os.path.abspath(self.__sFile)), IN_CREATE|IN_MOVED_TO)
+            except OSError as e:
+                self._oWatcher.log('WARNING[Producer:Tail(%s)]: Failed to set up file events notifications; falling back to polling\n%s\n' % (self.name(), str(e)))
+                if oInotify is not None:
+                    oInotify.close()
+                    oInotify = None
+
+        try:
+            yield from self.__follow(_fnFeed, _fnStop, oInotify)
+        finally:
+            if oInotify is not None:
+                oInotify.close()
+
+
+    def __findRotated(self, _iDevice, _iInode):
+        """
+        Return the path of the (rotated) file matching the given device and inode,
+        or None if no such file is found along the followed file.
+
+        @param  int  _iDevice  File device
+        @param  int  _iInode   File inode
+        """
+
+        sDirectory = os.path.dirname(os.path.abspath(self.__sFile))
+        try:
+            with os.scandir(sDirectory) as oEntries:
+                for oEntry in oEntries:
+                    if not oEntry.name.startswith(self.__sBasename) or oEntry.name==self.__sBasename:
+                        continue
+                    try:
+                        oStat = oEntry.stat()
+                    except OSError:
+                        continue
+                    if (oStat.st_dev, oStat.st_ino)==(_iDevice, _iInode):
+                        return oEntry.path
+        except OSError:
+            pass
+        return None
+
+
+    def __read(self, _oFile, _oStat, _fnFeed, _fnStop):
+        """
+        Read all available data - in chunks - and feed the corresponding lines;
+        returns whether any data was read.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  file      _oFile   Followed file
+        @param  stat      _oStat   Followed file status
+        @param  function  _fnFeed  Data (line, source) feeding function
+        @param  function  _fnStop  Stop checking function
+        """
+
+        bRead = False
+        iTruncated = self.__oLineBuffer.truncated()
+        while True:
+            if _fnStop(): break
+            iRead = _oFile.readinto(self.__baBuffer)
+            if not iRead: break
+            bRead = True
+            for sLine in self.__oLineBuffer.feed(self.__baBuffer, iRead):
+                _fnFeed(sLine, self.__sFile)
+            if self.__oCheckpoint is not None:
+                self.__oCheckpoint.update(_oStat.st_dev, _oStat.st_ino, _oFile.tell()-self.__oLineBuffer.pending(), _oFile.fileno())
+            yield ([], 0)
+        if self.__oLineBuffer.truncated()>iTruncated:
+            self._oWatcher.log('WARNING[Producer:Tail(%s)]: Lines exceeding the maximum length have been truncated (total:%d)\n' % (self.name(), self.__oLineBuffer.truncated()))
+        return bRead
+
+
+    def __truncation(self, _oFile, _fnFeed):
+        """
+        Detect whether the file has been truncated in place (e.g. logrotate's
+        'copytruncate') and, if so, start reading it again from its beginning.
+
+        @param  file      _oFile   Followed file
+        @param  function  _fnFeed  Data (line, source) feeding function
+        """
+
+        try:
+            iSize = os.fstat(_oFile.fileno()).st_size
+        except OSError:
+            return
+        if iSize>=_oFile.tell():
+            return
+        self._oWatcher.log('INFO[Producer:Tail(%s)]: File has been truncated; reading from start\n' % self.name())
+        self.__flush(_fnFeed)
+        _oFile.seek(0)
+
+
+    def __flush(self, _fnFeed):
+        """
+        Feed the incomplete trailing line (if any), when leaving a file.
+
+        @param  function  _fnFeed  Data (line, source) feeding function
+        """
+
+        for sLine in self.__oLineBuffer.flush():
+            _fnFeed(sLine, self.__sFile)
+
+
+    def __resume(self, _oFile, _oStat, _fnFeed, _fnStop):
+        """
+        Position the (just opened) file according to the saved checkpoint, after
+        catching up on its rotated predecessor if need be; skip existing content
+        if no checkpoint is available.
+
+        This method is a (sub-)routine (see ProducerRoutine).
+
+        @param  file      _oFile   Followed file
+        @param  stat      _oStat   Followed file status
+        @param  function  _fnFeed  Data (line, source) feeding function
+        @param  function  _fnStop  Stop checking function
+        """
+
+        # Checkpoint
+        tCheckpoint = self.__oCheckpoint.load() if self.__oCheckpoint is not None else None
+        if tCheckpoint is None:
+            iOffset = _oFile.seek(0, os.SEEK_END)
+            if self.__oCheckpoint is not None:
+                self.__oCheckpoint.update(_oStat.st_dev, _oStat.st_ino, iOffset, _oFile.fileno())
+            return
+        (iDevice, iInode, iOffset, sHash) = tCheckpoint
+
+        # ... same file
+        if (iDevice, iInode)==(_oStat.st_dev, _oStat.st_ino):
+            if iOffset<=_oStat.st_size and TailCheckpoint.hash(_oFile.fileno(), iOffset)==sHash:
+                if self._bDebug:
+                    self._oWatcher.log('DEBUG[Producer:Tail(%s)]: Resuming from checkpoint (offset:%d)\n' % (self.name(), iOffset))
+                _oFile.seek(iOffset)
+            else:
+                self._oWatcher.log('WARNING[Producer:Tail(%s)]: File content does not match checkpoint; reading from start\n' % self.name())
+                _oFile.seek(0)
+            return
+
+        # ... rotated file
+        sFileRotated = self.__findRotated(iDevice, iInode)
+        if sFileRotated is not None:
+            try:
+                with open(sFileRotated, 'rb', buffering=0) as oFileRotated:
+                    oStat = os.fstat(oFileRotated.fileno())
+                    if iOffset<=oStat.st_size and TailCheckpoint.hash(oFileRotated.fileno(), iOffset)==sHash:
+                        self._oWatcher.log('INFO[Producer:Tail(%s)]: Catching up on rotated file (%s)\n' % (self.name(), sFileRotated))
+                        oFileRotated.seek(iOffset)
+                        yield from self.__read(oFileRotated, oStat, _fnFeed, _fnStop)
+                        self.__flush(_fnFeed)
+            except (IOError, OSError) as e:
+                self._oWatcher.log('WARNING[Producer:Tail(%s)]: Failed to catch up on rotated file (%s)\n%s\n' % (self.name(), sFileRotated, str(e)))
+        _oFile.seek(0)
+        self.__oCheckpoint.update(_oStat.st_dev, _oStat.st_ino, 0, _oFile.fileno())
+
+
+    def __save(self):
+        """
+        Write the checkpoint file (if any).
+        """
+
+        if self.__oCheckpoint is None:
+            return
+        try:
+            self.__oCheckpoint.save()
+        except OSError as e:
+            self._oWatcher.log('WARNING[Producer:Tail(%s)]: Failed to write checkpoint\n%s\n' % (self.name(), str(e)))
+
+
+    def __follow(self, _fnFeed, _fnStop, _oInotify):
+        # Feed the file content line-by-line
+        bStarting = True
+        bMissing = False
+        while True:
+            if _fnStop(): break
+
+            # Open file
+            try:
+                oFile = open(self.__sFile, 'rb', buffering=0)
+                oStat = os.fstat(oFile.fileno())
+                sFileID = '%s:%s' % (oStat.st_dev, oStat.st_ino) if os.name=='posix' else '%s' % oStat.st_ctime
+            except (IOError, OSError):
+                if not bMissing:
+                    self._oWatcher.log('WARNING[Producer:Tail(%s)]: Failed to open file (%s); trying again...\n' % (self.name(), self.__sFile))
+                    bMissing = True
+                while not (yield from self.__wait(_oInotify, None)):
+                    if _fnStop(): break
+                continue
+            bMissing = False
+
+            # Watch file
+            iWD = None
+            if _oInotify is not None:
+                try:
+                    iWD = _oInotify.add(oFile.name, IN_MODIFY|IN_ATTRIB|IN_MOVE_SELF|IN_DELETE_SELF)
+                except OSError:
+                    oFile.close()
+                    continue
+
+            with oFile:
+                try:
+                    # Skip existing content (or resume from checkpoint)
+                    if bStarting:
+                        yield from self.__resume(oFile, oStat, _fnFeed, _fnStop)
+                        bStarting = False
+
+                    while True:
+                        # Get new lines
+                        if _fnStop(): break
+                        self.__truncation(oFile, _fnFeed)
+                        yield from self.__read(oFile, oStat, _fnFeed, _fnStop)
+
+                        # Wait for new lines
+                        if not (yield from self.__wait(_oInotify, iWD)):
+                            continue
+
+                        # Check file hasn't been replaced (e.g. log rotation)
+                        try:
+                            oStat_check = os.stat(oFile.name)
+                            sFileID_check = '%s:%s' % (oStat_check.st_dev, oStat_check.st_ino) if os.name=='posix' else '%s' % oStat_check.st_ctime
+                            if sFileID_check != sFileID:
+                                self._oWatcher.log('INFO[Producer:Tail(%s)]: File has been rotated; opening new one\n' % self.name())
+                                break
+                        except OSError:
+                            self._oWatcher.log('INFO[Producer:Tail(%s)]: File has vanished; waiting for new one...\n' % self.name())
+                            break
+
+                    # Drain the file (lines written until it was rotated)
+                    if not _fnStop():
+                        yield from self.__read(oFile, oStat, _fnFeed, _fnStop)
+                        self.__flush(_fnFeed)
+
+                finally:
+                    # Checkpoint (while the file is still open)
+                    self.__save()
+
+            # Unwatch file
+            if iWD is not None:
+                _oInotify.remove(iWD)
@@ -0,0 +1,358 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import re
+import sys
+
+# Extra (optional)
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Regular expression engines
+REGEXP_ENGINES = ('auto', 're', 're2')
+
+# Regular expression flags supported by the linear-time engine (inline)
+REGEXP_FLAGS_RE2 = (
+    (re.IGNORECASE, 'i'),
+    (re.MULTILINE, 'm'),
+    (re.DOTALL, 's'),
+)
+
+# Pattern snippets: name -> (portable pattern, tuned pattern)
+# NB: portable patterns are supported by both engines; tuned patterns (atomic
+#     groups and possessive quantifiers) only by the standard engine, and must
+#     match the same data - with the same groups - as their portable form
+REGEXP_SNIPPET = re.compile(r'%\{([A-Za-z_][A-Za-z0-9_]*)\}')
+REGEXP_SNIPPETS = {
+    'ipv4': (
+        r'[0-9]{1,3}(\.[0-9]{1,3}){3}',
+        r'[0-9]{1,3}+(?:\.[0-9]{1,3}+){2}(\.[0-9]{1,3})',
+    ),
+    'ipv6': (
+        r'[0-9a-f]{1,4}(:[0-9a-f]{0,4}){2,7}',
+        r'[0-9a-f]{1,4}+(:[0-9a-f]{0,4}){2,7}',
+    ),
+    'ip': (
+        r'([0-9]{1,3}(\.[0-9]{1,3}){3}|[0-9a-f]{1,4}(:[0-9a-f]{0,4}){2,7})',
+        r'([0-9]{1,3}+(?:\.[0-9]{1,3}+){2}(\.[0-9]{1,3})|[0-9a-f]{1,4}+(:[0-9a-f]{0,4}){2,7})',
+    ),
+    'email': (
+        r'[-_a-zA-Z0-9]{1,}(\.[-_a-zA-Z0-9]{1,})*@[-_a-zA-Z0-9]{1,}(\.[-_a-zA-Z0-9]{1,})*\.[a-zA-Z]{2,}',
+        r'[-_a-zA-Z0-9]++(\.[-_a-zA-Z0-9]++)*+@[-_a-zA-Z0-9]++(\.[-_a-zA-Z0-9]++)*\.[a-zA-Z]{2,}',
+    ),
+    'hostname': (
+        r'[a-zA-Z0-9][-a-zA-Z0-9]*(?:\.[a-zA-Z0-9][-a-zA-Z0-9]*)*',
+        None,
+    ),
+    'port': (
+        r'[0-9]{1,5}',
+        None,
+    ),
+    'int': (
+        r'[-+]?[0-9]+',
+        None,
+    ),
+    'word': (
+        r'\w+',
+        None,
+    ),
+    'user': (
+        r'[-_.a-zA-Z0-9]+',
+        None,
+    ),
+    'syslog_ts': (
+        r'[A-Z][a-z]{2} [ 0-9][0-9] [0-9]{2}:[0-9]{2}:[0-9]{2}',
+        None,
+    ),
+    'iso8601': (
+        r'[0-9]{4}-[0-9]{2}-[0-9]{2}[T ][0-9]{2}:[0-9]{2}:[0-9]{2}(?:[.,][0-9]+)?(?:Z|[-+][0-9]{2}:?[0-9]{2})?',
+        None,
+    ),
+}
+
+# Tuned snippets support (atomic groups and possessive quantifiers)
+REGEXP_TUNED = sys.version_info>=(3, 11)
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class RegExpLinear:
+    """
+    Linear-Time Regular Expression.
+
+    This class/object exposes a regular expression compiled by the linear-time
+    engine (re2) the same way as the standard (re) engine compiled regular
+    expressions (pattern, flags and matching methods).
+    """
+
+    __slots__ = (
+        'pattern', 'flags', 'groups', 'groupindex',
+        'search', 'match', 'fullmatch', 'sub', 'subn', 'split', 'finditer', 'findall',
+    )
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oRegExp, _sPattern, _iFlags):
+        """
+        Constructor.
+
+        @param  object  _oRegExp   Compiled (re2) regular expression
+        @param  string  _sPattern  Regular expression (pattern)
+        @param  int     _iFlags    Regular expression flags (including inline flags)
+        """
+
+        # Fields
+        self.pattern = _sPattern
+        self.flags = _iFlags
+        for sAttribute in RegExpLinear.__slots__[2:]:
+            setattr(self, sAttribute, getattr(_oRegExp, sAttribute, None))
+
+
+class RegExp:
+    """
+    Regular Expressions Compiler.
+
+    This class compiles regular expressions with the configured engine:
+     - 're2': the linear-time engine (re2), which guarantees patterns can not
+       be made to backtrack exponentially by hostile data; it does not support
+       back-references and look-around assertions
+     - 're': the standard (backtracking) engine
+     - 'auto': the linear-time engine if it is available and supports the
+       pattern, the standard engine otherwise
+
+    Patterns may include snippets from the shared library (e.g. %{ip}), which
+    users may extend from the configuration (see snippet()); snippets are
+    expanded to their tuned - non-backtracking - form when compiled with the
+    standard engine.
+
+    Compiled patterns are interned, such as identical patterns - across all
+    watchers - share the same compiled object.
+
+    It also keeps track of the patterns which could not be compiled with the
+    linear-time engine, for the daemon to report them at startup.
+    """
+
+    # Pattern snippets (built-in and user-defined)
+    __dSnippets = dict(REGEXP_SNIPPETS)
+
+    # Compiled patterns (interning cache): (pattern, flags, engine) -> (compiled, fallback error)
+    __dCache = {}
+
+    # Compiled patterns count (per engine, and shared)
+    __dCompiled = {'re': 0, 're2': 0, 'shared': 0}
+
+    # Patterns which could not be compiled with the linear-time engine
+    __ltFallbacks = []
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def available():
+        """
+        Return whether the linear-time engine (re2) is available.
+        """
+
+        return re2 is not None
+
+
+    @staticmethod
+    def engine(_oRegExp):
+        """
+        Return the engine the given regular expression was compiled with.
+
+        @param  object  _oRegExp  Compiled regular expression
+        """
+
+        return 're2' if isinstance(_oRegExp, RegExpLinear) else 're'
+
+
+    @staticmethod
+    def snippet(_sName, _sPattern):
+        """
+        Register the given (user-defined) snippet, which may itself include other
+        (previously registered) snippets.
+
+        Raises an exception if the snippet name or pattern is invalid.
+
+        @param  string  _sName     Snippet name
+        @param  string  _sPattern  Snippet regular expression (pattern)
+        """
+
+        if not REGEXP_SNIPPET.fullmatch('%%{%s}' % _sName):
+            raise ValueError('Invalid snippet name (%s)' % _sName)
+        sPortable = RegExp.expand(_sPattern)
+        re.compile(sPortable)
+        RegExp.__dSnippets[_sName] = (sPortable, None)
+        RegExp.__dCache.clear()
+
+
+    @staticmethod
+    def expand(_sPattern, _bTuned=False):
+        """
+        Return the given regular expression with its snippets expanded
+        (unknown snippets being left as is).
+
+        @param  string  _sPattern  Regular expression (pattern)
+        @param  bool    _bTuned    Expand snippets to their tuned form (standard engine only)
+        """
+
+        if '%{' not in _sPattern:
+            return _sPattern
+        dSnippets = RegExp.__dSnippets
+        bTuned = _bTuned and REGEXP_TUNED
+
+        def fnSnippet(_oMatch):
+            tSnippet = dSnippets.get(_oMatch.group(1))
+            if tSnippet is None:
+                return _oMatch.group(0)
+            return tSnippet[1] if bTuned and tSnippet[1] is not None else tSnippet[0]
+
+        return REGEXP_SNIPPET.sub(fnSnippet, _sPattern)
+
+
+    @staticmethod
+    def __compileLinear(_sPattern, _iFlags):
+        """
+        Compile the given regular expression with the linear-time engine.
+
+        Raises an exception if the linear-time engine is not available or does
+        not support the given pattern (or flags).
+
+        @param  string  _sPattern  Regular expression (pattern)
+        @param  int     _iFlags    Regular expression flags
+        """
+
+        if re2 is None:
+            raise RuntimeError('Linear-time regular expression engine (re2) is not available')
+        sFlags = ''
+        iFlags = _iFlags
+        for (iFlag, sFlag) in REGEXP_FLAGS_RE2:
+            if iFlags & iFlag:
+                sFlags += sFlag
+                iFlags &= ~iFlag
+        if iFlags & ~re.UNICODE:
+            raise ValueError('Unsupported regular expression flags')
+        sPattern = '(?%s)%s' % (sFlags, _sPattern) if sFlags else _sPattern
+        if hasattr(re2, 'Options'):
+            oOptions = re2.Options()
+            oOptions.log_errors = False
+            oRegExp = re2.compile(sPattern, oOptions)
+        else:
+            oRegExp = re2.compile(sPattern)
+        try:
+            iFlags = re.compile(_sPattern, _iFlags).flags
+        except re.error:
+            iFlags = _iFlags | re.UNICODE
+        return RegExpLinear(oRegExp, _sPattern, iFlags)
+
+
+    @staticmethod
+    def compile(_sPattern, _iFlags=0, _sEngine='auto', _sOwner=None):
+        """
+        Compile the given regular expression with the given engine.
+
+        Raises an exception if the pattern is invalid (or not supported by the
+        linear-time engine, when explicitly required).
+
+        Identical patterns (and flags and engine) share the same compiled object.
+
+        @param  string  _sPattern  Regular expression (pattern)
+        @param  int     _iFlags    Regular expression flags
+        @param  string  _sEngine   Regular expression engine ('auto', 're' or 're2')
+        @param  string  _sOwner    Pattern owner (e.g. watcher and plugin name), for reporting purposes (optional)
+        """
+
+        if _sEngine not in REGEXP_ENGINES:
+            raise ValueError('Invalid regular expression engine (%s)' % _sEngine)
+        tKey = (_sPattern, _iFlags, _sEngine)
+        tCompiled = RegExp.__dCache.get(tKey)
+        if tCompiled is None:
+            oRegExp = None
+            sError = None
+            if _sEngine=='re2':
+                oRegExp = RegExp.__compileLinear(RegExp.expand(_sPattern), _iFlags)
+            elif _sEngine=='auto' and re2 is not None:
+                try:
+                    oRegExp = RegExp.__compileLinear(RegExp.expand(_sPattern), _iFlags)
+                except Exception as e:
+                    oError = e.args[0] if e.args else ''
+                    sError = str(oError, 'utf-8', 'replace') if isinstance(oError, bytes) else str(e)
+            if oRegExp is None:
+                oRegExp = re.compile(RegExp.expand(_sPattern, True), _iFlags)
+            tCompiled = (oRegExp, sError)
+            RegExp.__dCache[tKey] = tCompiled
+        elif _sOwner is not None:
+            RegExp.__dCompiled['shared'] += 1
+        (oRegExp, sError) = tCompiled
+        if _sOwner is not None:
+            if sError is not None:
+                RegExp.__ltFallbacks.append((_sOwner, _sPattern, sError))
+            RegExp.__dCompiled[RegExp.engine(oRegExp)] += 1
+        return oRegExp
+
+
+    @staticmethod
+    def fields(_oMatch):
+        """
+        Return the named groups of the given match (which participated in the
+        match), as a dictionary.
+
+        @param  object  _oMatch  Regular expression match
+        """
+
+        return dict([(sName, sValue) for (sName, sValue) in _oMatch.groupdict().items() if sValue is not None])
+
+
+    @staticmethod
+    def compiled():
+        """
+        Return the count of (owned) patterns compiled with each engine - and
+        shared with other owners (interned) - as a dictionary.
+        """
+
+        return dict(RegExp.__dCompiled)
+
+
+    @staticmethod
+    def fallbacks():
+        """
+        Return the (owned) patterns which could not be compiled with the
+        linear-time engine, as a list of (owner, pattern, error) tuples.
+        """
+
+        return list(RegExp.__ltFallbacks)
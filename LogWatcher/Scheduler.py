@@ -0,0 +1,450 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from collections import deque
+import os
+from queue import Queue
+import selectors
+import threading
+import time
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class SchedulerTask:
+    """
+    Scheduled Watcher State.
+
+    This class/object holds the scheduling state of each watcher (producer) run
+    by the daemon event loop.
+    """
+
+    __slots__ = (
+        'watcher', 'producer', 'synchronous', 'blocking', 'timeout', 'spool',
+        'routine', 'files', 'registered', 'ready', 'deadline', 'done',
+        'data', 'busy', 'since', 'warned',
+    )
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _oProducer, _bSynchronous, _bBlocking, _fTimeout):
+        """
+        Constructor.
+
+        @param  Watcher   _oWatcher      Watcher
+        @param  Producer  _oProducer     Watcher producer
+        @param  bool      _bSynchronous  Synchronous flag
+        @param  bool      _bBlocking     Blocking flag
+        @param  float     _fTimeout      Data feed timeout
+        """
+
+        # Fields
+        # ... configuration
+        self.watcher = _oWatcher
+        self.producer = _oProducer
+        self.synchronous = _bSynchronous
+        self.blocking = _bBlocking
+        self.timeout = _fTimeout
+        self.spool = _oWatcher.spool() if not _bSynchronous and not _bBlocking else None
+
+        # ... producer routine (event loop)
+        self.routine = None
+        self.files = set()
+        self.registered = False
+        self.ready = []
+        self.deadline = 0.0
+        self.done = False
+
+        # ... data feed (workers)
+        self.data = deque()
+        self.busy = False
+        self.since = 0.0
+        self.warned = False
+
+
+class Scheduler:
+    """
+    Log Watcher Event Loop Scheduler.
+
+    This class/object runs the producers of all watchers within a single event
+    loop (thread), by driving their routines (see ProducerRoutine), while the
+    data they produce are fed to their watcher - filters, conditioners and
+    consumers - by a small, fixed pool of worker threads.
+
+    The data of each watcher are fed in order, by one worker at a time; the
+    synchronous, blocking and timeout semantics are preserved by pausing the
+    producer routine as long as its watcher has not been fed its previous data:
+     - synchronous or blocking: until the watcher is done with them (warning
+       about stuck watchers after the configured timeout, when asynchronous)
+     - non-blocking: no longer than the configured timeout; new data are then
+       discarded (verbosely) as long as the watcher is still busy, or spilled
+       to the watcher overflow spool (if any) and replayed later on
+
+    Producer routines which terminate (on error) are reported to the daemon
+    supervisor, which resumes them once their respawn back-off delay elapsed.
+
+    Producers which do not implement a routine are not handled by the scheduler
+    (and keep running in their own thread).
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oDaemon, _iWorkers):
+        """
+        Constructor.
+
+        @param  Daemon  _oDaemon   Parent daemon
+        @param  int     _iWorkers  Worker threads count
+        """
+
+        # Fields
+        self.__oDaemon = _oDaemon
+        self.__iWorkers = _iWorkers
+        self.__loTasks = []
+        self.__dTasks = {}
+        self.__oLock = threading.Lock()
+        self.__oQueueTasks = Queue()
+        self.__dqResume = deque()
+        self.__oSelector = None
+        self.__iWakeRead = None
+        self.__iWakeWrite = None
+        self.__loThreads = []
+        self.__bStop = False
+        self.__bDebug = _oDaemon.debug()
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def add(self, _oWatcher, _oProducer, _bSynchronous, _bBlocking, _fTimeout):
+        """
+        Add the given watcher (producer) to the scheduler.
+
+        @param  Watcher   _oWatcher      Watcher
+        @param  Producer  _oProducer     Watcher producer
+        @param  bool      _bSynchronous  Synchronous flag
+        @param  bool      _bBlocking     Blocking flag
+        @param  float     _fTimeout      Data feed timeout
+        """
+
+        oTask = SchedulerTask(_oWatcher, _oProducer, _bSynchronous, _bBlocking, _fTimeout)
+        self.__loTasks.append(oTask)
+        self.__dTasks[_oProducer] = oTask
+
+
+    def resume(self, _oWatcher):
+        """
+        [thread-safe] Resume (respawn) the given watcher producer routine, after
+        it terminated on error.
+
+        @param  Watcher  _oWatcher  Watcher
+        """
+
+        self.__dqResume.append(_oWatcher)
+        self.wake()
+
+
+    def start(self):
+        """
+        Start the event loop and worker threads.
+        """
+
+        self.__oSelector = selectors.DefaultSelector()
+        self.__iWakeRead, self.__iWakeWrite = os.pipe()
+        os.set_blocking(self.__iWakeRead, False)
+        os.set_blocking(self.__iWakeWrite, False)
+        self.__oSelector.register(self.__iWakeRead, selectors.EVENT_READ, None)
+        for i in range(self.__iWorkers):
+            oThread = threading.Thread(name='Scheduler.Worker%d' % i, target=self.__work)
+            oThread.start()
+            self.__loThreads.append(oThread)
+        oThread = threading.Thread(name='Scheduler.Loop', target=self.__loop)
+        oThread.start()
+        self.__loThreads.append(oThread)
+
+
+    def stop(self):
+        """
+        [thread-safe] Stop the event loop and worker threads.
+        """
+
+        self.__bStop = True
+        self.wake()
+
+
+    def wake(self):
+        """
+        [thread-safe] Wake up the event loop.
+        """
+
+        try:
+            os.write(self.__iWakeWrite, b'\0')
+        except (BlockingIOError, OSError, TypeError):
+            pass
+
+
+    def feed(self, _oProducer, _sData, _sSource, _fTime=None):
+        """
+        Queue the given producer data for feeding to its watcher (by a worker);
+        returns whether the data were queued (or spooled) rather than discarded.
+
+        @param  Producer  _oProducer  Producer
+        @param  string    _sData      Log data (line)
+        @param  string    _sSource    Data source
+        @param  float     _fTime      Ingest time, as a UNIX timestamp (optional)
+        """
+
+        # Queue data
+        # NB: data to be spilled to the overflow spool are written outside the
+        #     scheduler lock (the spool having its own)
+        oTask = self.__dTasks[_oProducer]
+        with self.__oLock:
+            bSpool = oTask.spool is not None and (oTask.spool.pending() or len(oTask.data)>=oTask.spool.memory() or (oTask.busy and time.monotonic()-oTask.since >= oTask.timeout))
+            if not bSpool:
+                if oTask.busy and not oTask.synchronous and not oTask.blocking and time.monotonic()-oTask.since >= oTask.timeout:
+                    oTask.watcher.log('WARNING[Producer(%s)]: Watcher is still feeding previous data; discarding current data\n' % oTask.watcher.name())
+                    return False
+                oTask.data.append((_sData, _sSource, _fTime))
+                self.__schedule(oTask)
+                return True
+
+        # Spill data to the overflow spool
+        # NB: the task is scheduled afterwards, should a worker have found nothing
+        #     left to replay in the meantime
+        oTask.spool.put(_sData, _sSource, _fTime)
+        with self.__oLock:
+            self.__schedule(oTask)
+        return True
+
+
+    def __schedule(self, _oTask):
+        """
+        Hand the given task over to a worker (unless already busy).
+
+        NB: the caller must hold the scheduler lock.
+
+        @param  SchedulerTask  _oTask  Task
+        """
+
+        if not _oTask.busy:
+            _oTask.busy = True
+            _oTask.since = time.monotonic()
+            _oTask.warned = False
+            self.__oQueueTasks.put(_oTask)
+
+
+    def __work(self):
+        """
+        Worker thread: feed queued (or spooled) data to their watcher.
+        """
+
+        while True:
+            oTask = self.__oQueueTasks.get()
+            if oTask is None: break
+            while True:
+                with self.__oLock:
+                    bReplay = not oTask.data and oTask.spool is not None and oTask.spool.pending() and not self.__bStop
+                    if not bReplay:
+                        if not oTask.data or self.__bStop:
+                            oTask.data.clear()
+                            oTask.busy = False
+                            break
+                        tData = oTask.data.popleft()
+                        oTask.since = time.monotonic()
+                        oTask.warned = False
+
+                # Replay spooled data
+                # NB: outside the scheduler lock (the spool having its own); spooled
+                #     data precede those queued in the meantime
+                if bReplay:
+                    ltData = oTask.spool.get(oTask.spool.memory())
+                    with self.__oLock:
+                        oTask.data.extendleft(reversed(ltData))
+                    continue
+
+                oTask.watcher.feed(*tData)
+            self.wake()
+
+
+    def __paused(self, _oTask, _fNow):
+        """
+        Return whether the given task producer routine must be paused (waiting
+        for its watcher to be fed previous data).
+
+        @param  SchedulerTask  _oTask  Task
+        @param  float          _fNow   Current (monotonic) time
+        """
+
+        if not _oTask.busy:
+            return False
+        if _oTask.synchronous:
+            return True
+        if _fNow-_oTask.since < _oTask.timeout:
+            return True
+        if _oTask.blocking:
+            if not _oTask.warned:
+                _oTask.watcher.log('WARNING[Producer(%s)]: Watcher is still feeding previous data; trying again...\n' % _oTask.watcher.name())
+                _oTask.warned = True
+            return True
+        return False
+
+
+    def __register(self, _oTask, _bRegister):
+        """
+        (Un)register the given task files in the event loop selector.
+
+        @param  SchedulerTask  _oTask      Task
+        @param  bool           _bRegister  Register (or unregister)
+        """
+
+        if _oTask.registered==_bRegister:
+            return
+        for oFile in _oTask.files:
+            if _bRegister:
+                self.__oSelector.register(oFile, selectors.EVENT_READ, (_oTask, oFile))
+            else:
+                self.__oSelector.unregister(oFile)
+        _oTask.registered = _bRegister
+
+
+    def __close(self, _oTask):
+        """
+        Close the given task producer routine.
+
+        @param  SchedulerTask  _oTask  Task
+        """
+
+        self.__register(_oTask, False)
+        _oTask.files = set()
+        oRoutine = _oTask.routine
+        _oTask.routine = None
+        if oRoutine is not None:
+            try:
+                oRoutine.close()
+            except Exception as e:
+                _oTask.watcher.log('ERROR[Watcher(%s)]: Producer error\n%s\n' % (_oTask.watcher.name(), str(e)))
+
+
+    def __step(self, _oTask, _fNow):
+        """
+        Resume the given task producer routine (up to its next wait).
+
+        @param  SchedulerTask  _oTask  Task
+        @param  float          _fNow   Current (monotonic) time
+        """
+
+        lReady = _oTask.ready
+        _oTask.ready = []
+        try:
+            if _oTask.routine is None:
+                _oTask.routine = _oTask.producer.routine()
+                (lFiles, fTimeout) = next(_oTask.routine)
+            else:
+                (lFiles, fTimeout) = _oTask.routine.send(lReady)
+        except Exception as e:
+            self.__close(_oTask)
+            _oTask.done = True
+            self.__oDaemon.supervisor().exited(_oTask.watcher, _oTask.watcher.respawn(e if not isinstance(e, StopIteration) else None))
+            return
+        setFiles = set(lFiles or ())
+        if setFiles!=_oTask.files:
+            self.__register(_oTask, False)
+            _oTask.files = setFiles
+        _oTask.deadline = _fNow+fTimeout if fTimeout is not None else None
+
+
+    def __loop(self):
+        """
+        Event loop thread: drive the producers routines.
+        """
+
+        try:
+            while True:
+                if self.__bStop: break
+                fNow = time.monotonic()
+
+                # Resume (respawned) routines
+                while self.__dqResume:
+                    oWatcher = self.__dqResume.popleft()
+                    for oTask in self.__loTasks:
+                        if oTask.watcher is oWatcher and oTask.done:
+                            oTask.ready = []
+                            oTask.deadline = fNow
+                            oTask.done = False
+
+                # Resume (or pause) routines
+                fWait = None
+                for oTask in self.__loTasks:
+                    if oTask.done:
+                        continue
+                    if oTask.producer.stopped():
+                        self.__close(oTask)
+                        oTask.done = True
+                        self.__oDaemon.supervisor().exited(oTask.watcher, False)
+                        continue
+                    if not self.__paused(oTask, fNow):
+                        if oTask.ready or (oTask.deadline is not None and oTask.deadline<=fNow):
+                            self.__step(oTask, fNow)
+                            if oTask.done:
+                                continue
+                    if self.__paused(oTask, fNow):
+                        self.__register(oTask, False)
+                        if not oTask.synchronous and not oTask.warned:
+                            fDeadline = oTask.since+oTask.timeout
+                            fWait = fDeadline if fWait is None else min(fWait, fDeadline)
+                        continue
+                    self.__register(oTask, True)
+                    if oTask.ready:
+                        fWait = fNow
+                    elif oTask.deadline is not None:
+                        fWait = oTask.deadline if fWait is None else min(fWait, oTask.deadline)
+
+                # Wait
+                for (oKey, _) in self.__oSelector.select(max(0.0, fWait-time.monotonic()) if fWait is not None else None):
+                    if oKey.data is None:
+                        try:
+                            while os.read(self.__iWakeRead, 4096): pass
+                        except BlockingIOError:
+                            pass
+                        continue
+                    (oTask, oFile) = oKey.data
+                    oTask.ready.append(oFile)
+        finally:
+            for oTask in self.__loTasks:
+                self.__close(oTask)
+                if not oTask.done:
+                    oTask.done = True
+                    self.__oDaemon.supervisor().exited(oTask.watcher, False)
+                if oTask.spool is not None:
+                    oTask.spool.close()
+            for _ in range(self.__iWorkers):
+                self.__oQueueTasks.put(None)
+            self.__oSelector.close()
@@ -0,0 +1,358 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import selectors
+import signal
+import sys
+import time
+import traceback
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Worker process respawn delay (initial/maximum), in seconds
+SHARDER_RESPAWN_DELAY = 1.0
+SHARDER_RESPAWN_DELAY_MAX = 60.0
+
+# Log forwarding read size, in bytes
+SHARDER_CHUNK_SIZE = 65536
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class SharderProcess:
+    """
+    Sharded Worker Process State.
+
+    This class/object holds the state of each worker process.
+    """
+
+    __slots__ = ('index', 'watchers', 'pid', 'pipe', 'buffer', 'started', 'delay', 'respawn')
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _iIndex, _lsWatchers):
+        """
+        Constructor.
+
+        @param  int   _iIndex     Worker process index
+        @param  list  _lsWatchers  Names of the watchers run by the process
+        """
+
+        # Fields
+        self.index = _iIndex
+        self.watchers = _lsWatchers
+        self.pid = None
+        self.pipe = None
+        self.buffer = b''
+        self.started = 0.0
+        self.delay = SHARDER_RESPAWN_DELAY
+        self.respawn = 0.0
+
+
+class Sharder:
+    """
+    Log Watcher Process Sharder.
+
+    This class/object splits the configured watchers across several worker
+    processes - thus using several CPU cores rather than being serialized by a
+    single interpreter lock - and supervises them:
+     - each worker process runs its share of the watchers (the usual way)
+     - worker processes standard error (logs) is forwarded to the parent logger
+     - worker processes which exit (unexpectedly) are respawned, with capped
+       exponential back-off
+     - worker processes are stopped (SIGTERM, then SIGKILL on timeout) along
+       the parent daemon
+
+    The parent process remains single-threaded (and thus safe to fork).
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oDaemon, _llsWatchers, _fnRun):
+        """
+        Constructor.
+
+        @param  Daemon    _oDaemon      Parent daemon
+        @param  list      _llsWatchers  Names of the watchers run by each process
+        @param  function  _fnRun        Worker process function (index, watchers); returns the exit code
+        """
+
+        # Fields
+        self.__oDaemon = _oDaemon
+        self.__loProcesses = [SharderProcess(i, lsWatchers) for (i, lsWatchers) in enumerate(_llsWatchers)]
+        self.__fnRun = _fnRun
+        self.__oSelector = selectors.DefaultSelector()
+        self.__bStop = False
+        self.__bDebug = _oDaemon.debug()
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def split(_ltWatchers, _iProcesses):
+        """
+        Split the given watchers across the given count of processes; returns
+        the list of watchers names run by each process.
+
+        Watchers pinned to a process are assigned to it; the others are assigned
+        - heaviest first - to the least loaded process, watchers with identical
+        producers being kept together (so they may still share their data source).
+
+        @param  list  _ltWatchers  Watchers (name, producer, process hint, weight) tuples
+        @param  int   _iProcesses  Processes count
+        """
+
+        llsWatchers = [[] for _ in range(_iProcesses)]
+        lfLoads = [0.0] * _iProcesses
+
+        # Pinned watchers
+        dUnits = {}
+        for (sName, sProducer, iProcess, fWeight) in _ltWatchers:
+            if iProcess>=0:
+                llsWatchers[iProcess % _iProcesses].append(sName)
+                lfLoads[iProcess % _iProcesses] += fWeight
+                continue
+            (lsNames, fUnitWeight) = dUnits.get(sProducer, ([], 0.0))
+            lsNames.append(sName)
+            dUnits[sProducer] = (lsNames, fUnitWeight+fWeight)
+
+        # Other watchers (greedy)
+        for (lsNames, fWeight) in sorted(dUnits.values(), key=lambda t: -t[1]):
+            i = lfLoads.index(min(lfLoads))
+            llsWatchers[i].extend(lsNames)
+            lfLoads[i] += fWeight
+        return llsWatchers
+
+
+    def __spawn(self, _oProcess):
+        """
+        Spawn (fork) the given worker process.
+
+        @param  SharderProcess  _oProcess  Worker process
+        """
+
+        (iRead, iWrite) = os.pipe()
+        try:
+            iPID = os.fork()
+        except OSError as e:
+            os.close(iRead)
+            os.close(iWrite)
+            self.__oDaemon.log('ERROR[Sharder(%d)]: Failed to spawn worker process\n%s\n' % (_oProcess.index, str(e)))
+            _oProcess.respawn = time.monotonic()+_oProcess.delay
+            _oProcess.delay = min(2*_oProcess.delay, SHARDER_RESPAWN_DELAY_MAX)
+            return
+
+        # Child
+        if iPID==0:
+            iReturn = 1
+            try:
+                os.close(iRead)
+                for oProcess in self.__loProcesses:
+                    if oProcess.pipe is not None:
+                        os.close(oProcess.pipe)
+                os.dup2(iWrite, 2)
+                os.close(iWrite)
+                sys.stderr = open(2, 'w', buffering=1, closefd=False)
+                iReturn = self.__fnRun(_oProcess.index, _oProcess.watchers) or 0
+            except BaseException as e:
+                sys.stderr.write('ERROR[Sharder(%d)]: Worker process error\n%s\n' % (_oProcess.index, str(e)))
+                if self.__bDebug:
+                    traceback.print_exc()
+            finally:
+                try:
+                    sys.stderr.flush()
+                finally:
+                    os._exit(iReturn)
+
+        # Parent
+        os.close(iWrite)
+        os.set_blocking(iRead, False)
+        _oProcess.pid = iPID
+        _oProcess.pipe = iRead
+        _oProcess.buffer = b''
+        _oProcess.started = time.monotonic()
+        self.__oSelector.register(iRead, selectors.EVENT_READ, _oProcess)
+        if self.__bDebug:
+            self.__oDaemon.log('DEBUG[Sharder(%d)]: Worker process spawned (PID:%d; watchers:%s)\n' % (_oProcess.index, iPID, ','.join(_oProcess.watchers)))
+
+
+    def __forward(self, _oProcess, _bFlush=False):
+        """
+        Forward the (available) logs of the given worker process to the parent
+        logger.
+
+        @param  SharderProcess  _oProcess  Worker process
+        @param  bool            _bFlush    Forward the incomplete trailing line (if any)
+        """
+
+        while _oProcess.pipe is not None:
+            try:
+                bData = os.read(_oProcess.pipe, SHARDER_CHUNK_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                bData = b''
+            if not bData:
+                self.__oSelector.unregister(_oProcess.pipe)
+                os.close(_oProcess.pipe)
+                _oProcess.pipe = None
+                _bFlush = True
+                break
+            _oProcess.buffer += bData
+        lbLines = _oProcess.buffer.split(b'\n')
+        _oProcess.buffer = lbLines.pop()
+        if _bFlush and _oProcess.buffer:
+            lbLines.append(_oProcess.buffer)
+            _oProcess.buffer = b''
+        for bLine in lbLines:
+            if bLine:
+                self.__oDaemon.log('%s\n' % str(bLine, 'utf-8', 'replace'))
+
+
+    def __reap(self):
+        """
+        Reap the exited worker processes (and schedule their respawn).
+        """
+
+        for oProcess in self.__loProcesses:
+            if oProcess.pid is None:
+                continue
+            try:
+                (iPID, iStatus) = os.waitpid(oProcess.pid, os.WNOHANG)
+            except ChildProcessError:
+                (iPID, iStatus) = (oProcess.pid, 0)
+            if not iPID:
+                continue
+            self.__forward(oProcess, True)
+            oProcess.pid = None
+            if self.__bStop:
+                continue
+            fNow = time.monotonic()
+            if fNow-oProcess.started>SHARDER_RESPAWN_DELAY_MAX:
+                oProcess.delay = SHARDER_RESPAWN_DELAY
+            self.__oDaemon.log('ERROR[Sharder(%d)]: Worker process exited (code:%d); respawning in %.1fs...\n' % (oProcess.index, os.waitstatus_to_exitcode(iStatus), oProcess.delay))
+            oProcess.respawn = fNow+oProcess.delay
+            oProcess.delay = min(2*oProcess.delay, SHARDER_RESPAWN_DELAY_MAX)
+
+
+    def running(self):
+        """
+        Return the count of running worker processes.
+        """
+
+        return len([oProcess for oProcess in self.__loProcesses if oProcess.pid is not None])
+
+
+    def start(self):
+        """
+        Spawn all worker processes.
+        """
+
+        for oProcess in self.__loProcesses:
+            self.__spawn(oProcess)
+
+
+    def poll(self, _fTimeout):
+        """
+        Forward worker processes logs (for up to the given timeout), reap exited
+        worker processes and respawn them when due.
+
+        @param  float  _fTimeout  Timeout, in seconds
+        """
+
+        fEndTime = time.monotonic()+_fTimeout
+        while True:
+            fRemaining = fEndTime-time.monotonic()
+            if fRemaining<=0.0 or self.__bStop:
+                break
+            if not self.__oSelector.get_map():
+                time.sleep(fRemaining)
+                break
+            for (oKey, _) in self.__oSelector.select(fRemaining):
+                self.__forward(oKey.data)
+            self.__reap()
+        self.__reap()
+        if self.__bStop:
+            return
+        fNow = time.monotonic()
+        for oProcess in self.__loProcesses:
+            if oProcess.pid is None and oProcess.respawn<=fNow:
+                self.__spawn(oProcess)
+
+
+    def signal(self, _iSignal):
+        """
+        Send the given signal to all (running) worker processes.
+
+        @param  int  _iSignal  Signal
+        """
+
+        for oProcess in self.__loProcesses:
+            if oProcess.pid is not None:
+                try:
+                    os.kill(oProcess.pid, _iSignal)
+                except OSError:
+                    pass
+
+
+    def stop(self, _fTimeout):
+        """
+        Stop all worker processes (SIGTERM), waiting for them up to the given
+        timeout (before killing them; SIGKILL).
+
+        @param  float  _fTimeout  Timeout, in seconds
+        """
+
+        self.__bStop = True
+        self.signal(signal.SIGTERM)
+        fEndTime = time.monotonic()+_fTimeout
+        while self.running():
+            fRemaining = fEndTime-time.monotonic()
+            if fRemaining<=0.0:
+                for oProcess in self.__loProcesses:
+                    if oProcess.pid is not None:
+                        self.__oDaemon.log('ERROR[Sharder(%d)]: Worker process failed to terminate in time; killing\n' % oProcess.index)
+                self.signal(signal.SIGKILL)
+                fEndTime = time.monotonic()+_fTimeout
+                continue
+            for (oKey, _) in self.__oSelector.select(min(fRemaining, 0.1)):
+                self.__forward(oKey.data)
+            self.__reap()
+        for oProcess in self.__loProcesses:
+            if oProcess.pipe is not None:
+                self.__forward(oProcess, True)
+        self.__oSelector.close()
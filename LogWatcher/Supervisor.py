@@ -0,0 +1,392 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from collections import deque
+import os
+import random
+import selectors
+import threading
+import time
+import traceback
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Watcher states
+SUPERVISOR_RUNNING = 'running'
+SUPERVISOR_BACKOFF = 'backoff'
+SUPERVISOR_FAILED = 'failed'
+SUPERVISOR_STOPPED = 'stopped'
+
+# Watcher respawn delay (initial/maximum), in seconds
+SUPERVISOR_RESPAWN_DELAY = 1.0
+SUPERVISOR_RESPAWN_DELAY_MAX = 60.0
+
+# Watcher respawn delay jitter (fraction of the delay)
+SUPERVISOR_RESPAWN_JITTER = 0.5
+
+# Watchers stop timeout, in seconds
+SUPERVISOR_STOP_TIMEOUT = 12.0
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class SupervisorWatcher:
+    """
+    Supervised Watcher State.
+
+    This class/object holds the supervision state of each watcher.
+    """
+
+    __slots__ = ('watcher', 'scheduled', 'state', 'thread', 'started', 'delay', 'respawn', 'respawns')
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oWatcher, _bScheduled):
+        """
+        Constructor.
+
+        @param  Watcher  _oWatcher    Watcher
+        @param  bool     _bScheduled  Watcher run by the event loop scheduler (rather than its own thread)
+        """
+
+        # Fields
+        self.watcher = _oWatcher
+        self.scheduled = _bScheduled
+        self.state = SUPERVISOR_STOPPED
+        self.thread = None
+        self.started = 0.0
+        self.delay = SUPERVISOR_RESPAWN_DELAY
+        self.respawn = 0.0
+        self.respawns = 0
+
+
+class Supervisor:
+    """
+    Log Watcher Supervisor.
+
+    This class/object starts the watchers - in their own thread or along the
+    event loop scheduler - and supervises them:
+     - watchers report their exit (rather than being polled for)
+     - watchers which exit on error are respawned - if configured so - with
+       capped exponential back-off (and jitter, such as watchers failing on
+       the same cause do not all respawn at once); others are marked failed
+     - watchers are stopped all at once, the supervisor then waiting for all
+       of them up to a single (shared) timeout
+
+    Each watcher thus goes through the following states: running, backoff
+    (waiting to be respawned), failed or stopped.
+
+    The watchers statistics are logged by the supervisor loop, upon request
+    (see statistics()), such as they may safely be requested from a signal
+    handler.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _oDaemon):
+        """
+        Constructor.
+
+        @param  Daemon  _oDaemon  Parent daemon
+        """
+
+        # Fields
+        self.__oDaemon = _oDaemon
+        self.__loWatchers = []
+        self.__dWatchers = {}
+        self.__dqEvents = deque()
+        self.__oSelector = None
+        self.__iWakeRead = None
+        self.__iWakeWrite = None
+        self.__bStop = False
+        self.__bStatistics = False
+        self.__bDebug = _oDaemon.debug()
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def add(self, _oWatcher, _bScheduled):
+        """
+        Add the given watcher to the supervisor.
+
+        @param  Watcher  _oWatcher    Watcher
+        @param  bool     _bScheduled  Watcher run by the event loop scheduler (rather than its own thread)
+        """
+
+        oWatcher = SupervisorWatcher(_oWatcher, _bScheduled)
+        self.__loWatchers.append(oWatcher)
+        self.__dWatchers[_oWatcher] = oWatcher
+
+
+    def __run(self, _oWatcher):
+        """
+        Watcher thread: run the watcher and report its exit.
+
+        @param  SupervisorWatcher  _oWatcher  Watcher
+        """
+
+        bRespawn = False
+        try:
+            bRespawn = _oWatcher.watcher.run()
+        except Exception as e:
+            self.__oDaemon.log('ERROR[Supervisor(%s)]: Watcher error\n%s\n' % (_oWatcher.watcher.name(), str(e)))
+            if self.__bDebug:
+                traceback.print_exc()
+        finally:
+            self.exited(_oWatcher.watcher, bRespawn)
+
+
+    def __spawn(self, _oWatcher):
+        """
+        (Re)start the given watcher.
+
+        @param  SupervisorWatcher  _oWatcher  Watcher
+        """
+
+        _oWatcher.state = SUPERVISOR_RUNNING
+        _oWatcher.started = time.monotonic()
+        if _oWatcher.scheduled:
+            if _oWatcher.respawns:
+                self.__oDaemon.scheduler().resume(_oWatcher.watcher)
+            return
+        _oWatcher.thread = threading.Thread(name='%s.Watcher' % _oWatcher.watcher.name(), target=self.__run, args=[_oWatcher])
+        _oWatcher.thread.start()
+        if self.__bDebug:
+            self.__oDaemon.log('DEBUG[Supervisor(%s)]: Watcher thread started\n' % _oWatcher.watcher.name())
+
+
+    def __handle(self):
+        """
+        Handle the watchers exit events (and schedule their respawn).
+        """
+
+        while self.__dqEvents:
+            (oWatcher, bRespawn) = self.__dqEvents.popleft()
+            oWatcher = self.__dWatchers[oWatcher]
+            oWatcher.thread = None
+            if self.__bStop:
+                oWatcher.state = SUPERVISOR_STOPPED
+                if self.__bDebug:
+                    self.__oDaemon.log('DEBUG[Supervisor(%s)]: Watcher stopped\n' % oWatcher.watcher.name())
+                continue
+            if not bRespawn:
+                oWatcher.state = SUPERVISOR_FAILED
+                self.__oDaemon.log('WARNING[Supervisor]: Only %d/%d watchers are running\n' % (self.running(), len(self.__loWatchers)))
+                continue
+            fNow = time.monotonic()
+            if fNow-oWatcher.started>SUPERVISOR_RESPAWN_DELAY_MAX:
+                oWatcher.delay = SUPERVISOR_RESPAWN_DELAY
+            fDelay = oWatcher.delay * random.uniform(1.0-SUPERVISOR_RESPAWN_JITTER, 1.0)
+            self.__oDaemon.log('INFO[Supervisor(%s)]: Respawning watcher in %.1fs...\n' % (oWatcher.watcher.name(), fDelay))
+            oWatcher.state = SUPERVISOR_BACKOFF
+            oWatcher.respawn = fNow+fDelay
+            oWatcher.delay = min(2*oWatcher.delay, SUPERVISOR_RESPAWN_DELAY_MAX)
+
+
+    def __wait(self, _fTimeout):
+        """
+        Wait for watchers exit events (or a wake-up), up to the given timeout.
+
+        @param  float  _fTimeout  Timeout, in seconds (None for no timeout)
+        """
+
+        if not self.__dqEvents:
+            self.__oSelector.select(max(0.0, _fTimeout) if _fTimeout is not None else None)
+        try:
+            while os.read(self.__iWakeRead, 4096): pass
+        except BlockingIOError:
+            pass
+        self.__handle()
+
+
+    def running(self):
+        """
+        Return the count of running watchers.
+        """
+
+        return len([oWatcher for oWatcher in self.__loWatchers if oWatcher.state==SUPERVISOR_RUNNING])
+
+
+    def state(self, _oWatcher):
+        """
+        Return the supervision state of the given watcher, as a statistics
+        dictionary.
+
+        @param  Watcher  _oWatcher  Watcher
+        """
+
+        oWatcher = self.__dWatchers[_oWatcher]
+        return {
+            'state': oWatcher.state,
+            'respawns': oWatcher.respawns,
+        }
+
+
+    def __statistics(self):
+        """
+        Log the statistics (counters) of all watchers.
+        """
+
+        for oWatcher in self.__loWatchers:
+            for (sPlugin, dStatistics) in oWatcher.watcher.statistics()+[('Supervisor', self.state(oWatcher.watcher))]:
+                self.__oDaemon.log('INFO[Watcher(%s)]: Statistics (%s): %s\n' % (
+                    oWatcher.watcher.name(),
+                    sPlugin,
+                    ', '.join(['%s=%s' % (sKey, dStatistics[sKey]) for sKey in sorted(dStatistics.keys())])
+                ))
+
+
+    def start(self):
+        """
+        Start all watchers.
+
+        NB: the event loop scheduler (if any) must be started beforehand.
+        """
+
+        self.__oSelector = selectors.DefaultSelector()
+        self.__iWakeRead, self.__iWakeWrite = os.pipe()
+        os.set_blocking(self.__iWakeRead, False)
+        os.set_blocking(self.__iWakeWrite, False)
+        self.__oSelector.register(self.__iWakeRead, selectors.EVENT_READ, None)
+        for oWatcher in self.__loWatchers:
+            self.__spawn(oWatcher)
+
+
+    def run(self):
+        """
+        Supervise the watchers.
+
+        This method will block until the supervisor is requested to stop (and
+        all watchers exited or the stop timeout elapsed) or no watchers are left
+        running (or waiting to be respawned).
+        """
+
+        # Supervise
+        while True:
+            if self.__bStop: break
+
+            # Statistics (when requested)
+            if self.__bStatistics:
+                self.__bStatistics = False
+                self.__statistics()
+
+            # Respawn watchers (when due)
+            fNow = time.monotonic()
+            fWait = None
+            for oWatcher in self.__loWatchers:
+                if oWatcher.state!=SUPERVISOR_BACKOFF:
+                    continue
+                if oWatcher.respawn<=fNow:
+                    oWatcher.respawns += 1
+                    self.__spawn(oWatcher)
+                    continue
+                fWait = oWatcher.respawn if fWait is None else min(fWait, oWatcher.respawn)
+
+            # Check watchers
+            if not [oWatcher for oWatcher in self.__loWatchers if oWatcher.state in (SUPERVISOR_RUNNING, SUPERVISOR_BACKOFF)]:
+                self.__oDaemon.log('ERROR[Supervisor]: No more watchers are running; exiting\n')
+                break
+
+            # Wait
+            self.__wait(fWait-time.monotonic() if fWait is not None else None)
+
+        # Stop (waiting for all watchers at once)
+        if self.__bStop:
+            fEndTime = time.monotonic()+SUPERVISOR_STOP_TIMEOUT
+            while True:
+                loWatchers = [oWatcher for oWatcher in self.__loWatchers if oWatcher.state==SUPERVISOR_RUNNING]
+                for oWatcher in self.__loWatchers:
+                    if oWatcher.state==SUPERVISOR_BACKOFF:
+                        oWatcher.state = SUPERVISOR_STOPPED
+                if not loWatchers:
+                    break
+                fRemaining = fEndTime-time.monotonic()
+                if fRemaining<=0.0:
+                    for oWatcher in loWatchers:
+                        self.__oDaemon.log('ERROR[Supervisor(%s)]: Watcher failed to terminate in time\n' % oWatcher.watcher.name())
+                    self.__oDaemon.log('ERROR[Supervisor]: Watchers failed to terminate in time; exiting ungracefully\n')
+                    break
+                if self.__bDebug:
+                    self.__oDaemon.log('DEBUG[Supervisor]: Stopping / Waiting for %d watchers to terminate\n' % len(loWatchers))
+                self.__wait(fRemaining)
+
+        # Done
+        self.__oSelector.close()
+
+
+    def exited(self, _oWatcher, _bRespawn):
+        """
+        [thread-safe] Report the given watcher exit.
+
+        @param  Watcher  _oWatcher  Watcher
+        @param  bool     _bRespawn  Whether the watcher must be respawned
+        """
+
+        self.__dqEvents.append((_oWatcher, _bRespawn))
+        self.wake()
+
+
+    def wake(self):
+        """
+        [thread-safe] Wake up the supervisor.
+        """
+
+        try:
+            os.write(self.__iWakeWrite, b'\0')
+        except (BlockingIOError, OSError, TypeError):
+            pass
+
+
+    def statistics(self):
+        """
+        [thread-safe] Request the statistics of all watchers to be logged (by the
+        supervisor loop).
+
+        NB: this method may be called from a signal handler.
+        """
+
+        self.__bStatistics = True
+        self.wake()
+
+
+    def stop(self):
+        """
+        [thread-safe] Stop all watchers (at once).
+        """
+
+        self.__bStop = True
+        for oWatcher in self.__loWatchers:
+            oWatcher.watcher.stop()
+        self.wake()
@@ -0,0 +1,145 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import re
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Header fields
+SYSLOGHEADER_FIELDS = ('timestamp', 'host', 'program', 'pid', 'message')
+
+# RFC3164 header: [<pri>]timestamp host [program[[pid]]:] message
+SYSLOGHEADER_RFC3164 = re.compile(
+    r'(?:<[0-9]{1,3}>)?'
+    r'([A-Z][a-z]{2} [ 0-9][0-9] [0-9]{2}:[0-9]{2}:[0-9]{2}|[0-9]{4}-[0-9]{2}-[0-9]{2}T[^ ]+) '
+    r'([^ ]+) '
+    r'(?:([^ :\[]+)(?:\[([^ \]]*)\])?: ?)?'
+    r'(.*)',
+    re.DOTALL
+)
+
+# RFC5424 header: [<pri>]1 timestamp host program pid msgid structured-data message
+SYSLOGHEADER_RFC5424 = re.compile(
+    r'(?:<[0-9]{1,3}>)?1 ([^ ]+) ([^ ]+) ([^ ]+) ([^ ]+) [^ ]+ (.*)',
+    re.DOTALL
+)
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class SyslogHeader:
+    """
+    Syslog Header Parser.
+
+    This class parses the header of syslog messages - with a single (anchored)
+    regular expression - in the following formats:
+     - RFC3164 (BSD syslog), as written to log files: 'Jan  1 00:00:00 host
+       program[pid]: message'; the timestamp may also be in RFC3339 format
+       (e.g. rsyslog high-precision timestamps)
+     - RFC5424: '1 2016-01-01T00:00:00Z host program pid msgid [sd] message'
+    optionally prefixed with a priority (e.g. '<13>'), as received over the
+    network.
+
+    The parsed header is returned as a (timestamp, host, program, pid, message)
+    tuple, fields which are missing (or nil) being None.
+    """
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    @staticmethod
+    def __structured(_sData):
+        """
+        Return the message following the given RFC5424 structured data.
+
+        @param  string  _sData  Structured data and message
+        """
+
+        i = 0
+        if _sData[:1]=='-':
+            i = 1
+        else:
+            while _sData[i:i+1]=='[':
+                j = i+1
+                while True:
+                    j = _sData.find(']', j)
+                    if j<0:
+                        return ''
+                    if _sData[j-1]!='\\':
+                        break
+                    j += 1
+                i = j+1
+        if _sData[i:i+1]==' ':
+            i += 1
+        if _sData[i:i+1]=='\ufeff':
+            i += 1
+        return _sData[i:]
+
+
+    @staticmethod
+    def parse(_sData):
+        """
+        Return the given syslog message header, as a (timestamp, host, program,
+        pid, message) tuple (None if the message has no valid header).
+
+        @param  string  _sData  Syslog message (line)
+        """
+
+        # RFC3164
+        oMatch = SYSLOGHEADER_RFC3164.match(_sData)
+        if oMatch is not None:
+            return oMatch.groups()
+
+        # RFC5424
+        oMatch = SYSLOGHEADER_RFC5424.match(_sData)
+        if oMatch is not None:
+            return tuple([None if sField=='-' else sField for sField in oMatch.groups()[:4]]) \
+                + (SyslogHeader.__structured(oMatch.group(5)),)
+
+        return None
+
+
+    @staticmethod
+    def program(_sData):
+        """
+        Return the program (tag) of the given syslog message (None if the
+        message has no valid header or tag).
+
+        @param  string  _sData  Syslog message (line)
+        """
+
+        oMatch = SYSLOGHEADER_RFC3164.match(_sData)
+        if oMatch is not None:
+            return oMatch.group(3)
+        oMatch = SYSLOGHEADER_RFC5424.match(_sData)
+        if oMatch is not None and oMatch.group(3)!='-':
+            return oMatch.group(3)
+        return None
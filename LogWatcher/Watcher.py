@@ -27,8 +27,10 @@ import traceback
 
 # LogWatcher
 from .Data import Data
+from .WatcherCache import WatcherCache
 from .Producers import Producer
 from .Filters import Filter
+from .Filters.FilterMatcher import FilterMatcher
 from .Conditioners import Conditioner
 from .Consumers import Consumer
 
@@ -48,11 +50,16 @@ class Watcher:
 
     Once started, the watcher will in turn start the producer, which will feed its
     output back to it.
-    Each output is then fed to the configured filters, each in turn.
+    Each output is then fed to the configured filters, each in turn (consecutive
+    regular expression filters being fused into a single matcher).
     The first matching filter will then return a fully populated data object.
     That data object is then fed to the conditioners, each in turn.
     If a conditioner returns no data (None), further processing is interrupted.
     Otherwise, the resulting data object is eventually fed to the consumers.
+
+    The result of the filters/conditioners chain may be memoized per producer
+    data (line) and source, such as repeated identical data are not processed
+    again (see WatcherCache), unless any filter or conditioner is stateful.
     """
 
     #------------------------------------------------------------------------------
@@ -76,8 +83,15 @@ class Watcher:
         self.__bVerbose = _bVerbose
         self.__bRespawn = _bRespawn
         self.__oProducer = None
+        self.__oSpool = None
+        self.__oPartitioner = None
+        self.__oPrograms = None
+        self.__oCache = None
+        self.__bError = False
+        self.__iAcknowledged = 0
         self.__bFilter = False
         self.__loFilters = []
+        self.__loFiltersChain = None
         self.__bConditioner = False
         self.__loConditioners = []
         self.__loConsumers = []
@@ -85,6 +99,66 @@ class Watcher:
         self.__bDebug = _oDaemon.debug()
 
 
+    def setSpool(self, _oSpool):
+        """
+        Set the (non-blocking) data overflow spool.
+
+        NB: the spool must be set before the producer is instantiated.
+
+        @param  ProducerSpool  _oSpool  Data overflow spool
+        """
+
+        self.__oSpool = _oSpool
+
+
+    def setPartitioner(self, _oPartitioner):
+        """
+        Set the parallel filters/conditioners (worker processes) partitioner.
+
+        NB: the partitioner must be set once all filters and conditioners are added.
+
+        @param  Partitioner  _oPartitioner  Parallel filters/conditioners partitioner
+        """
+
+        self.__oPartitioner = _oPartitioner
+
+
+    def setPrograms(self, _lsPrograms):
+        """
+        Restrict the watcher to the data (lines) of the given syslog programs
+        (tags); data from other programs are discarded (or not even routed to
+        the watcher, by shared data sources) before being filtered.
+
+        NB: the programs must be set before the producer is instantiated.
+
+        @param  list  _lsPrograms  Syslog programs (tags)
+        """
+
+        self.__oPrograms = frozenset(_lsPrograms) if _lsPrograms else None
+
+
+    def setCache(self, _iSize, _fTTL):
+        """
+        Set the filters/conditioners chain memoization cache; returns whether the
+        cache is enabled (it is not if any filter or conditioner is stateful).
+
+        NB: the cache must be set once all filters and conditioners are added.
+
+        @param  int    _iSize  Maximum count of cached data (0 to disable the cache)
+        @param  float  _fTTL   Cached results time-to-live, in seconds (0 for no expiry)
+        """
+
+        self.__oCache = None
+        if _iSize<=0:
+            return False
+        for oPlugin in self.__loFilters+self.__loConditioners:
+            if oPlugin.stateful():
+                self.__oDaemon.log('WARNING[Watcher(%s)]: Stateful %s; disabling memoization cache\n' % (self.__sName, oPlugin.__class__.__name__))
+                return False
+        self.__oCache = WatcherCache(_iSize, _fTTL)
+        return True
+
+
     def setProducer(self, _oProducer):
         """
         Set the data producer.
@@ -108,6 +182,7 @@ class Watcher:
             raise RuntimeError('Filter is not a subclass of LogWatcher.Filters.Filter')
         self.__bFilter = True
         self.__loFilters.append(_oFilter)
+        self.__loFiltersChain = None
 
 
     def addConditioner(self, _oConditioner):
@@ -155,6 +230,33 @@ class Watcher:
         return self.__sName
 
 
+    def scheduler(self):
+        """
+        Return the daemon event loop scheduler (None if watchers run in their
+        own thread).
+        """
+
+        return self.__oDaemon.scheduler()
+
+
+    def programs(self):
+        """
+        Return the syslog programs (tags) the watcher is restricted to, as a set
+        (None for all programs).
+        """
+
+        return self.__oPrograms
+
+
+    def spool(self):
+        """
+        Return the (non-blocking) data overflow spool (None if data are to be
+        discarded on overflow).
+        """
+
+        return self.__oSpool
+
+
     def log(self, sMessage):
         """
         Log the given message.
@@ -163,14 +265,16 @@ class Watcher:
         self.__oDaemon.log(sMessage)
 
 
-    def feed(self, _sData):
+    def feed(self, _sData, _sSource=None, _fTime=None):
         """
         Feed the producer (raw) data (line) to the watcher.
 
         This method is to be called by the child producer as log data gets generated.
         The data MUST be fed line-by-line, without trailing newline character.
 
-        @param  string  _sData  Log data (line)
+        @param  string  _sData    Log data (line)
+        @param  string  _sSource  Data source (e.g. file path; optional)
+        @param  float   _fTime    Ingest time, as a UNIX timestamp (optional; default: now)
         """
 
         # Stop ?
@@ -178,13 +282,87 @@ class Watcher:
         if self.__bDebug:
             self.__oDaemon.log('DEBUG[Watcher(%s)]: Produced data\n%s\n' % (self.__sName, _sData))
 
+        # Parallel filters/conditioners (worker processes) ?
+        if self.__oPartitioner is not None:
+            self.__oPartitioner.feed(_sData, _sSource, _fTime)
+            return
+
+        # Filter/condition the data and feed it to the consumers
+        oData = self.process(_sData, _sSource, _fTime)
+        if oData is not None:
+            self.consume(oData)
+        self.__iAcknowledged += 1
+
+
+    def acknowledge(self, _iCount):
+        """
+        Acknowledge the given count of (producer) data as processed, when done
+        asynchronously (by the partitioner).
+
+        @param  int  _iCount  Count of data
+        """
+
+        self.__iAcknowledged += _iCount
+
+
+    def acknowledged(self):
+        """
+        Return the count of (producer) data processed - in order - by the watcher
+        (fed to its filters/conditioners and consumers, or dropped by its spool)
+        since it was started.
+        """
+
+        iAcknowledged = self.__iAcknowledged
+        if self.__oSpool is not None:
+            iAcknowledged += self.__oSpool.acknowledged()
+        return iAcknowledged
+
+
+    def process(self, _sData, _sSource=None, _fTime=None):
+        """
+        Feed the producer (raw) data (line) to the filters and conditioners;
+        returns the resulting data object (None if the data are filtered out).
+
+        @param  string  _sData    Log data (line)
+        @param  string  _sSource  Data source (e.g. file path; optional)
+        @param  float   _fTime    Ingest time, as a UNIX timestamp (optional; default: now)
+        """
+
+        # Memoization cache ?
+        if self.__oCache is None:
+            return self.__process(_sData, _sSource, _fTime)
+        (bHit, oData) = self.__oCache.get(_sData, _sSource, _fTime)
+        if bHit:
+            if self.__bDebug:
+                self.__oDaemon.log('DEBUG[Watcher(%s)]: Memoized data\n%s\n' % (self.__sName, oData.data if oData is not None else None))
+            return oData
+        self.__bError = False
+        oData = self.__process(_sData, _sSource, _fTime)
+        if not self.__bError:
+            self.__oCache.put(_sData, _sSource, oData)
+        return oData
+
+
+    def __process(self, _sData, _sSource, _fTime):
+        """
+        Feed the producer (raw) data (line) to the filters and conditioners;
+        returns the resulting data object (None if the data are filtered out).
+
+        @param  string  _sData    Log data (line)
+        @param  string  _sSource  Data source (e.g. file path)
+        @param  float   _fTime    Ingest time, as a UNIX timestamp (None for now)
+        """
+
         # Feed the data (string) to the filters (if any)
         oData = None
         if self.__bFilter:
-            for oFilter in self.__loFilters:
+            if self.__loFiltersChain is None:
+                self.__loFiltersChain = FilterMatcher.chain(self, self.__loFilters)
+            for oFilter in self.__loFiltersChain:
                 try:
                     oData = oFilter.feed(_sData)
                 except Exception as e:
+                    self.__bError = True
                     self.__oDaemon.log('ERROR[Watcher(%s)]: Filter error\n%s\n' % (self.__sName, str(e)))
                     if self.__bDebug:
                         traceback.print_exc()
@@ -193,13 +371,17 @@ class Watcher:
                     else:
                         self.__oDaemon.log('ERROR[Watcher(%s)]: Exiting\n' % self.__sName)
                         self.stop()
-                    return
+                    return None
                 if oData is not None:
                     break
             if oData is None:
-                return
+                return None
+            if _sSource is not None:
+                oData.source = _sSource
+            if _fTime is not None:
+                oData.time = _fTime
         else:
-            oData = Data(self.__sName, _sData, _sData)
+            oData = Data(self.__sName, _sData, _sData, _sSource, None, _fTime)
         if self.__bDebug:
             self.__oDaemon.log('DEBUG[Watcher(%s)]: Filtered data\n%s\n' % (self.__sName, oData.data))
 
@@ -209,6 +391,7 @@ class Watcher:
                 try:
                     oData = oConditioner.feed(oData)
                 except Exception as e:
+                    self.__bError = True
                     self.__oDaemon.log('ERROR[Watcher(%s)]: Conditioner error\n%s\n' % (self.__sName, str(e)))
                     if self.__bDebug:
                         traceback.print_exc()
@@ -217,18 +400,28 @@ class Watcher:
                     else:
                         self.__oDaemon.log('ERROR[Watcher(%s)]: Exiting\n' % self.__sName)
                         self.stop()
-                    return
+                    return None
                 if oData is None:
-                    return
+                    return None
             if self.__bDebug:
                 self.__oDaemon.log('DEBUG[Watcher(%s)]: Conditioned data\n%s\n' % (self.__sName, oData.data))
 
+        return oData
+
+
+    def consume(self, _oData):
+        """
+        Feed the (filtered/conditioned) data object to the consumers.
+
+        @param  Data  _oData  Log data object
+        """
+
         # Feed the data (object) to the consumers
         if self.__bVerbose:
-            self.__oDaemon.log('INFO[Watcher(%s)]: Data: %s\n' % (self.__sName, oData.data))
+            self.__oDaemon.log('INFO[Watcher(%s)]: Data: %s\n' % (self.__sName, _oData.data))
         for oConsumer in self.__loConsumers:
             try:
-                oConsumer.feed(oData)
+                oConsumer.feed(_oData)
             except Exception as e:
                 self.__oDaemon.log('ERROR[Watcher(%s)]: Consumer error\n%s\n' % (self.__sName, str(e)))
                 if self.__bDebug:
@@ -243,10 +436,11 @@ class Watcher:
 
     def run(self):
         """
-        Run the watcher.
+        Run the watcher (producer); returns whether it must be respawned (after
+        the producer terminated on error).
 
         This method will block until the parent daemon is requested to stop and
-        the child producer complies.
+        the child producer complies (or the producer terminates on error).
         """
 
         # Checks
@@ -256,23 +450,37 @@ class Watcher:
             raise RuntimeError('Watcher has no Consumer')
 
         # Run the producer
-        while True:
-            if self.__bStop: break
-            try:
-                self.__oProducer.run()
-                if not self.__bStop:
-                    self.__oDaemon.log('ERROR[Watcher(%s)]: Producer terminated without being stopped\n' % self.__sName)
-            except Exception as e:
-                self.__oDaemon.log('ERROR[Watcher(%s)]: Producer error\n%s\n' % (self.__sName, str(e)))
-                if self.__bDebug:
-                    traceback.print_exc()
-            if not self.__bStop:
-                if self.__bRespawn:
-                    self.__oDaemon.log('INFO[Watcher(%s)]: Respawning\n' % self.__sName)
-                    continue
-                else:
-                    self.__oDaemon.log('ERROR[Watcher(%s)]: Exiting\n' % self.__sName)
-            self.stop()
+        if self.__bStop:
+            return False
+        try:
+            self.__oProducer.run()
+        except Exception as e:
+            return self.respawn(e)
+        return self.respawn(None)
+
+
+    def respawn(self, _oException):
+        """
+        Report the producer termination (error); returns whether the producer
+        must be respawned (by the daemon supervisor, once its back-off delay
+        elapsed) or the watcher stopped.
+
+        @param  Exception  _oException  Producer error (None if the producer terminated without error)
+        """
+
+        if _oException is not None:
+            self.__oDaemon.log('ERROR[Watcher(%s)]: Producer error\n%s\n' % (self.__sName, str(_oException)))
+            if self.__bDebug:
+                traceback.print_exc()
+        elif not self.__bStop:
+            self.__oDaemon.log('ERROR[Watcher(%s)]: Producer terminated without being stopped\n' % self.__sName)
+        if self.__bStop:
+            return False
+        if self.__bRespawn:
+            return True
+        self.__oDaemon.log('ERROR[Watcher(%s)]: Exiting\n' % self.__sName)
+        self.stop()
+        return False
 
 
     def stop(self):
@@ -282,6 +490,45 @@ class Watcher:
 
         self.__bStop = True
         self.__oProducer.stop()
+        if self.__oPartitioner is not None:
+            self.__oPartitioner.stop()
+
+
+    def stopped(self):
+        """
+        Return whether the watcher is requested to stop.
+        """
+
+        return self.__bStop
+
+
+    def statistics(self):
+        """
+        Return the statistics (counters) of the watcher plugins, as a list of
+        (plugin, statistics dictionary) tuples.
+        """
+
+        ltStatistics = []
+        for (sType, loPlugins) in (
+            ('Producer', [self.__oProducer]),
+            ('Filter', self.__loFilters),
+            ('Conditioner', self.__loConditioners),
+            ('Consumer', self.__loConsumers),
+        ):
+            for oPlugin in loPlugins:
+                dStatistics = oPlugin.statistics()
+                if dStatistics:
+                    ltStatistics.append(('%s:%s' % (sType, oPlugin.__class__.__name__), dStatistics))
+        for oFilter in self.__loFiltersChain or []:
+            if isinstance(oFilter, FilterMatcher):
+                dStatistics = oFilter.statistics()
+                if dStatistics:
+                    ltStatistics.append(('Filter:FilterMatcher', dStatistics))
+        if self.__oCache is not None:
+            ltStatistics.append(('Cache', self.__oCache.statistics()))
+        if self.__oSpool is not None:
+            ltStatistics.append(('Spool', self.__oSpool.statistics()))
+        return ltStatistics
 
 
     def debug(self):
@@ -0,0 +1,131 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+from collections import OrderedDict
+import time
+
+# LogWatcher
+from .Data import Data
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class WatcherCache:
+    """
+    Watcher Memoization Cache.
+
+    This class/object caches - per producer (raw) data (line) and source - the
+    result of the watcher filters/conditioners chain (the resulting data object, or None
+    if the data were filtered out), such as repeated identical data are not
+    processed again.
+
+    The cache is bounded in size (least recently used data being evicted first)
+    and time (cached results expiring after the configured time-to-live).
+
+    Cached data objects are copied when returned (with their own ingest time).
+
+    NB: the cache must not be used if any filter or conditioner is stateful.
+    """
+
+    #------------------------------------------------------------------------------
+    # CONSTRUCTORS / DESTRUCTOR
+    #------------------------------------------------------------------------------
+
+    def __init__(self, _iSize, _fTTL):
+        """
+        Constructor.
+
+        @param  int    _iSize  Maximum count of cached data
+        @param  float  _fTTL   Cached results time-to-live, in seconds (0 for no expiry)
+        """
+
+        # Fields
+        self.__iSize = _iSize
+        self.__fTTL = _fTTL
+        self.__odCache = OrderedDict()
+        self.__iHits = 0
+        self.__iMisses = 0
+        self.__iExpired = 0
+
+
+    #------------------------------------------------------------------------------
+    # METHODS
+    #------------------------------------------------------------------------------
+
+    def get(self, _sData, _sSource=None, _fTime=None):
+        """
+        Return the cached result for the given producer (raw) data and source, as
+        a (hit, data object) tuple.
+
+        @param  string  _sData    Producer (raw) data (line)
+        @param  string  _sSource  Data source (e.g. file path; optional)
+        @param  float   _fTime    Ingest time, as a UNIX timestamp (optional; default: now)
+        """
+
+        tKey = (_sData, _sSource)
+        tCached = self.__odCache.get(tKey)
+        if tCached is None:
+            self.__iMisses += 1
+            return (False, None)
+        (fExpires, oData) = tCached
+        if fExpires<time.monotonic():
+            del self.__odCache[tKey]
+            self.__iExpired += 1
+            self.__iMisses += 1
+            return (False, None)
+        self.__odCache.move_to_end(tKey)
+        self.__iHits += 1
+        if oData is None:
+            return (True, None)
+        return (True, Data(oData.watcher, _sData, oData.data, _sSource, lambda: dict(oData.fields()), _fTime))
+
+
+    def put(self, _sData, _sSource, _oData):
+        """
+        Cache the result for the given producer (raw) data and source.
+
+        @param  string  _sData    Producer (raw) data (line)
+        @param  string  _sSource  Data source (e.g. file path)
+        @param  Data    _oData    Resulting data object (None if the data were filtered out)
+        """
+
+        self.__odCache[(_sData, _sSource)] = (time.monotonic()+self.__fTTL if self.__fTTL>0.0 else float('inf'), _oData)
+        if len(self.__odCache)>self.__iSize:
+            self.__odCache.popitem(last=False)
+
+
+    def statistics(self):
+        """
+        Return the cache statistics (counters), as a dictionary.
+        """
+
+        return {
+            'size': len(self.__odCache),
+            'hits': self.__iHits,
+            'misses': self.__iMisses,
+            'expired': self.__iExpired,
+        }
@@ -33,5 +33,12 @@ LOGWATCHER_CONFIGSPEC = 'logwatcherd.conf.spec'
 from .Data import Data
 from .Logger import Logger
 from .Plugin import Plugin
+from .RegExp import RegExp
+from .SyslogHeader import SyslogHeader
+from .Partitioner import Partitioner
+from .Scheduler import Scheduler
+from .Sharder import Sharder
+from .Supervisor import Supervisor
 from .Watcher import Watcher
+from .WatcherCache import WatcherCache
 from .Daemon import Daemon
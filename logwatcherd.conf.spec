@@ -2,14 +2,30 @@
 debug = boolean(default=False)
 delay = integer(min=0, max=300, default=0)
 includes = string_list(min=0, default=list())
+scheduler = option('thread', 'loop', default='thread')
+workers = integer(min=1, max=64, default=4)
+processes = integer(min=1, max=256, default=1)
+[[snippets]]
+__many__ = string(min=1)
 
 [__many__]
 enable = boolean(default=True)
 verbose = boolean(default=False)
 respawn = boolean(default=False)
+process = integer(min=-1, default=-1)
+weight = float(min=0.0, default=1.0)
+parallel = integer(min=1, max=256, default=1)
+cache = integer(min=0, default=0)
+cache_ttl = float(min=0.0, default=60.0)
+partition = string(default='')
 synchronous = boolean(default=True)
 blocking = boolean(default=True)
 timeout = float(min=0.001, max=60.0, default=5.0)
+overflow = option('discard', 'spool', default='discard')
+spool = string(min=1, default='/var/spool/logwatcherd')
+spool_memory = integer(min=1, default=1000)
+spool_disk = integer(min=1, default=64)
+program = string_list(min=0, default=list())
 producer = string(min=1)
 filters = string_list(min=0, default=list())
 conditioners = string_list(min=0, default=list())
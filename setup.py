@@ -31,15 +31,20 @@ Producers, filters, conditioners and consumers are all plugins. A set of basic
 plugins are provided as part of the Log Watcher Daemon codebase:
 
 Producer plugins:
- - "Read": dump the content of a given file (cat ...)
+ - "Read": dump the content of given (compressed) files (cat/zcat ...)
  - "Tail": watch content being added to a given file (tail -F ...)
+ - "Command": watch the output of a given command (journalctl -f ...)
+ - "Listen": receive syslog messages from a UDP, TCP or UNIX socket
 
 Filter plugins:
  - "Grep": match data based on a given regular expression
  - "Awk": match data field based on a given regular expression
+ - "Json": match JSON-lines data fields based on given conditions
+ - "Syslog": match data based on their syslog header (program, host)
 
 Conditioner plugins:
  - "Sed": match (and replace) data based on a given regular expression
+ - "Threshold": match data hit a given count of times within a time window
 
 Consumer plugins:
  - "Write": write or append data to a given file
@@ -0,0 +1,177 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+# LogWatcher
+from LogWatcher import Scheduler, Watcher
+from LogWatcher.Filters import Filter
+from LogWatcher.Consumers import Consumer
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestDaemon:
+    """
+    Minimal daemon (and supervisor), gathering the logged messages and the
+    watchers exits; along an event loop scheduler if workers are given.
+    """
+
+    __test__ = False  # NB: not a test case
+
+    def __init__(self, _iWorkers=0):
+        self.messages = []
+        self.exits = []
+        self.__oScheduler = Scheduler(self, _iWorkers) if _iWorkers else None
+
+    def log(self, _sMessage):
+        self.messages.append(_sMessage)
+
+    def debug(self):
+        return False
+
+    def scheduler(self):
+        return self.__oScheduler
+
+    def supervisor(self):
+        return self
+
+    def exited(self, _oWatcher, _bRespawn):
+        self.exits.append(_oWatcher.name())
+
+
+class TestFilter(Filter):
+    """
+    Pass-through filter, optionally slowed down (delay=<seconds>).
+    """
+
+    def __init__(self, _oWatcher, _sConfiguration=''):
+        Filter.__init__(self, _oWatcher, _sConfiguration)
+        self.__fDelay = float(_sConfiguration[6:]) if _sConfiguration.startswith('delay=') else 0.0
+
+    def feed(self, _sData):
+        if self.__fDelay:
+            time.sleep(self.__fDelay)
+        return Filter.feed(self, _sData)
+
+
+class TestConsumer(Consumer):
+    """
+    Consumer gathering the consumed data (thread-safe).
+    """
+
+    def __init__(self, _oWatcher, _sConfiguration=''):
+        Consumer.__init__(self, _oWatcher, _sConfiguration)
+        self.data = []
+        self.__oCondition = threading.Condition()
+
+    def feed(self, _oData):
+        with self.__oCondition:
+            self.data.append(_oData.data)
+            self.__oCondition.notify_all()
+
+    def wait(self, _iCount, _fTimeout=10.0):
+        """
+        Wait for the given count of data to be consumed; returns the consumed data.
+        """
+
+        fEndTime = time.monotonic()+_fTimeout
+        with self.__oCondition:
+            while len(self.data)<_iCount:
+                fRemaining = fEndTime-time.monotonic()
+                if fRemaining<=0.0:
+                    break
+                self.__oCondition.wait(fRemaining)
+            return list(self.data)
+
+
+#------------------------------------------------------------------------------
+# METHODS
+#------------------------------------------------------------------------------
+
+def watcher(_sFilter=None, _oDaemon=None, _sName='test'):
+    """
+    Return a (watcher, consumer) tuple, the watcher having the given (test)
+    filter configuration (if any) and a gathering consumer.
+    """
+
+    oWatcher = Watcher(_oDaemon or TestDaemon(), _sName, False, False)
+    if _sFilter is not None:
+        oWatcher.addFilter(TestFilter(oWatcher, _sFilter))
+    oConsumer = TestConsumer(oWatcher)
+    oWatcher.addConsumer(oConsumer)
+    return (oWatcher, oConsumer)
+
+
+class FileTestCase(unittest.TestCase):
+    """
+    Test case using a (temporary) directory.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='logwatcherd-test-')
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def path(self, _sName):
+        return os.path.join(self.directory, _sName)
+
+    def write(self, _sName, _sData, _sMode='a'):
+        with open(self.path(_sName), _sMode) as oFile:
+            oFile.write(_sData)
+
+
+class Follower:
+    """
+    Follow a (Tail) reader from a thread, gathering the fed lines.
+    """
+
+    def __init__(self, _oReader, _oProducer=None):
+        self.reader = _oReader
+        self.lines = []
+        self.producer = _oProducer
+        self.__bStop = False
+        self.__oThread = threading.Thread(target=_oReader.follow, args=[self.feed, self.stopped], daemon=True)
+        self.__oThread.start()
+
+    def feed(self, _sData, _sSource=None):
+        self.lines.append(_sData)
+        if self.producer is not None:
+            self.producer.feed(_sData)
+
+    def stopped(self):
+        return self.__bStop
+
+    def stop(self):
+        self.__bStop = True
+        self.reader.wake()
+        self.__oThread.join(10.0)
+        return self.lines
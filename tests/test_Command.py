@@ -0,0 +1,61 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import threading
+import time
+import unittest
+import urllib.parse
+
+# LogWatcher
+from LogWatcher.Producers.Command import Command
+from tests import TestDaemon, watcher
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestCommand(unittest.TestCase):
+
+    def test_stop_stubborn(self):
+        oDaemon = TestDaemon()
+        (oWatcher, oConsumer) = watcher(None, oDaemon)
+        sCommand = 'sh -c \'trap "" TERM; echo started; while :; do sleep 0.05; done\''
+        oProducer = Command(oWatcher, urllib.parse.urlencode({'command': sCommand, 'kill_timeout': 1.0}), True, True, 1.0)
+        oThread = threading.Thread(target=oProducer.run, daemon=True)
+        oThread.start()
+        self.assertEqual(oConsumer.wait(1), ['started'])
+
+        # Stopping must not wait for a command ignoring SIGTERM (up to the kill timeout)
+        fStart = time.monotonic()
+        oProducer.stop()
+        oThread.join(10.0)
+        self.assertLess(time.monotonic()-fStart, 0.5)
+
+        # ... which must nonetheless be killed
+        fEndTime = time.monotonic()+10.0
+        while not [s for s in oDaemon.messages if 'killing it' in s] and time.monotonic()<fEndTime:
+            time.sleep(0.01)
+        self.assertEqual(len([s for s in oDaemon.messages if 'killing it' in s]), 1)
@@ -0,0 +1,64 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import unittest
+
+# LogWatcher
+from LogWatcher.Producers.LineBuffer import LineBuffer
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestLineBuffer(unittest.TestCase):
+
+    def test_lines(self):
+        oLineBuffer = LineBuffer()
+        self.assertEqual(oLineBuffer.feed(b'a1\na2\na'), ['a1', 'a2'])
+        self.assertEqual(oLineBuffer.pending(), 1)
+        self.assertEqual(oLineBuffer.feed(bytearray(b'3\na4xxx'), 4), ['a3'])
+        self.assertEqual(oLineBuffer.flush(), ['a4'])
+
+
+    def test_maxlength_bytes(self):
+        # Maximum length is measured in bytes (before decoding)
+        oLineBuffer = LineBuffer(4)
+        self.assertEqual(oLineBuffer.feed('ééé\nab\n'.encode('utf-8')), ['éé', 'ab'])
+        self.assertEqual(oLineBuffer.feed('é'.encode('utf-8')), [])
+        self.assertEqual(oLineBuffer.feed('éé\n'.encode('utf-8')), ['éé'])
+        self.assertEqual(oLineBuffer.truncated(), 2)
+
+
+    def test_pending_discard(self):
+        # Data are pending until the next line boundary, including the discarded remainder of truncated lines
+        oLineBuffer = LineBuffer(4)
+        self.assertEqual(oLineBuffer.feed(b'a1\nabcdefgh'), ['a1', 'abcd'])
+        self.assertEqual(oLineBuffer.pending(), 8)
+        self.assertEqual(oLineBuffer.feed(b'ij'), [])
+        self.assertEqual(oLineBuffer.pending(), 10)
+        self.assertEqual(oLineBuffer.feed(b'kl\nb'), [])
+        self.assertEqual(oLineBuffer.pending(), 1)
+        self.assertEqual(oLineBuffer.truncated(), 1)
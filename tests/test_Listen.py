@@ -0,0 +1,140 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import socket
+import threading
+import time
+
+# LogWatcher
+from LogWatcher.Producers.Listen import Listen
+from tests import FileTestCase, watcher
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Time between partial writes, in seconds
+TEST_PAUSE = 0.05
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestListen(FileTestCase):
+
+    def __port(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as oSocket:
+            oSocket.bind(('127.0.0.1', 0))
+            return oSocket.getsockname()[1]
+
+
+    def __listen(self, _sConfiguration):
+        """
+        Start a (synchronous) Listen producer with the given configuration; returns
+        a (producer, consumer) tuple.
+        """
+
+        (oWatcher, oConsumer) = watcher()
+        oProducer = Listen(oWatcher, _sConfiguration, True, True, 1.0)
+        oThread = threading.Thread(target=oProducer.run, daemon=True)
+        oThread.start()
+        self.addCleanup(oThread.join, 10.0)
+        self.addCleanup(oProducer.stop)
+        return (oProducer, oConsumer)
+
+
+    def __connect(self, _iPort):
+        fEndTime = time.monotonic()+10.0
+        while True:
+            try:
+                return socket.create_connection(('127.0.0.1', _iPort), 1.0)
+            except ConnectionRefusedError:
+                if time.monotonic()>fEndTime:
+                    raise
+                time.sleep(0.01)
+
+
+    def test_tcp_framing(self):
+        iPort = self.__port()
+        (oProducer, oConsumer) = self.__listen('tcp=127.0.0.1:%d&maxline=8' % iPort)
+        with self.__connect(iPort) as oSocket:
+            # Octet-counting and newline framing, split across reads
+            for bData in (b'2 a1', b'2 a', b'2a3\n', b'a', b'4\n', b'12 abcdefgh', b'ijkl', b'b1\n'):
+                oSocket.sendall(bData)
+                time.sleep(TEST_PAUSE)
+
+            # Oversize newline-framed message (remainder discarded)
+            oSocket.sendall(b'abcdefghijkl\nb2\n')
+            oSocket.sendall(b'trailing')
+        self.assertEqual(oConsumer.wait(9), ['a1', 'a2', 'a3', 'a4', 'abcdefgh', 'b1', 'abcdefgh', 'b2', 'trailing'])
+        fEndTime = time.monotonic()+10.0
+        while oProducer.statistics()['clients'] and time.monotonic()<fEndTime:
+            time.sleep(0.01)
+        self.assertEqual(oProducer.statistics()['truncated'], 2)
+        self.assertEqual(oProducer.statistics()['clients'], 0)
+
+
+    def test_udp_truncation(self):
+        iPort = self.__port()
+        (oProducer, oConsumer) = self.__listen('udp=127.0.0.1:%d&maxline=8' % iPort)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as oSocket:
+            while not oConsumer.data:
+                oSocket.sendto(b'ping', ('127.0.0.1', iPort))
+                oConsumer.wait(1, 0.05)
+            oSocket.sendto(b'abcdefghijkl', ('127.0.0.1', iPort))
+            oSocket.sendto(b'u1', ('127.0.0.1', iPort))
+            fEndTime = time.monotonic()+10.0
+            while 'u1' not in oConsumer.data and time.monotonic()<fEndTime:
+                oConsumer.wait(len(oConsumer.data)+1, 0.05)
+        self.assertEqual([s for s in oConsumer.data if s!='ping'], ['abcdefgh', 'u1'])
+        self.assertEqual(oProducer.statistics()['truncated'], 1)
+
+
+    def test_unix_cleanup(self):
+        sPath = self.path('log')
+
+        # Stale socket file (e.g. left over by a crash) must be replaced
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as oSocket:
+            oSocket.bind(sPath)
+        (oProducer, oConsumer) = self.__listen('unix=%s' % sPath)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as oSocket:
+            fEndTime = time.monotonic()+10.0
+            while not oConsumer.data and time.monotonic()<fEndTime:
+                try:
+                    oSocket.sendto(b'x1', sPath)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    pass
+                oConsumer.wait(1, 0.05)
+        self.assertEqual(oConsumer.data[0], 'x1')
+
+        # Socket file must be removed on stop
+        oProducer.stop()
+        fEndTime = time.monotonic()+10.0
+        while os.path.exists(sPath) and time.monotonic()<fEndTime:
+            time.sleep(0.01)
+        self.assertFalse(os.path.exists(sPath))
@@ -0,0 +1,88 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import threading
+import time
+import unittest
+from unittest import mock
+
+# LogWatcher
+from LogWatcher import Partitioner
+from tests import watcher
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Time allowing partial batches to linger (and be dispatched by the merging thread)
+PARTITIONER_LINGER_WAIT = 0.06
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestPartitioner(unittest.TestCase):
+
+    def __partitioner(self, _iProcesses, _sFilter, _sPartition=None):
+        (oWatcher, oConsumer) = watcher(_sFilter)
+        oPartitioner = Partitioner(oWatcher, _iProcesses, _sPartition)
+        oWatcher.setPartitioner(oPartitioner)
+        oPartitioner.fork()
+        oPartitioner.start()
+        self.addCleanup(oPartitioner.stop)
+        return (oWatcher, oPartitioner, oConsumer)
+
+
+    def test_order(self):
+        (oWatcher, _, oConsumer) = self.__partitioner(3, '', r'key(\d)')
+        lsLines = ['key%d line%d' % (i % 5, i) for i in range(2000)]
+        for sLine in lsLines:
+            oWatcher.feed(sLine, 'test')
+        self.assertEqual(oConsumer.wait(len(lsLines)), lsLines)
+        fEndTime = time.monotonic()+5.0
+        while oWatcher.acknowledged()<len(lsLines) and time.monotonic()<fEndTime:
+            time.sleep(0.01)
+        self.assertEqual(oWatcher.acknowledged(), len(lsLines))
+
+
+    @mock.patch('LogWatcher.Partitioner.PARTITIONER_INFLIGHT', 1)
+    @mock.patch('LogWatcher.Partitioner.PARTITIONER_BATCH', 4)
+    def test_inflight_saturated(self):
+        # Slow workers and partial batches: the merging thread must dispatch
+        # lingering batches without waiting for in-flight room
+        (oWatcher, _, oConsumer) = self.__partitioner(2, 'delay=0.05')
+        lsLines = ['line%d.%d' % (i, j) for i in range(5) for j in range(10)]
+
+        def fnFeed():
+            for i in range(0, len(lsLines), 10):
+                for sLine in lsLines[i:i+10]:
+                    oWatcher.feed(sLine, 'test')
+                time.sleep(PARTITIONER_LINGER_WAIT)
+
+        # NB: feed from a (daemon) thread, such as a deadlock fails the test (rather than hang it)
+        threading.Thread(target=fnFeed, daemon=True).start()
+        self.assertEqual(oConsumer.wait(len(lsLines), 15.0), lsLines)
@@ -0,0 +1,123 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import threading
+
+# LogWatcher
+from LogWatcher import Scheduler
+from LogWatcher.Producers import Producer
+from LogWatcher.Producers.ProducerSpool import ProducerSpool
+from tests import FileTestCase, TestDaemon, watcher
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestSpool:
+    """
+    Overflow spool stand-in, whose writes block until released.
+    """
+
+    __test__ = False  # NB: not a test case
+
+    def __init__(self):
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def memory(self):
+        return 1
+
+    def pending(self):
+        return True
+
+    def put(self, _sData, _sSource, _fTime=None):
+        self.writing.set()
+        self.release.wait(10.0)
+        return True
+
+
+class TestProducer(Producer):
+    """
+    Producer (routine) feeding the given lines, non-blocking.
+    """
+
+    __test__ = False  # NB: not a test case
+
+    def __init__(self, _oWatcher, _lsLines):
+        Producer.__init__(self, _oWatcher, '', False, False, 0.005)
+        self.__lsLines = _lsLines
+
+    def routine(self):
+        for sLine in self.__lsLines:
+            self._feed(sLine)
+        while True:
+            yield ([], 1.0)
+
+
+class TestScheduler(FileTestCase):
+
+    def test_spool_unlocked(self):
+        oDaemon = TestDaemon()
+        oScheduler = Scheduler(oDaemon, 1)
+        oSpool = TestSpool()
+        (oWatcherSpooled, _) = watcher(None, oDaemon, 'spooled')
+        oWatcherSpooled.setSpool(oSpool)
+        oProducerSpooled = object()
+        oScheduler.add(oWatcherSpooled, oProducerSpooled, False, False, 1.0)
+        (oWatcher, _) = watcher(None, oDaemon)
+        oProducer = object()
+        oScheduler.add(oWatcher, oProducer, False, True, 1.0)
+
+        # Spool writes must not hold back other producers
+        oThread = threading.Thread(target=oScheduler.feed, args=[oProducerSpooled, 'a1', None], daemon=True)
+        oThread.start()
+        self.assertTrue(oSpool.writing.wait(10.0))
+        oThreadOther = threading.Thread(target=oScheduler.feed, args=[oProducer, 'b1', None], daemon=True)
+        oThreadOther.start()
+        oThreadOther.join(1.0)
+        bBlocked = oThreadOther.is_alive()
+        oSpool.release.set()
+        oThread.join(10.0)
+        oThreadOther.join(10.0)
+        self.assertFalse(bBlocked)
+
+
+    def test_spool_order(self):
+        oDaemon = TestDaemon(2)
+        oScheduler = oDaemon.scheduler()
+        (oWatcher, oConsumer) = watcher('delay=0.001', oDaemon)
+        oSpool = ProducerSpool(oWatcher, self.path('spool'), 8, 1<<20)
+        oWatcher.setSpool(oSpool)
+        lsLines = ['a%d' % i for i in range(500)]
+        oProducer = TestProducer(oWatcher, lsLines)
+        oScheduler.add(oWatcher, oProducer, False, False, 0.005)
+        oScheduler.start()
+        self.addCleanup(oScheduler.stop)
+
+        # Data spilled to (and replayed from) the spool must be fed in order
+        self.assertEqual(oConsumer.wait(len(lsLines)), lsLines)
+        self.assertEqual(oProducer.fed(), len(lsLines))
+        self.assertGreater(oSpool.statistics()['spilled'], 0)
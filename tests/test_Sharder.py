@@ -0,0 +1,87 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+import sys
+import time
+from unittest import mock
+
+# LogWatcher
+from LogWatcher import Sharder
+from tests import FileTestCase, TestDaemon
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestSharder(FileTestCase):
+
+    def test_split(self):
+        ltWatchers = [
+            ('pinned', 'Tail?file=a', 1, 4.0),
+            ('heavy', 'Tail?file=b', -1, 3.0),
+            ('shared1', 'Tail?file=c', -1, 1.0),
+            ('shared2', 'Tail?file=c', -1, 1.0),
+            ('light', 'Tail?file=d', -1, 1.0),
+        ]
+        self.assertEqual(Sharder.split(ltWatchers, 2), [['heavy', 'shared1', 'shared2'], ['pinned', 'light']])
+
+
+    def __run(self, _iIndex, _lsWatchers):
+        """
+        Worker process: log (with an incomplete trailing line) and exit on first
+        spawn, then wait to be stopped.
+        """
+
+        sys.stderr.write('INFO[Test(%d)]: %s\nINFO[Test(%d)]: partial' % (_iIndex, ','.join(_lsWatchers), _iIndex))
+        sMarker = self.path('spawned.%d' % _iIndex)
+        if not os.path.exists(sMarker):
+            open(sMarker, 'w').close()
+            return 3
+        while True:
+            time.sleep(1.0)
+
+
+    def test_respawn(self):
+        oDaemon = TestDaemon()
+        with mock.patch('LogWatcher.Sharder.SHARDER_RESPAWN_DELAY', 0.05):
+            oSharder = Sharder(oDaemon, [['w1'], ['w2', 'w3']], self.__run)
+        oSharder.start()
+        try:
+            # Worker processes logs must be forwarded, and exited processes respawned
+            fEndTime = time.monotonic()+10.0
+            while time.monotonic()<fEndTime:
+                oSharder.poll(0.05)
+                # NB: the incomplete trailing line is only forwarded once the process exited
+                if len([s for s in oDaemon.messages if s.startswith('INFO[Test(') and 'partial' not in s])>=4 and oSharder.running()==2:
+                    break
+        finally:
+            oSharder.stop(5.0)
+        self.assertEqual(oSharder.running(), 0)
+        lsMessages = [s for s in oDaemon.messages if s.startswith('INFO[Test(')]
+        for sMessage in ('INFO[Test(0)]: w1\n', 'INFO[Test(0)]: partial\n', 'INFO[Test(1)]: w2,w3\n', 'INFO[Test(1)]: partial\n'):
+            self.assertEqual(lsMessages.count(sMessage), 2)
+        self.assertEqual(len([s for s in oDaemon.messages if 'Worker process exited (code:3)' in s]), 2)
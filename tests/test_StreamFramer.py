@@ -0,0 +1,76 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import unittest
+
+# LogWatcher
+from LogWatcher.Producers.StreamFramer import StreamFramer
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestStreamFramer(unittest.TestCase):
+
+    def test_framing(self):
+        oFramer = StreamFramer()
+        self.assertEqual(oFramer.feed(b'5 hello3 abcline1\nline2\n12 with\nnewline'), ['hello', 'abc', 'line1', 'line2', 'with\nnewline'])
+        self.assertEqual(oFramer.feed(b'2 ab\n'), ['ab'])
+
+
+    def test_partial(self):
+        oFramer = StreamFramer()
+        bData = b'11 octet-countline\n'
+        lsMessages = []
+        for i in range(len(bData)):
+            lsMessages += oFramer.feed(bData[i:i+1])
+        self.assertEqual(lsMessages, ['octet-count', 'line'])
+        self.assertEqual(oFramer.feed(b'trailing'), [])
+        self.assertEqual(oFramer.flush(), ['trailing'])
+
+
+    def test_buffer_length(self):
+        oFramer = StreamFramer()
+        baBuffer = bytearray(b'a1\na2\nxxxxx')
+        self.assertEqual(oFramer.feed(baBuffer, 6), ['a1', 'a2'])
+        self.assertEqual(oFramer.flush(), [])
+
+
+    def test_oversize_octet_counting(self):
+        oFramer = StreamFramer(4)
+        self.assertEqual(oFramer.feed(b'10 abcd'), ['abcd'])
+        self.assertEqual(oFramer.feed(b'efg'), [])
+        self.assertEqual(oFramer.feed(b'hij3 xyz'), ['xyz'])
+        self.assertEqual(oFramer.truncated(), 1)
+
+
+    def test_oversize_newline(self):
+        oFramer = StreamFramer(4)
+        self.assertEqual(oFramer.feed(b'abcdefgh'), ['abcd'])
+        self.assertEqual(oFramer.feed(b'ijkl'), [])
+        self.assertEqual(oFramer.feed(b'mn\nnext\n'), ['next'])
+        self.assertEqual(oFramer.feed(b'abcdefgh\nnext\n'), ['abcd', 'next'])
+        self.assertEqual(oFramer.truncated(), 2)
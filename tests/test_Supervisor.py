@@ -0,0 +1,95 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import threading
+import time
+import unittest
+
+# LogWatcher
+from LogWatcher import Supervisor
+from LogWatcher.Producers import Producer
+from tests import TestDaemon, watcher
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestIdleProducer(Producer):
+    """
+    Producer idling until stopped.
+    """
+
+    __test__ = False  # NB: not a test case
+
+    def __init__(self, _oWatcher):
+        Producer.__init__(self, _oWatcher, '', True, True, 1.0)
+
+    def run(self):
+        while not self._bStop:
+            time.sleep(0.01)
+
+
+class TestThreadDaemon(TestDaemon):
+    """
+    Minimal daemon, gathering the logged messages along the logging thread.
+    """
+
+    __test__ = False  # NB: not a test case
+
+    def __init__(self):
+        TestDaemon.__init__(self)
+        self.threads = []
+
+    def log(self, _sMessage):
+        TestDaemon.log(self, _sMessage)
+        self.threads.append(threading.current_thread())
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def test_statistics(self):
+        oDaemon = TestThreadDaemon()
+        oSupervisor = Supervisor(oDaemon)
+        for sName in ('w1', 'w2'):
+            (oWatcher, _) = watcher(None, oDaemon, sName)
+            oWatcher.setProducer(TestIdleProducer(oWatcher))
+            oSupervisor.add(oWatcher, False)
+        oSupervisor.start()
+        oThread = threading.Thread(target=oSupervisor.run, daemon=True)
+        oThread.start()
+        self.addCleanup(oThread.join, 10.0)
+        self.addCleanup(oSupervisor.stop)
+
+        # Statistics must be logged by the supervisor loop (rather than the requester)
+        oSupervisor.statistics()
+        fEndTime = time.monotonic()+10.0
+        while len([s for s in oDaemon.messages if 'Statistics (Supervisor)' in s])<2 and time.monotonic()<fEndTime:
+            time.sleep(0.01)
+        ltStatistics = [(oThreadLog, s) for (oThreadLog, s) in zip(oDaemon.threads, oDaemon.messages) if 'Statistics (Supervisor)' in s]
+        self.assertEqual(
+            ltStatistics,
+            [(oThread, 'INFO[Watcher(%s)]: Statistics (Supervisor): respawns=0, state=running\n' % s) for s in ('w1', 'w2')]
+        )
@@ -0,0 +1,92 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+
+# LogWatcher
+from LogWatcher.Producers.TailGlobReader import TailGlobReader
+from tests import FileTestCase, watcher
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestTailGlobReader(FileTestCase):
+
+    def __reader(self, _sPattern, _iMaxFiles=16):
+        """
+        Return a (polling) glob reader routine and its gathered lines; the routine
+        is driven explicitly (see __idle()), such as files can be changed between
+        two scans.
+        """
+
+        (oWatcher, _) = watcher()
+        oReader = TailGlobReader(oWatcher, self.path(_sPattern), 1.0, False, 1024, _iMaxFiles)
+        lsLines = []
+        oRoutine = oReader.routine(lambda _sData, _sSource: lsLines.append(_sData), lambda: False)
+        self.addCleanup(oRoutine.close)
+        return (oRoutine, lsLines)
+
+    def __idle(self, _oRoutine):
+        """
+        Drive the given routine until it waits for the next scan.
+        """
+
+        while next(_oRoutine)[1]==0:
+            pass
+
+
+    def test_renamed(self):
+        self.write('app', 'a1\n')
+        (oRoutine, lsLines) = self.__reader('app*')
+        self.__idle(oRoutine)
+        self.write('app', 'a2\n')
+        self.__idle(oRoutine)
+
+        # Rotate (to a matching path); the rotated file must not be read again
+        os.rename(self.path('app'), self.path('app.1'))
+        self.write('app.1', 'a3\n')
+        self.write('app', 'b1\n')
+        self.__idle(oRoutine)
+        self.assertEqual(sorted(lsLines), ['a2', 'a3', 'b1'])
+
+
+    def test_rotated_closed(self):
+        self.write('x.log', '')
+        self.write('y.log', '')
+        (oRoutine, lsLines) = self.__reader('*.log', 1)
+        self.__idle(oRoutine)
+        self.write('x.log', 'x1\n')
+        self.__idle(oRoutine)
+        self.write('y.log', 'y1\n')
+        self.__idle(oRoutine)  # NB: x.log gets closed (open files budget)
+
+        # Rotate (to a non-matching path) while closed; the rotated file must be drained
+        self.write('x.log', 'x2\n')
+        os.rename(self.path('x.log'), self.path('x.log.1'))
+        self.write('x.log', 'x3\n')
+        self.__idle(oRoutine)
+        self.assertEqual(lsLines, ['x1', 'y1', 'x2', 'x3'])
@@ -0,0 +1,192 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# Standard
+import os
+from queue import Empty
+import time
+
+# LogWatcher
+from LogWatcher.Producers.TailCheckpoint import TailCheckpoint
+from LogWatcher.Producers.TailReader import TailReader
+from tests import FileTestCase, Follower, watcher
+
+
+#------------------------------------------------------------------------------
+# CONSTANTS
+#------------------------------------------------------------------------------
+
+# Polling interval, in seconds
+TEST_INTERVAL = 0.02
+
+# Time allowing the reader to catch up, in seconds
+TEST_WAIT = 0.2
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestProducer:
+    """
+    Producer stand-in, processing (acknowledging) only the given count of data.
+    """
+
+    __test__ = False  # NB: not a test case
+
+    def __init__(self, _iProcessed):
+        self.__iFed = 0
+        self.__iProcessed = _iProcessed
+
+    def feed(self, _sData):
+        self.__iFed += 1
+
+    def fed(self):
+        return self.__iFed
+
+    def acknowledged(self):
+        return min(self.fed(), self.__iProcessed)
+
+
+class TestSubscriber:
+    """
+    Producer stand-in, subscribing to a shared reader.
+    """
+
+    __test__ = False  # NB: not a test case
+
+    def __init__(self, _bBlocking):
+        self.__bBlocking = _bBlocking
+
+    def programs(self):
+        return None
+
+    def blocking(self):
+        return self.__bBlocking
+
+
+class TestTailReaderShared(FileTestCase):
+
+    def __get(self, _oQueue, _iCount):
+        lsLines = []
+        try:
+            while len(lsLines)<_iCount:
+                lsLines.append(_oQueue.get(timeout=TEST_WAIT*5)[0])
+        except Empty:
+            pass
+        return lsLines
+
+
+    def test_lagging(self):
+        self.write('app', '')
+        (oWatcher, _) = watcher()
+        oReader = TailReader(oWatcher, self.path('app'), TEST_INTERVAL, False, 1024, None, 2)
+        oSubscriberFast = TestSubscriber(True)
+        oSubscriberSlow = TestSubscriber(False)
+        oQueueFast = oReader.subscribe(oSubscriberFast)
+        oQueueSlow = oReader.subscribe(oSubscriberSlow)
+        self.addCleanup(oReader.unsubscribe, oSubscriberSlow)
+        self.addCleanup(oReader.unsubscribe, oSubscriberFast)
+        time.sleep(TEST_WAIT)
+
+        # A (non-blocking) lagging subscriber must not hold back the others
+        self.write('app', ''.join(['a%d\n' % i for i in range(5)]))
+        self.assertEqual(self.__get(oQueueFast, 5), ['a%d' % i for i in range(5)])
+        self.assertEqual(self.__get(oQueueSlow, 5), ['a0', 'a1'])
+        self.assertEqual(oReader.statistics()['dropped'], 3)
+
+
+    def test_resubscribe(self):
+        self.write('app', '')
+        (oWatcher, _) = watcher()
+        oReader = TailReader(oWatcher, self.path('app'), TEST_INTERVAL, False, 1024)
+        oSubscriber = TestSubscriber(True)
+        for i in range(3):
+            oQueue = oReader.subscribe(oSubscriber)
+            time.sleep(TEST_WAIT)
+            self.write('app', 'a%d\n' % i)
+            self.assertEqual(self.__get(oQueue, 1), ['a%d' % i])
+            oReader.unsubscribe(oSubscriber)
+
+
+class TestTailCheckpoint(FileTestCase):
+
+    def __follow(self, _fnAction=None, _oProducer=None):
+        (oWatcher, _) = watcher()
+        oCheckpoint = TailCheckpoint(self.path('checkpoint'), 0.0, _oProducer)
+        oFollower = Follower(TailReader(oWatcher, self.path('app'), TEST_INTERVAL, False, 1024, oCheckpoint), _oProducer)
+        time.sleep(TEST_WAIT)
+        if _fnAction is not None:
+            _fnAction()
+            time.sleep(TEST_WAIT)
+        return oFollower.stop()
+
+
+    def test_resume(self):
+        self.write('app', 'a1\na2\n')
+        self.assertEqual(self.__follow(lambda: self.write('app', 'a3\n')), ['a3'])
+        self.write('app', 'a4\n')
+        self.assertEqual(self.__follow(), ['a4'])
+        self.assertEqual(self.__follow(), [])
+
+
+    def test_resume_rotated(self):
+        self.write('app', 'a1\n')
+        self.assertEqual(self.__follow(lambda: self.write('app', 'a2\n')), ['a2'])
+
+        # Rotate while stopped (new file being empty)
+        self.write('app', 'a3\n')
+        os.rename(self.path('app'), self.path('app.1'))
+        self.write('app', '')
+        self.assertEqual(self.__follow(), ['a3'])
+
+        # Checkpoint must point at the new file (rather than the closed rotated one)
+        with open(self.path('checkpoint')) as oFile:
+            lsFields = oFile.read().split()
+        oStat = os.stat(self.path('app'))
+        self.assertEqual([int(s) for s in lsFields[0:3]], [oStat.st_dev, oStat.st_ino, 0])
+        self.assertEqual(self.__follow(lambda: self.write('app', 'b1\n')), ['b1'])
+
+
+    def test_unprocessed(self):
+        self.write('app', 'a1\n')
+        self.assertEqual(self.__follow(), [])
+        self.write('app', 'a2\na3\na4\n')
+
+        # Data read but not processed (e.g. still queued) must be read again
+        self.assertEqual(self.__follow(None, TestProducer(0)), ['a2', 'a3', 'a4'])
+        self.assertEqual(self.__follow(None, TestProducer(1<<30)), ['a2', 'a3', 'a4'])
+        self.assertEqual(self.__follow(None, TestProducer(1<<30)), [])
+
+
+    def test_truncated(self):
+        self.write('app', 'a1\n')
+        self.assertEqual(self.__follow(), [])
+
+        # Checkpoint must not point within a truncated line (being discarded)
+        self.write('app', 'x'*2000)
+        self.assertEqual(self.__follow(), ['x'*1024])
+        self.write('app', 'yyy\nb1\n')
+        self.assertEqual(self.__follow(), ['x'*1024, 'b1'])
+        self.assertEqual(self.__follow(), [])
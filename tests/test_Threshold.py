@@ -0,0 +1,66 @@
+# -*- mode:python; tab-width:4; c-basic-offset:4; intent-tabs-mode:nil; -*-
+# ex: filetype=python tabstop=4 softtabstop=4 shiftwidth=4 expandtab autoindent smartindent
+
+#
+# Log Watcher Daemon (logwatcherd)
+# Copyright (C) 2016 Cedric Dufour <http://cedric.dufour.name>
+# Author: Cedric Dufour <http://cedric.dufour.name>
+#
+# The Log Watcher Daemon (logwatcherd) is free software: you can redistribute
+# it and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, Version 3.
+#
+# The Log Watcher Daemon (logwatcherd) is distributed in the hope that it will
+# be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See the GNU General Public License for more details.
+#
+
+
+#------------------------------------------------------------------------------
+# DEPENDENCIES
+#------------------------------------------------------------------------------
+
+# LogWatcher
+from LogWatcher.Conditioners.Threshold import Threshold
+from LogWatcher.Data import Data
+from LogWatcher.Producers.ProducerSpool import ProducerSpool
+from tests import FileTestCase, TestDaemon, watcher
+from tests.test_Scheduler import TestProducer
+
+
+#------------------------------------------------------------------------------
+# CLASSES
+#------------------------------------------------------------------------------
+
+class TestThreshold(FileTestCase):
+
+    def test_window(self):
+        (oWatcher, _) = watcher()
+        oThreshold = Threshold(oWatcher, 'hitcount=3&seconds=10&reset')
+        lsPassed = []
+        for (sData, fTime) in (('a', 0.0), ('b', 1.0), ('a', 5.0), ('a', 20.0), ('a', 25.0), ('a', 29.0), ('a', 30.0)):
+            oData = oThreshold.feed(Data('test', sData, sData, None, None, fTime))
+            if oData is not None:
+                lsPassed.append((oData.data, oData.time))
+
+        # Hits older than the window are forgotten; reset hits once passed
+        self.assertEqual(lsPassed, [('a', 29.0)])
+        self.assertEqual(oThreshold.statistics()['passed'], 1)
+
+
+    def test_ingest_time(self):
+        oDaemon = TestDaemon(1)
+        oScheduler = oDaemon.scheduler()
+        (oWatcher, oConsumer) = watcher('delay=0.02', oDaemon)
+        oWatcher.addConditioner(Threshold(oWatcher, 'hitcount=40&seconds=0.5'))
+        oWatcher.setSpool(ProducerSpool(oWatcher, self.path('spool'), 8, 1<<20))
+        oProducer = TestProducer(oWatcher, ['x']*40)
+        oScheduler.add(oWatcher, oProducer, False, False, 0.005)
+        oScheduler.start()
+        self.addCleanup(oScheduler.stop)
+
+        # Data read in a burst must be counted within the window, regardless how
+        # long queueing, spooling and filtering them takes
+        self.assertEqual(oConsumer.wait(1), ['x'])